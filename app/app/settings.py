@@ -42,14 +42,18 @@ INSTALLED_APPS = [
     'core',
     'user',
     'recipe',
+    'batch',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.routers.AdminShardMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,6 +92,83 @@ DATABASES = {
     }
 }
 
+# Read replicas, comma separated hosts sharing the primary's credentials
+for index, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    DATABASES[f'replica{index + 1}'] = dict(
+        DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+
+# User sharding, comma separated hosts of the shards next to default,
+# see core.sharding
+for index, host in enumerate(
+        filter(None, os.environ.get('DB_SHARD_HOSTS', '').split(','))):
+    DATABASES[f'shard{index + 1}'] = dict(DATABASES['default'], HOST=host)
+
+# Local development without PostgreSQL. DB_REPLICAS connections to the
+# same file stand in for replicas and DB_SHARDS - 1 more files for shards.
+if os.environ.get('DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        },
+    }
+    for index in range(1, int(os.environ.get('DB_REPLICAS', 0)) + 1):
+        DATABASES[f'replica{index}'] = dict(
+            DATABASES['default'], TEST={'MIRROR': 'default'})
+    for index in range(1, int(os.environ.get('DB_SHARDS', 1))):
+        DATABASES[f'shard{index}'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, f'db-shard{index}.sqlite3'),
+        }
+
+DATABASE_SHARDS = [alias for alias in DATABASES if alias.startswith('shard')]
+if DATABASE_SHARDS:
+    DATABASE_SHARDS.insert(0, 'default')
+DATABASE_REPLICAS = [alias for alias in DATABASES
+                     if alias.startswith('replica')]
+DATABASE_ROUTERS = ['core.routers.ShardRouter', 'core.routers.ReplicaRouter']
+TEST_RUNNER = 'core.tests.runner.TestRunner'
+# Ids of every shard start at its index times this, keeping the ids of
+# moved rows unique. At most 21 shards fit in 32 bit ids.
+SHARD_ID_BLOCK = 10 ** 8
+# Processes cache the shard of a user for this long
+SHARD_MAP_CACHE_SECONDS = 60
+# Reads of a client that just wrote go to the primary for this long
+REPLICA_PIN_SECONDS = 5
+
+
+# Password hashing, the first hasher hashes new passwords
+PASSWORD_HASHERS = [
+    'core.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+# Cost of a login, see the benchmark_login command
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 150000))
+
+# Login attempts allowed per (attempts, seconds), see user.throttling
+LOGIN_THROTTLE_RATES = {
+    'email': (5, 60),
+    'ip': (30, 60),
+}
+LOGIN_THROTTLE_MAX_KEYS = 100000
+
+REST_FRAMEWORK = {
+    # Proxies in front of the app. Throttles key clients by the address
+    # this many hops back in X-Forwarded-For, or by REMOTE_ADDR when 0,
+    # the header being set by clients otherwise.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+# API tokens expire this long after their last use, see the purge_tokens
+# command for cleaning them up
+AUTH_TOKEN_TTL_SECONDS = 14 * 24 * 3600
+# Least time between two writes of a token's new expiry
+AUTH_TOKEN_REFRESH_SECONDS = 3600
+AUTH_TOKENS_PER_USER = 20
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -100,7 +181,7 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+        'NAME': 'core.validators.CommonPasswordValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
@@ -133,3 +214,30 @@ STATIC_ROOT = '/vol/web/static'
 
 # add custom user model settings
 AUTH_USER_MODEL = 'core.User'
+
+# Response compression, see core.middleware.CompressionMiddleware
+COMPRESSION_MIN_SIZE = 200
+COMPRESSION_LEVEL = 6
+COMPRESSION_ROUTE_LEVELS = [
+    # Images are already compressed
+    (r'^/media/', 0),
+    # Small, mostly unique payloads
+    (r'^/api/user/', 1),
+]
+
+# Batch endpoint, see batch.views.BatchView
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# Recipe detail cache, see recipe.detail_cache
+RECIPE_DETAIL_CACHE_SECONDS = 300
+RECIPE_DETAIL_CACHE_LOCK_SECONDS = 2
+
+# In-memory similar recipe indexes, see recipe.similarity. An entry is
+# one tag or ingredient of a recipe and takes about 8 bytes.
+SIMILAR_RECIPES_MAX_USERS = 64
+SIMILAR_RECIPES_MAX_ENTRIES = 5000000
+
+# Cross-process cache invalidation, see core.bus. Unset runs without it.
+INVALIDATION_BUS_DIR = os.environ.get('INVALIDATION_BUS_DIR')
+INVALIDATION_BUS_SEND_TIMEOUT = 0.05
@@ -0,0 +1,24 @@
+from django.conf import settings
+from rest_framework import serializers
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """A single API call carried by a batch request"""
+    method = serializers.ChoiceField(choices=METHODS, default='GET')
+    path = serializers.RegexField(r'^/api/')
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for the batch request object"""
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        limit = getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+        if len(value) > limit:
+            raise serializers.ValidationError(
+                f'Ensure this field has no more than {limit} elements.')
+        return value
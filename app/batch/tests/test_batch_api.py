@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Recipe
+from core.tests.utils import ShardedTestCase
+
+BATCH_ROUTE = reverse('batch:batch')
+TAGS_PATH = reverse('recipe:tag-list')
+RECIPES_PATH = reverse('recipe:recipe-list')
+ME_PATH = reverse('user:me')
+
+
+class PublicBatchApiTests(ShardedTestCase):
+    def test_login_required(self):
+        payload = {'requests': [{'path': TAGS_PATH}]}
+        res = APIClient().post(BATCH_ROUTE, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBatchApiTests(ShardedTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'admin@email.com',
+            'password123',
+            name='Admin'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_batch_reads(self):
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        payload = {'requests': [
+            {'path': ME_PATH},
+            {'path': f'{TAGS_PATH}?fields=name'},
+            {'path': RECIPES_PATH},
+        ]}
+        res = self.client.post(BATCH_ROUTE, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in res.data], [200, 200, 200])
+        self.assertEqual(res.data[0]['body']['email'], self.user.email)
+        self.assertEqual(res.data[1]['body'][0]['name'], 'Vegan')
+        self.assertEqual(res.data[2]['body'], [])
+
+    def test_batch_writes_run_in_order(self):
+        payload = {'requests': [
+            {'method': 'POST', 'path': TAGS_PATH, 'body': {'name': 'Vegan'}},
+            {'path': TAGS_PATH},
+            {'method': 'POST', 'path': RECIPES_PATH,
+             'body': {'title': 'Stew', 'time_minutes': 5, 'price': '1.00',
+                      'tags': [], 'ingredients': []}},
+        ]}
+        res = self.client.post(BATCH_ROUTE, payload, format='json')
+
+        self.assertEqual([r['status'] for r in res.data], [201, 200, 201])
+        self.assertEqual(res.data[1]['body'][0]['name'], 'Vegan')
+        self.assertTrue(Recipe.objects.filter(user=self.user).exists())
+
+    def test_batch_reports_errors_per_request(self):
+        payload = {'requests': [
+            {'path': '/api/recipe/missing/'},
+            {'path': BATCH_ROUTE},
+            {'method': 'POST', 'path': TAGS_PATH, 'body': {'name': ''}},
+        ]}
+        res = self.client.post(BATCH_ROUTE, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in res.data], [404, 400, 400])
+
+    def test_batch_rejects_non_api_paths(self):
+        payload = {'requests': [{'path': '/admin/'}]}
+        res = self.client.post(BATCH_ROUTE, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_size_limit(self):
+        payload = {'requests': [{'path': TAGS_PATH}] * 21}
+        res = self.client.post(BATCH_ROUTE, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ParallelBatchApiTests(TransactionTestCase):
+    databases = ShardedTestCase.databases
+
+    def test_parallel_reads(self):
+        user = get_user_model().objects.create_user(
+            'admin@email.com', 'password123')
+        # The related manager routes to the shard of the user
+        user.tag_set.create(name='Vegan')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        payload = {
+            'parallel': True,
+            'requests': [{'path': TAGS_PATH}, {'path': ME_PATH}] * 3
+        }
+        res = client.post(BATCH_ROUTE, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in res.data], [200] * 6)
+        self.assertEqual(res.data[4]['body'][0]['name'], 'Vegan')
+        self.assertEqual(res.data[5]['body']['email'], user.email)
@@ -0,0 +1,98 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import resolve, Resolver404
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from batch.serializers import BatchSerializer
+from core.authentication import ExpiringTokenAuthentication
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BATCH_MAX_WORKERS', 4),
+            thread_name_prefix='batch'
+        )
+    return _executor
+
+
+def build_subrequest(request, method, path, body=None):
+    """Build a WSGI request for ``path`` that reuses the authentication
+    of the batch request instead of running it again"""
+    path, _, query = path.partition('?')
+    payload = b'' if body is None else json.dumps(body).encode()
+    environ = dict(
+        request.META,
+        REQUEST_METHOD=method,
+        PATH_INFO=path,
+        QUERY_STRING=query,
+        CONTENT_TYPE='application/json',
+        CONTENT_LENGTH=str(len(payload)),
+    )
+    environ['wsgi.input'] = BytesIO(payload)
+    subrequest = WSGIRequest(environ)
+    subrequest._force_auth_user = request.user
+    subrequest._force_auth_token = request.auth
+    return subrequest
+
+
+def dispatch(request, item):
+    """Run one sub-request through its view, skipping the middleware"""
+    try:
+        match = resolve(item['path'].partition('?')[0])
+    except Resolver404:
+        return {'status': status.HTTP_404_NOT_FOUND, 'body': None}
+    if getattr(match.func, 'view_class', None) is BatchView:
+        return {'status': status.HTTP_400_BAD_REQUEST,
+                'body': {'detail': 'Batches can not be nested.'}}
+
+    subrequest = build_subrequest(
+        request, item['method'], item['path'], item.get('body'))
+    response = match.func(subrequest, *match.args, **match.kwargs)
+    if hasattr(response, 'data'):
+        body = response.data
+    else:
+        body = response.content.decode(response.charset)
+    return {'status': response.status_code, 'body': body}
+
+
+def dispatch_in_thread(request, item):
+    try:
+        return dispatch(request, item)
+    finally:
+        connections.close_all()
+
+
+class BatchView(APIView):
+    """Run several API calls in one round trip
+
+    Sub-requests are dispatched in-process against the URLconf, in order.
+    With ``parallel`` set and only safe methods in the batch, they run
+    concurrently on a thread pool.
+    """
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['requests']
+
+        concurrent = serializer.validated_data['parallel'] and all(
+            item['method'] == 'GET' for item in items)
+        if concurrent:
+            results = list(get_executor().map(
+                lambda item: dispatch_in_thread(request, item), items))
+        else:
+            results = [dispatch(request, item) for item in items]
+        return Response(results)
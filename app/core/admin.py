@@ -1,12 +1,76 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import Prefetch
 from django.utils.translation import gettext as _
 from core import models
+from core.counts import EstimatedCountPaginator
+from core.purge import soft_delete_user, soft_delete_recipes
+from core.routers import AdminShardMiddleware
+from core.sharding import shard_aliases
 
 
-class UserAdmin(BaseUserAdmin):
+class SoftDeleteAdminMixin:
+    """Deletes only mark rows, so skip collecting every related row for
+    the confirmation page"""
+
+    def get_deleted_objects(self, objs, request):
+        return [str(obj) for obj in objs], {}, set(), []
+
+
+class LargeTableAdminMixin:
+    """Changelists that stay fast on tables with millions of rows"""
+    paginator = EstimatedCountPaginator
+    # Avoids a second COUNT(*) of the whole table on filtered pages
+    show_full_result_count = False
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Pick the shard the changelist shows, see AdminShardMiddleware"""
+    title = _('shard')
+    parameter_name = 'shard'
+
+    def __init__(self, request, *args, **kwargs):
+        self.current = request.session.get(
+            AdminShardMiddleware.session_key, 'default')
+        super().__init__(request, *args, **kwargs)
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shard_aliases()]
+
+    def value(self):
+        return super().value() or self.current
+
+    def queryset(self, request, queryset):
+        # Already routed to the shard by AdminShardMiddleware
+        return queryset
+
+    def choices(self, changelist):
+        # Skip "All", rows of several shards can't be listed together
+        return list(super().choices(changelist))[1:]
+
+
+class ShardedAdminMixin:
+    """Admin of per-user rows, which live on the shard of their user
+
+    Users stay on the default database, so they are prefetched from there
+    rather than joined.
+    """
+    list_filter = [ShardFilter]
+    list_select_related = ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(Prefetch(
+            'user', queryset=get_user_model().objects.using('default')))
+
+
+class UserAdmin(SoftDeleteAdminMixin, LargeTableAdminMixin, BaseUserAdmin):
     ordering = ['id']
     list_display = ['email', 'name']
+    list_filter = ['is_staff', 'is_superuser', 'is_active']
+    # Prefix searches use the upper(email) index
+    search_fields = ['^email']
+    readonly_fields = ['deleted_at']
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (_('Personal Information'), {'fields': ('name',)}),
@@ -14,7 +78,7 @@ class UserAdmin(BaseUserAdmin):
             _('Permissions'),
             {'fields': ('is_active', 'is_staff', 'is_superuser')}
         ),
-        (_('Important dates'), {'fields': ('last_login',)})
+        (_('Important dates'), {'fields': ('last_login', 'deleted_at')})
     )
     add_fieldsets = (
         (None, {
@@ -23,8 +87,36 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+    def delete_model(self, request, obj):
+        soft_delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            soft_delete_user(user)
+
+
+class NameAdmin(ShardedAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['name', 'user']
+    search_fields = ['^name']
+    autocomplete_fields = ['user']
+
+
+class RecipeAdmin(SoftDeleteAdminMixin, ShardedAdminMixin,
+                  LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['title', 'user', 'time_minutes', 'price']
+    search_fields = ['^title']
+    # Options are fetched on demand instead of rendering every row
+    autocomplete_fields = ['user', 'tags', 'ingredients']
+    readonly_fields = ['updated_at', 'deleted_at']
+
+    def delete_model(self, request, obj):
+        soft_delete_recipes(models.Recipe.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        soft_delete_recipes(queryset)
+
 
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
-admin.site.register(models.Recipe)
+admin.site.register(models.Tag, NameAdmin)
+admin.site.register(models.Ingredient, NameAdmin)
+admin.site.register(models.Recipe, RecipeAdmin)
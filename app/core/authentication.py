@@ -0,0 +1,91 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import authentication, exceptions
+
+from core.models import AuthToken
+
+
+def token_ttl():
+    return timedelta(
+        seconds=getattr(settings, 'AUTH_TOKEN_TTL_SECONDS', 14 * 24 * 3600))
+
+
+def issue_token(user, device=''):
+    """New token for ``device`` of ``user``, replacing the one it had
+
+    Only the AUTH_TOKENS_PER_USER most recently issued tokens of a user
+    are kept. Concurrent logins of the same device share the token the
+    first of them issued.
+    """
+    try:
+        with transaction.atomic():
+            AuthToken.objects.filter(user=user, device=device).delete()
+            token = AuthToken.objects.create(
+                key=AuthToken.generate_key(), user=user, device=device,
+                expires=timezone.now() + token_ttl())
+            limit = getattr(settings, 'AUTH_TOKENS_PER_USER', 20)
+            stale = AuthToken.objects.filter(user=user).order_by(
+                '-created').values_list('key', flat=True)[limit:]
+            AuthToken.objects.filter(key__in=list(stale)).delete()
+    except IntegrityError:
+        # Created by another login of the device after our delete
+        return AuthToken.objects.get(user=user, device=device)
+    return token
+
+
+class ExpiringTokenAuthentication(authentication.TokenAuthentication):
+    """Token authentication with a sliding expiry
+
+    Using a token pushes its expiry back to AUTH_TOKEN_TTL_SECONDS from
+    now. The new expiry is written at most every AUTH_TOKEN_REFRESH_SECONDS
+    per token, not on every request.
+    """
+    model = AuthToken
+
+    def authenticate_credentials(self, key):
+        try:
+            token = AuthToken.objects.select_related('user').get(key=key)
+        except AuthToken.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        now = timezone.now()
+        if token.expires <= now:
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+
+        refresh = timedelta(
+            seconds=getattr(settings, 'AUTH_TOKEN_REFRESH_SECONDS', 3600))
+        if token.expires < now + token_ttl() - refresh:
+            token.expires = now + token_ttl()
+            AuthToken.objects.filter(key=key).update(expires=token.expires)
+
+        return token.user, token
+
+
+def purge_expired_tokens(batch_size=1000, pause=0, progress=None):
+    """Delete expired tokens ``batch_size`` at a time
+
+    Each batch is its own short DELETE by primary key, so logins and
+    requests never wait long on the token table. Returns the number of
+    tokens deleted.
+    """
+    total = 0
+    while True:
+        keys = list(AuthToken.objects.filter(
+            expires__lte=timezone.now()).values_list(
+            'key', flat=True)[:batch_size])
+        if not keys:
+            return total
+        count = AuthToken.objects.filter(key__in=keys).delete()[0]
+        total += count
+        if progress:
+            progress(count)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,42 @@
+import time
+from contextlib import contextmanager, ExitStack
+
+from django.db import transaction
+
+from core.sharding import shard_aliases
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back(using=None):
+    """Run the block in a transaction that is always rolled back, for
+    benchmarks writing throwaway rows
+
+    Without ``using`` the default database and every shard are rolled
+    back, the rows of a benchmark user land on its shard.
+    """
+    aliases = [using] if using else dict.fromkeys(
+        ['default', *shard_aliases()])
+    try:
+        with ExitStack() as stack:
+            for alias in aliases:
+                stack.enter_context(transaction.atomic(using=alias))
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def measure(func, seconds):
+    """Calls of ``func`` per second over about ``seconds``"""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return calls / elapsed
@@ -0,0 +1,165 @@
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Keys per datagram, keeps messages far below the socket buffer size
+CHUNK_SIZE = 200
+
+
+class InvalidationBus:
+    """Broadcast invalidated cache keys to the other processes of a host
+
+    Every process binds a Unix datagram socket in INVALIDATION_BUS_DIR
+    and a daemon thread delivers what it receives to the callbacks
+    subscribed to the message's channel. ``publish`` sends to every other
+    socket in the directory. Delivery is as fast as the kernel hands the
+    datagram over. A peer that can't take a message within
+    INVALIDATION_BUS_SEND_TIMEOUT seconds misses it, and its cache
+    entries go stale until they expire.
+
+    Without INVALIDATION_BUS_DIR the bus does nothing, there being no
+    other process to tell. Neither does it when its socket can't be bound.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._subscribers = defaultdict(list)
+        self._lock = threading.Lock()
+        self._socket = None
+        self._path = None
+        self._pid = None
+
+    def get_directory(self):
+        return self.directory or getattr(
+            settings, 'INVALIDATION_BUS_DIR', None)
+
+    def subscribe(self, channel, callback):
+        """Call ``callback(keys)`` for keys other processes publish on
+        ``channel``"""
+        with self._lock:
+            self._subscribers[channel].append(callback)
+        self.start()
+
+    def publish(self, channel, keys):
+        keys = [str(key) for key in keys]
+        directory = self.get_directory()
+        if not keys or not directory:
+            return
+        self.start()
+        if self._socket is None:
+            return
+        peers = [
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.endswith('.sock')
+            and os.path.join(directory, name) != self._path
+        ]
+        if not peers:
+            return
+
+        timeout = getattr(settings, 'INVALIDATION_BUS_SEND_TIMEOUT', 0.05)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.settimeout(timeout)
+            for start in range(0, len(keys), CHUNK_SIZE):
+                message = json.dumps({
+                    'channel': channel,
+                    'keys': keys[start:start + CHUNK_SIZE],
+                }).encode()
+                for peer in list(peers):
+                    try:
+                        sender.sendto(message, peer)
+                    except (ConnectionRefusedError, FileNotFoundError):
+                        # The process is gone, its socket file is not
+                        peers.remove(peer)
+                        self._unlink(peer)
+                    except OSError as exc:
+                        logger.warning(
+                            'Dropped invalidation of %s for %s: %s',
+                            channel, peer, exc)
+
+    def start(self):
+        """Bind this process' socket, again in a forked child"""
+        directory = self.get_directory()
+        if not directory or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            path = os.path.join(
+                directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock')
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+                sock.bind(path)
+            except OSError as exc:
+                # Serve without the bus rather than fail to boot, peers'
+                # entries then go stale until they expire
+                logger.warning(
+                    'Invalidation bus disabled, cannot bind in %s: %s',
+                    directory, exc)
+                sock.close()
+                self._pid = os.getpid()
+                return
+            # Lets the listener notice stop(), closing the socket doesn't
+            # interrupt a blocked recv()
+            sock.settimeout(1)
+            self._socket, self._path, self._pid = sock, path, os.getpid()
+        threading.Thread(
+            target=self._listen, args=(sock,), daemon=True,
+            name='invalidation-bus').start()
+
+    def _after_fork(self):
+        # The parent's listener thread doesn't exist in the child
+        self._lock = threading.Lock()
+        if self._socket is not None:
+            self._socket.close()
+        self._socket = self._path = self._pid = None
+        if self._subscribers:
+            self.start()
+
+    def stop(self):
+        with self._lock:
+            sock, path = self._socket, self._path
+            self._socket = self._path = self._pid = None
+        if sock is not None:
+            self._unlink(path)
+            sock.close()
+
+    def _listen(self, sock):
+        while self._socket is sock:
+            try:
+                message = json.loads(sock.recv(65536))
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            except ValueError:
+                continue
+            with self._lock:
+                callbacks = list(self._subscribers[message['channel']])
+            for callback in callbacks:
+                try:
+                    callback(message['keys'])
+                except Exception:
+                    logger.exception(
+                        'Invalidation of %s failed', message['channel'])
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+bus = InvalidationBus()
+atexit.register(bus.stop)
+os.register_at_fork(after_in_child=bus._after_fork)
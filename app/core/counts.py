@@ -0,0 +1,95 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections, IntegrityError, transaction
+from django.db.models import F
+from django.utils.functional import cached_property
+
+from core.models import ObjectCount
+
+
+def exact_count_limit():
+    return getattr(settings, 'COUNT_EXACT_LIMIT', 10000)
+
+
+def planner_estimate(queryset):
+    """Number of rows the PostgreSQL planner expects ``queryset`` to
+    return, None on other databases"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def cached_count(model, user_id, using='default'):
+    """Maintained number of ``user_id``'s ``model`` rows, or None"""
+    return ObjectCount.objects.using(using).filter(
+        user_id=user_id, model=model._meta.model_name
+    ).values_list('count', flat=True).first()
+
+
+def adjust_count(model, user_id, delta, using='default'):
+    """Add ``delta`` to the maintained count, seeding it on first use"""
+    counts = ObjectCount.objects.using(using).filter(
+        user_id=user_id, model=model._meta.model_name)
+    if counts.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic(using=using):
+            ObjectCount.objects.using(using).create(
+                user_id=user_id, model=model._meta.model_name,
+                count=model.objects.using(using).filter(
+                    user_id=user_id).count()
+            )
+    except IntegrityError:
+        # Seeded concurrently by a transaction that may not have seen this
+        # row, which isn't committed yet, so apply the delta to it
+        counts.update(count=F('count') + delta)
+
+
+def count(queryset, counter=None):
+    """Count ``queryset`` without scanning all of a large result
+
+    Results up to COUNT_EXACT_LIMIT rows are counted exactly, with the
+    scan bounded by a LIMIT. Above that the signal maintained count of
+    ``counter`` (a (model, user_id) pair, for querysets that list all of
+    a user's rows) is used, then the PostgreSQL planner estimate. Other
+    databases fall back to an exact count.
+    """
+    limit = exact_count_limit()
+    if counter is not None:
+        value = cached_count(*counter, using=queryset.db)
+        if value is not None and value > limit:
+            return value
+
+    bounded = queryset.order_by()[:limit + 1].count()
+    if bounded <= limit:
+        return bounded
+
+    estimate = planner_estimate(queryset)
+    if estimate is not None:
+        return estimate
+    return queryset.count()
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator counting through ``count``, so large result sets are
+    never counted exactly"""
+
+    def __init__(self, *args, counter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counter = counter
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            return count(self.object_list, self.counter)
+        return super().count
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management import BaseCommand
+
+from core.purge import purge
+
+
+class Command(BaseCommand):
+    help = 'Purge soft deleted users and recipes in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running as a background worker')
+        parser.add_argument(
+            '--interval', type=float, default=30,
+            help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            total = purge(
+                batch_size=options['batch_size'],
+                using=options['database'],
+                progress=self.report
+            )
+            if total:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Purged {total} rows'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def report(self, label, count):
+        self.stdout.write(f'Deleted {count} {label}')
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management import BaseCommand
+
+from core.authentication import purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired API tokens in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running as a background worker')
+        parser.add_argument(
+            '--interval', type=float, default=3600,
+            help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            total = purge_expired_tokens(
+                batch_size=options['batch_size'],
+                pause=options['pause'],
+                progress=self.report
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f'Purged {total} expired tokens'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def report(self, count):
+        self.stdout.write(f'Deleted {count} tokens')
@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+
+from core.models import ShardMap
+from core.sharding import hash_shard, move_user, shard_aliases
+
+
+class Command(BaseCommand):
+    help = 'Move users whose shard differs from the one their id hashes to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--users', type=int, default=100,
+            help='Users locked and moved together')
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only consider these user ids')
+        parser.add_argument(
+            '--no-wait', action='store_true',
+            help="Don't wait for cached shard maps to expire, only safe "
+                 "when no other process serves requests")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if not shard_aliases():
+            raise CommandError('DATABASE_SHARDS is not configured')
+
+        moves = list(self.plan(options['user_ids']))
+        for start in range(0, len(moves), options['users']):
+            chunk = moves[start:start + options['users']]
+            for user_id, source, target in chunk:
+                self.stdout.write(f'User {user_id}: {source} -> {target}')
+            if not options['dry_run']:
+                self.move(chunk, options)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(moves)} users to move' if options['dry_run']
+            else f'Moved {len(moves)} users'))
+
+    def plan(self, user_ids):
+        """(user id, current shard, target shard) of misplaced users"""
+        users = ShardMap.objects.using('default').filter(
+            user__deleted_at__isnull=True).order_by('user_id')
+        if user_ids:
+            users = users.filter(user_id__in=user_ids)
+        for user_id, shard in users.values_list('user_id', 'shard'):
+            target = hash_shard(user_id)
+            if shard != target:
+                yield user_id, shard, target
+
+    def move(self, chunk, options):
+        """Move ``chunk`` with its active users locked out
+
+        Inactive users fail token authentication, so once the shard maps
+        other processes cached have expired nothing writes to their rows.
+        """
+        users = get_user_model().objects.using('default').filter(
+            pk__in=[user_id for user_id, _, _ in chunk], is_active=True)
+        locked = list(users.values_list('pk', flat=True))
+        users.update(is_active=False)
+        try:
+            if not options['no_wait']:
+                time.sleep(settings.SHARD_MAP_CACHE_SECONDS)
+            for user_id, _, target in chunk:
+                move_user(user_id, target, options['batch_size'])
+        finally:
+            get_user_model().objects.using('default').filter(
+                pk__in=locked).update(is_active=True)
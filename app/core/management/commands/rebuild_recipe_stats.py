@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+
+from core import stats
+from core.sharding import shard_for_user
+
+
+class Command(BaseCommand):
+    help = 'Recompute the recipe summaries served by the stats endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Users read and reported together')
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only rebuild these user ids')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.using('default').filter(
+            deleted_at__isnull=True).order_by('pk')
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+
+        rebuilt = last = 0
+        while True:
+            ids = list(users.filter(pk__gt=last).values_list(
+                'pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            for user_id in ids:
+                stats.rebuild(user_id, using=shard_for_user(user_id))
+            rebuilt += len(ids)
+            last = ids[-1]
+            self.stdout.write(f'Rebuilt {rebuilt} users')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the recipe stats of {rebuilt} users'))
@@ -0,0 +1,115 @@
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+# wbits selecting the gzip container or the zlib container, which is what
+# HTTP calls "deflate"
+WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+ACCEPT_ENCODING_RE = re.compile(
+    r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+
+
+def negotiate_encoding(header):
+    """Pick the supported content coding the client prefers most"""
+    best, best_q = None, 0.0
+    for item in header.split(','):
+        match = ACCEPT_ENCODING_RE.fullmatch(item)
+        if not match:
+            continue
+        coding, q = match.group(1).lower(), match.group(2)
+        try:
+            q = float(q) if q is not None else 1.0
+        except ValueError:
+            continue
+        candidates = WBITS if coding == '*' else [coding]
+        for candidate in candidates:
+            if candidate in WBITS and q > best_q:
+                best, best_q = candidate, q
+    return best
+
+
+def compress(data, encoding, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, WBITS[encoding])
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding, level):
+    """Compress an iterable of byte chunks as it is consumed
+
+    Every chunk is sync-flushed so a streamed response reaches the client
+    as it is produced instead of waiting for the compressor window to fill.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, WBITS[encoding])
+    for chunk in chunks:
+        data = compressor.compress(chunk) + \
+            compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses with gzip or deflate
+
+    Settings:
+        COMPRESSION_MIN_SIZE -- smaller bodies are sent as is
+        COMPRESSION_LEVEL -- default zlib level, 1 (fast) to 9 (small)
+        COMPRESSION_ROUTE_LEVELS -- (path regex, level) pairs overriding
+            the default level, the first match wins and 0 disables
+    """
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 200)
+        self.level = getattr(settings, 'COMPRESSION_LEVEL', 6)
+        self.route_levels = [
+            (re.compile(pattern), level) for pattern, level
+            in getattr(settings, 'COMPRESSION_ROUTE_LEVELS', ())
+        ]
+
+    def level_for(self, path):
+        for pattern, level in self.route_levels:
+            if pattern.search(path):
+                return level
+        return self.level
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        level = self.level_for(request.path)
+        if not level:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding, level)
+            del response['Content-Length']
+        else:
+            compressed = compress(response.content, encoding, level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The compressed body is a different representation, so a strong
+        # ETag of the original body must be weakened (RFC 7232 section 2.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
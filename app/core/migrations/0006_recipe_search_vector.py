@@ -0,0 +1,42 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "UPDATE core_recipe "
+            "SET search_vector = to_tsvector('english', title)")
+        schema_editor.execute(
+            'CREATE INDEX core_recipe_search_vector_idx '
+            'ON core_recipe USING gin (search_vector)')
+    else:
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE core_recipe_fts '
+            "USING fts5(title, tokenize = 'porter unicode61')")
+        schema_editor.execute(
+            'INSERT INTO core_recipe_fts (rowid, title) '
+            'SELECT id, title FROM core_recipe')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX core_recipe_search_vector_idx')
+    else:
+        schema_editor.execute('DROP TABLE core_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+INDEXES = (
+    ('core_tag_user_name_prefix_idx', 'core_tag'),
+    ('core_ingredient_user_name_prefix_idx', 'core_ingredient'),
+)
+
+
+def create_prefix_indexes(apps, schema_editor):
+    """Index (user_id, upper(name)) so per-user istartswith lookups
+    are range scans"""
+    for name, table in INDEXES:
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(
+                f'CREATE INDEX {name} ON {table} '
+                f'(user_id, upper(name) varchar_pattern_ops)')
+        else:
+            schema_editor.execute(
+                f'CREATE INDEX {name} ON {table} '
+                f'(user_id, name COLLATE NOCASE)')
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+INDEXES = (
+    ('core_user_email_search_idx', 'core_user', 'email'),
+    ('core_tag_name_search_idx', 'core_tag', 'name'),
+    ('core_ingredient_name_search_idx', 'core_ingredient', 'name'),
+    ('core_recipe_title_search_idx', 'core_recipe', 'title'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    """Index the admin search_fields for case insensitive prefix search"""
+    for name, table, column in INDEXES:
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(
+                f'CREATE INDEX {name} ON {table} '
+                f'(upper({column}) varchar_pattern_ops)')
+        else:
+            schema_editor.execute(
+                f'CREATE INDEX {name} ON {table} ({column} COLLATE NOCASE)')
+
+
+def drop_search_indexes(apps, schema_editor):
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_range_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 2.2.28 on 2026-10-19 04:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Expression indexes of 0007 and 0011, SQLite drops them whenever it
+# rebuilds a table to alter a column
+SQLITE_INDEXES = (
+    ('core_tag_user_name_prefix_idx', 'core_tag',
+     'user_id, name COLLATE NOCASE'),
+    ('core_ingredient_user_name_prefix_idx', 'core_ingredient',
+     'user_id, name COLLATE NOCASE'),
+    ('core_tag_name_search_idx', 'core_tag', 'name COLLATE NOCASE'),
+    ('core_ingredient_name_search_idx', 'core_ingredient',
+     'name COLLATE NOCASE'),
+    ('core_recipe_title_search_idx', 'core_recipe', 'title COLLATE NOCASE'),
+)
+
+
+def map_existing_users(apps, schema_editor):
+    """Users created before sharding keep their rows on default"""
+    if schema_editor.connection.alias != 'default':
+        return
+    User = apps.get_model('core', 'User')
+    ShardMap = apps.get_model('core', 'ShardMap')
+    ids = User.objects.values_list('id', flat=True).order_by('id')
+    ShardMap.objects.bulk_create(
+        (ShardMap(user_id=pk, shard='default') for pk in ids.iterator()),
+        batch_size=500
+    )
+
+
+def restore_sqlite_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, table, columns in SQLITE_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_objectcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardMap',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('shard', models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='objectcount',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(map_existing_users, migrations.RunPython.noop),
+        migrations.RunPython(
+            restore_sqlite_indexes, migrations.RunPython.noop),
+    ]
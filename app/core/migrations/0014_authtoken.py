@@ -0,0 +1,48 @@
+# Generated by Django 2.2.28 on 2026-10-19 04:33
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def copy_legacy_tokens(apps, schema_editor):
+    """Tokens issued before expiry keep working for one more TTL"""
+    if schema_editor.connection.alias != 'default':
+        return
+    Token = apps.get_model('authtoken', 'Token')
+    AuthToken = apps.get_model('core', 'AuthToken')
+    expires = timezone.now() + timedelta(
+        seconds=getattr(settings, 'AUTH_TOKEN_TTL_SECONDS', 14 * 24 * 3600))
+    AuthToken.objects.bulk_create(
+        (AuthToken(key=token.key, user_id=token.user_id, expires=expires)
+         for token in Token.objects.order_by('key').iterator()),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_sharding'),
+        ('authtoken', '0002_auto_20160226_1747'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthToken',
+            fields=[
+                ('key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('device', models.CharField(blank=True, max_length=64)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('expires', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='auth_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'device')},
+            },
+        ),
+        migrations.RunPython(copy_legacy_tokens, migrations.RunPython.noop),
+    ]
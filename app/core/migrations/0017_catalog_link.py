@@ -0,0 +1,52 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+# The catalog is shared by all shards
+CATALOG_DB = 'default'
+
+
+def normalize(name):
+    return ' '.join(name.split()).casefold()[:255]
+
+
+def catalog_ids(CatalogEntry, names):
+    names = {normalize(name) for name in names}
+    entries = CatalogEntry.objects.using(CATALOG_DB)
+    entries.bulk_create(
+        [CatalogEntry(name=name) for name in names], ignore_conflicts=True)
+    return dict(entries.filter(name__in=names).values_list('name', 'id'))
+
+
+def link_catalog(model, using, CatalogEntry):
+    """Point every row at the catalog entry of its name"""
+    rows = model.objects.using(using).filter(
+        catalog__isnull=True).only('id', 'name').order_by('pk')
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(rows[:BATCH_SIZE])
+            if not batch:
+                return
+            ids = catalog_ids(CatalogEntry, [row.name for row in batch])
+            for row in batch:
+                row.catalog_id = ids[normalize(row.name)]
+            model.objects.using(using).bulk_update(batch, ['catalog'])
+
+
+def link(apps, schema_editor):
+    using = schema_editor.connection.alias
+    CatalogEntry = apps.get_model('core', 'CatalogEntry')
+    for name in ('Tag', 'Ingredient'):
+        link_catalog(apps.get_model('core', name), using, CatalogEntry)
+
+
+class Migration(migrations.Migration):
+    # Every batch commits on its own, so locks are held briefly
+    atomic = False
+
+    dependencies = [
+        ('core', '0016_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(link, migrations.RunPython.noop),
+    ]
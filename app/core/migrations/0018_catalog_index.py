@@ -0,0 +1,53 @@
+from django.db import migrations, models
+import django.db.models.deletion
+from django.conf import settings
+
+# Expression indexes of 0007 and 0011, SQLite drops them whenever it
+# rebuilds a table to alter a column
+SQLITE_INDEXES = (
+    ('core_tag_user_name_prefix_idx', 'core_tag',
+     'user_id, name COLLATE NOCASE'),
+    ('core_ingredient_user_name_prefix_idx', 'core_ingredient',
+     'user_id, name COLLATE NOCASE'),
+    ('core_tag_name_search_idx', 'core_tag', 'name COLLATE NOCASE'),
+    ('core_ingredient_name_search_idx', 'core_ingredient',
+     'name COLLATE NOCASE'),
+)
+
+
+def restore_sqlite_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, table, columns in SQLITE_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0017_catalog_link'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredient',
+            name='catalog',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.CatalogEntry'),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='catalog',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.CatalogEntry'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'catalog'], name='core_ingred_user_id_2047ab_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'catalog'], name='core_tag_user_id_de4ebc_idx'),
+        ),
+        migrations.RunPython(restore_sqlite_indexes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+from django.db import connections, migrations, transaction
+
+BATCH_SIZE = 1000
+
+
+def next_values(SyncSequence, count, using):
+    sequence = SyncSequence.objects.using(using)
+    if connections[using].features.can_return_ids_from_bulk_insert:
+        values = sorted(row.pk for row in sequence.bulk_create(
+            SyncSequence() for _ in range(count)))
+    else:
+        values = [sequence.create().pk for _ in range(count)]
+    sequence.filter(pk__lt=values[-1]).delete()
+    return values
+
+
+def stamp_rows(model, using, SyncSequence):
+    """Give the rows created before sync_seq existed a value, so clients
+    syncing from any cursor receive them"""
+    rows = model._base_manager.using(using).filter(
+        sync_seq=0).only('id').order_by('pk')
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(rows[:BATCH_SIZE])
+            if not batch:
+                return
+            values = next_values(SyncSequence, len(batch), using)
+            for row, value in zip(batch, values):
+                row.sync_seq = value
+            model._base_manager.using(using).bulk_update(batch, ['sync_seq'])
+
+
+def stamp(apps, schema_editor):
+    using = schema_editor.connection.alias
+    SyncSequence = apps.get_model('core', 'SyncSequence')
+    for name in ('Recipe', 'Tag', 'Ingredient'):
+        stamp_rows(apps.get_model('core', name), using, SyncSequence)
+
+
+class Migration(migrations.Migration):
+    # Every batch commits on its own, so locks are held briefly
+    atomic = False
+
+    dependencies = [
+        ('core', '0018_catalog_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(stamp, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+SEQUENCE = 'core_sync_seq'
+# Highest value allocated so far is the largest of these columns
+COLUMNS = (
+    ('core_syncsequence', 'id'),
+    ('core_recipe', 'sync_seq'),
+    ('core_tag', 'sync_seq'),
+    ('core_ingredient', 'sync_seq'),
+    ('core_tombstone', 'sync_seq'),
+)
+
+
+def create_sequence(apps, schema_editor):
+    """Continue the sync_seq values of the core_syncsequence table from a
+    sequence, PostgreSQL only"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    last = ', '.join(f'(SELECT coalesce(max({column}), 0) FROM {table})'
+                     for table, column in COLUMNS)
+    schema_editor.execute(f'CREATE SEQUENCE {SEQUENCE}')
+    schema_editor.execute(
+        f"SELECT setval('{SEQUENCE}', greatest({last}) + 1, false)")
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP SEQUENCE {SEQUENCE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_stamp_sync_seq'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# Expression indexes of 0007 and 0011, SQLite drops them whenever it
+# rebuilds a table to remove a column
+SQLITE_INDEXES = (
+    ('core_tag_user_name_prefix_idx', 'core_tag',
+     'user_id, name COLLATE NOCASE'),
+    ('core_ingredient_user_name_prefix_idx', 'core_ingredient',
+     'user_id, name COLLATE NOCASE'),
+    ('core_tag_name_search_idx', 'core_tag', 'name COLLATE NOCASE'),
+    ('core_ingredient_name_search_idx', 'core_ingredient',
+     'name COLLATE NOCASE'),
+)
+
+
+def restore_sqlite_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, table, columns in SQLITE_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+
+
+# Names are matched through the rows' (user_id, upper(name)) index
+# instead of the catalog, see core.names
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_sync_sequence'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='core_ingred_user_id_2047ab_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='core_tag_user_id_de4ebc_idx',
+        ),
+        migrations.RemoveField(
+            model_name='ingredient',
+            name='catalog',
+        ),
+        migrations.RemoveField(
+            model_name='tag',
+            name='catalog',
+        ),
+        migrations.DeleteModel(
+            name='CatalogEntry',
+        ),
+        migrations.RunPython(restore_sqlite_indexes, migrations.RunPython.noop),
+    ]
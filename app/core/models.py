@@ -1,9 +1,13 @@
+import binascii
 import uuid
 import os
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin)
 from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
 
 
 def recipe_image_file_path(instance, filename):
@@ -37,37 +41,227 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Set when the account is deleted, its rows are purged in the
+    # background by the purge_deleted command
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     objects = UserManager()
     USERNAME_FIELD = 'email'
 
 
-class Tag(models.Model):
+class ShardMap(models.Model):
+    """Database holding a user's rows, see core.sharding"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    shard = models.CharField(max_length=64)
+
+
+class AuthToken(models.Model):
+    """API token of one device of a user, see core.authentication
+
+    A token expires AUTH_TOKEN_TTL_SECONDS after it was last used. Logging
+    in again from the same device replaces its token.
+    """
+    key = models.CharField(max_length=40, primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='auth_tokens',
+    )
+    device = models.CharField(max_length=64, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    expires = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'device')
+
+    @staticmethod
+    def generate_key():
+        return binascii.hexlify(os.urandom(20)).decode()
+
+    def __str__(self):
+        return self.key
+
+
+class SyncSequence(models.Model):
+    """Allocator for the monotonic ``sync_seq`` of synced rows
+
+    PostgreSQL draws values from the ``core_sync_seq`` sequence, so writers
+    never wait on each other. They are drawn before commit and can commit
+    out of order, readers only rely on values up to ``watermark``. Other
+    databases allocate ids of this table, SQLite commits one writing
+    transaction at a time so its values also commit in order.
+    """
+    sequence = 'core_sync_seq'
+    # Pending checkpoints ``watermark`` keeps per database
+    checkpoints = 20
+
+    @classmethod
+    def next_value(cls, using='default'):
+        return cls.next_values(1, using)[0]
+
+    @classmethod
+    def next_values(cls, count, using='default'):
+        """``count`` increasing values, allocated by one query where the
+        backend allows
+
+        Called in the transaction writing the values.
+        """
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # The transaction gets its id before drawing values, which
+                # ``watermark`` relies on
+                cursor.execute('SELECT txid_current()')
+                cursor.execute(
+                    f"SELECT nextval('{cls.sequence}') "
+                    'FROM generate_series(1, %s)', [count])
+                return sorted(row[0] for row in cursor.fetchall())
+
+        sequence = cls.objects.using(using)
+        if connection.features.can_return_ids_from_bulk_insert:
+            values = sorted(
+                row.pk for row in sequence.bulk_create(
+                    cls() for _ in range(count)))
+        else:
+            values = [sequence.create().pk for _ in range(count)]
+        cls.objects.using(using).filter(pk__lt=values[-1]).delete()
+        return values
+
+    @classmethod
+    def last_value(cls, using='default'):
+        """Highest value allocated so far, 0 before the first"""
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT CASE WHEN is_called THEN last_value '
+                    f'ELSE last_value - 1 END FROM {cls.sequence}')
+                return cursor.fetchone()[0]
+        return cls.objects.using(using).aggregate(
+            last=models.Max('pk'))['last'] or 0
+
+    @classmethod
+    def advance(cls, value, using='default'):
+        """Make the next value allocated greater than ``value``"""
+        if cls.last_value(using) >= value:
+            return
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT setval('{cls.sequence}', %s)", [value])
+        else:
+            cls.objects.using(using).create(pk=value)
+
+    @classmethod
+    def watermark(cls, using='default'):
+        """Value up to which every allocating transaction has ended, None
+        where values commit in order
+
+        A checkpoint pairs the last value allocated with the next
+        transaction id. Transactions from that id on draw higher values,
+        so once the oldest running transaction is past it every value of
+        the checkpoint has committed or rolled back. Checkpoints are kept
+        in the cache for later calls while transactions older than the
+        newest one still run. Until one is reached, e.g. on the first call
+        of a process, the watermark is 0 and callers hold back every value.
+        """
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            return None
+        last = cls.last_value(using)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT txid_snapshot_xmin(snapshot), '
+                'txid_snapshot_xmax(snapshot) '
+                'FROM txid_current_snapshot() AS snapshot')
+            oldest, next_id = cursor.fetchone()
+
+        key = f'sync-checkpoints:{using}'
+        checkpoints = cache.get(key, []) + [(next_id, last)]
+        reached = [value for txid, value in checkpoints if txid <= oldest]
+        # The oldest pending checkpoints are the next to be reached
+        pending = [checkpoint for checkpoint in checkpoints
+                   if checkpoint[0] > oldest][:cls.checkpoints]
+        watermark = max(reached, default=0)
+        cache.set(key, [(0, watermark)] + pending, None)
+        return watermark
+
+
+class SyncedModel(models.Model):
+    """Per-user rows that offline clients sync by ``sync_seq``
+
+    Every save stamps the row with the next value of a global sequence,
+    so ``sync_seq > cursor`` selects exactly what changed since a client
+    last synced. Deletes leave a ``Tombstone`` carrying the same sequence.
+    """
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    sync_seq = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {
+                *kwargs['update_fields'], 'sync_seq', 'updated_at'}
+        with transaction.atomic(using=using, savepoint=False):
+            self.sync_seq = SyncSequence.next_value(using)
+            self.updated_at = timezone.now()
+            super().save(*args, **kwargs)
+
+
+class Tag(SyncedModel):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # Users live on the default database, rows on the user's shard
+        db_constraint=False,
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'sync_seq'])]
+
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(SyncedModel):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # Users live on the default database, rows on the user's shard
+        db_constraint=False,
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'sync_seq'])]
+
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeManager(models.Manager):
+    """Recipes that haven't been deleted"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class Recipe(SyncedModel):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # Users live on the default database, rows on the user's shard
+        db_constraint=False,
     )
     title = models.CharField(max_length=255)
     time_minutes = models.IntegerField()
@@ -76,6 +270,94 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # PostgreSQL full-text document for ``title``, see core.search
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Set by bulk deletes, see core.purge
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = RecipeManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sync_seq']),
+            # Range filters and ordering of a user's recipes, see
+            # recipe.filters.RecipeFilter
+            models.Index(fields=['user', 'time_minutes'],
+                         name='core_recipe_user_time_idx'),
+            models.Index(fields=['user', 'price'],
+                         name='core_recipe_user_price_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class Tombstone(models.Model):
+    """Marker left by a deleted ``SyncedModel`` row"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        # Users live on the default database, rows on the user's shard
+        db_constraint=False,
+    )
+    model = models.CharField(max_length=32)
+    object_id = models.IntegerField()
+    sync_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'sync_seq'])]
+
+
+class ObjectCount(models.Model):
+    """Number of a user's rows of one model, maintained by signals"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        # Users live on the default database, rows on the user's shard
+        db_constraint=False,
+    )
+    model = models.CharField(max_length=32)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'model')
+
+
+class RecipeStats(models.Model):
+    """Summary of a user's recipes, maintained by signals, see
+    core.stats"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        # Users live on the default database, rows on the user's shard
+        db_constraint=False,
+    )
+    count = models.BigIntegerField(default=0)
+    price_total = models.DecimalField(
+        max_digits=16, decimal_places=2, default=0)
+    price_min = models.DecimalField(
+        max_digits=5, decimal_places=2, null=True)
+    price_max = models.DecimalField(
+        max_digits=5, decimal_places=2, null=True)
+    # Set by changes that can't be applied incrementally, the summary is
+    # rebuilt when next read
+    stale = models.BooleanField(default=False)
+
+
+class RecipeStatsCount(models.Model):
+    """Number of a user's recipes in one cooking time bucket or with
+    one tag, see core.stats"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+    )
+    kind = models.CharField(max_length=8)
+    key = models.BigIntegerField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'kind', 'key')
+        indexes = [models.Index(fields=['user', 'kind', 'count'])]
@@ -0,0 +1,69 @@
+from django.db import connections, transaction
+from django.db.models.functions import Upper
+from django.dispatch import Signal
+
+from core.counts import adjust_count
+from core.models import SyncSequence
+
+
+# Sent with the ids of tags or ingredients created by
+# ``get_or_create_names``, which inserts them without the model signals
+names_created = Signal(providing_args=['user_id', 'ids', 'using'])
+
+
+def normalize(name):
+    """Key matching ``name`` whatever its case and runs of whitespace"""
+    return ' '.join(name.split()).upper()
+
+
+def lock_names(model, user_id, using):
+    """Block other ``get_or_create_names`` calls for ``user_id``'s
+    ``model`` rows until the current transaction ends
+
+    PostgreSQL only, SQLite runs one writing transaction at a time.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s), %s)',
+                           [model._meta.db_table, user_id])
+
+
+def get_or_create_names(model, user_id, names, using='default'):
+    """{normalized name: row} of ``user_id``'s tags or ingredients named
+    ``names``
+
+    The user's rows are read by one select, through the (user_id,
+    upper(name)) index, and the missing ones created by one bulk insert.
+    Users may have several rows of a name, the oldest is used. Concurrent
+    calls for the same user wait on ``lock_names`` so a name is never
+    created twice.
+    """
+    spellings = {}
+    for name in names:
+        spellings.setdefault(normalize(name), name)
+    if not spellings:
+        return {}
+
+    rows = model.objects.using(using).filter(user_id=user_id)
+    with transaction.atomic(using=using):
+        lock_names(model, user_id, using)
+        found = {}
+        for row in rows.annotate(key=Upper('name')).filter(
+                key__in=spellings).order_by('-pk'):
+            found[normalize(row.name)] = row
+        missing = [key for key in spellings if key not in found]
+        if missing:
+            sync_seqs = SyncSequence.next_values(len(missing), using)
+            model.objects.using(using).bulk_create([
+                model(user_id=user_id, name=spellings[key], sync_seq=sync_seq)
+                for key, sync_seq in zip(missing, sync_seqs)
+            ])
+            # SQLite doesn't return the ids of bulk inserts
+            created = list(rows.filter(sync_seq__in=sync_seqs))
+            found.update((normalize(row.name), row) for row in created)
+            adjust_count(model, user_id, len(created), using=using)
+            names_created.send(sender=model, user_id=user_id,
+                               ids=[row.pk for row in created], using=using)
+
+    return {key: found[key] for key in spellings}
@@ -0,0 +1,150 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from core import search
+from core.counts import adjust_count
+from core.models import AuthToken, User, Recipe, Tag, Ingredient, \
+    SyncSequence, Tombstone, RecipeStats, RecipeStatsCount
+
+
+# Sent with the ids of recipes hidden by ``soft_delete_recipes``, which
+# updates them without the model signals
+recipes_soft_deleted = Signal(providing_args=['ids', 'using'])
+
+
+def soft_delete_user(user):
+    """Deactivate ``user`` now and leave their rows to ``purge``"""
+    user.is_active = False
+    user.deleted_at = timezone.now()
+    user.save(update_fields=['is_active', 'deleted_at'])
+    AuthToken.objects.filter(user=user).delete()
+
+
+def soft_delete_recipes(queryset):
+    """Hide the recipes of ``queryset`` now and leave them to ``purge``
+
+    Returns the number of recipes marked.
+    """
+    rows = list(queryset.filter(
+        deleted_at__isnull=True).values_list('id', 'user_id'))
+    if not rows:
+        return 0
+
+    using = queryset.db
+    with transaction.atomic(using=using):
+        Recipe.all_objects.using(using).filter(
+            pk__in=[pk for pk, _ in rows]).update(deleted_at=timezone.now())
+        Tombstone.objects.using(using).bulk_create(
+            Tombstone(user_id=user_id, model='recipe', object_id=pk,
+                      sync_seq=sync_seq)
+            for (pk, user_id), sync_seq
+            in zip(rows, SyncSequence.next_values(len(rows), using))
+        )
+        for user_id, deleted in Counter(u for _, u in rows).items():
+            adjust_count(Recipe, user_id, -deleted, using=using)
+    recipes_soft_deleted.send(
+        sender=Recipe, ids=[pk for pk, _ in rows], using=using)
+    return len(rows)
+
+
+def _raw_delete(queryset):
+    """Delete with a single DELETE statement, skipping the collector
+    and the per-row signals it sends"""
+    return queryset._raw_delete(queryset.db)
+
+
+def _purge_recipes(ids, using, delete_images=True):
+    images = []
+    if delete_images:
+        images = list(Recipe.all_objects.using(using).filter(
+            pk__in=ids).exclude(image='').exclude(
+            image__isnull=True).values_list('image', flat=True))
+    with transaction.atomic(using=using):
+        for relation in (Recipe.tags, Recipe.ingredients):
+            _raw_delete(relation.through.objects.using(using).filter(
+                recipe_id__in=ids))
+        _raw_delete(Recipe.all_objects.using(using).filter(pk__in=ids))
+        search.unindex_recipes(ids, using=using)
+    for name in images:
+        default_storage.delete(name)
+
+
+def _purge_names(model, ids, using):
+    field = model._meta.model_name
+    through = getattr(Recipe, f'{field}s').through
+    with transaction.atomic(using=using):
+        _raw_delete(through.objects.using(using).filter(
+            **{f'{field}_id__in': ids}))
+        _raw_delete(model.objects.using(using).filter(pk__in=ids))
+
+
+def purge(batch_size=500, using='default', progress=None):
+    """Delete soft deleted recipes and users in batches of ``batch_size``
+
+    Every batch is a short transaction of set based deletes, so no lock
+    is held for long however large an account is. Rows are purged from
+    every shard in DATABASE_SHARDS, or from ``using`` when not sharded,
+    and users from ``using``. ``progress`` is called with (label, rows
+    deleted) after each batch. Returns the total number of rows deleted.
+    """
+    total = 0
+
+    def report(label, count):
+        nonlocal total
+        total += count
+        if progress:
+            progress(label, count)
+
+    user_ids = list(User.objects.using(using).filter(
+        deleted_at__isnull=False).values_list('id', flat=True))
+    for alias in getattr(settings, 'DATABASE_SHARDS', None) or [using]:
+        for label, count in _purge_shard(alias, user_ids, batch_size):
+            report(label, count)
+
+    # Only small rows are left, the regular cascade is cheap now. Users
+    # deleted since the shards were purged wait for the next run.
+    for user in User.objects.using(using).filter(pk__in=user_ids):
+        user.delete()
+        report('users', 1)
+
+    return total
+
+
+def _purge_shard(using, user_ids, batch_size):
+    """Delete soft deleted recipes and the rows of ``user_ids`` from
+    ``using``, yielding (label, rows deleted) per batch"""
+    recipes = Recipe.all_objects.using(using).filter(
+        Q(deleted_at__isnull=False) | Q(user_id__in=user_ids))
+    while True:
+        ids = list(recipes.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        _purge_recipes(ids, using)
+        yield 'recipes', len(ids)
+
+    for model in (Tag, Ingredient):
+        names = model.objects.using(using).filter(user_id__in=user_ids)
+        while True:
+            ids = list(names.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            _purge_names(model, ids, using)
+            yield model._meta.verbose_name_plural, len(ids)
+
+    tombstones = Tombstone.objects.using(using).filter(
+        user_id__in=user_ids)
+    while True:
+        ids = list(tombstones.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        _raw_delete(Tombstone.objects.using(using).filter(pk__in=ids))
+        yield 'tombstones', len(ids)
+
+    for model in (RecipeStats, RecipeStatsCount):
+        _raw_delete(model.objects.using(using).filter(user_id__in=user_ids))
@@ -0,0 +1,187 @@
+import random
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from core.sharding import shard_aliases, shard_for_user
+
+_state = threading.local()
+
+
+def use_shard(alias):
+    """Send the per-user queries of this thread that carry no instance
+    to ``alias``, the shard of the user making the request
+
+    Returns the previous alias, for callers to restore.
+    """
+    previous = getattr(_state, 'shard', None)
+    _state.shard = alias
+    return previous
+
+
+def use_replicas(enabled):
+    """Let reads on this thread go to replicas, off by default so
+    management commands, workers and the shell read from the primary"""
+    _state.use_replicas = enabled
+
+
+class ReplicaRouter:
+    """Send reads to the DATABASE_REPLICAS aliases and writes to default
+
+    Reads only go to a replica while ``use_replicas`` is enabled, which
+    ReplicaMiddleware does for safe requests of clients that haven't
+    written recently.
+    """
+    # Read on the primary, a client must be able to authenticate with the
+    # token or session it was just issued
+    primary_models = {
+        'core.user', 'core.authtoken', 'authtoken.token', 'sessions.session',
+    }
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if self.other_database(hints):
+            return self.other_database(hints)
+        if model._meta.label_lower in self.primary_models:
+            return 'default'
+        if replicas and getattr(_state, 'use_replicas', False):
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return self.other_database(hints) or 'default'
+
+    @staticmethod
+    def other_database(hints):
+        """Database of the instance hint when it isn't the primary or a
+        replica, such as a shard migrate is running on"""
+        instance = hints.get('instance')
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        aliases = {None, 'default', *replicas}
+        if instance is not None and instance._state.db not in aliases:
+            return instance._state.db
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {'default', *getattr(settings, 'DATABASE_REPLICAS', [])}
+        return obj1._state.db == obj2._state.db or (
+            obj1._state.db in aliases and obj2._state.db in aliases)
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas receive the schema through replication
+        return db not in getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ShardRouter:
+    """Send per-user rows to the shard of their user
+
+    Saves and related managers are routed by the instance involved, plain
+    querysets to the shard set with ``use_shard``. Users, tokens and the
+    shard map stay on the default database. Does nothing unless
+    DATABASE_SHARDS is set.
+    """
+    sharded_models = {
+        'recipe', 'tag', 'ingredient', 'recipe_tags', 'recipe_ingredients',
+        'tombstone', 'objectcount', 'syncsequence', 'recipestats',
+        'recipestatscount',
+    }
+
+    def is_sharded(self, model):
+        return model._meta.app_label == 'core' and \
+            model._meta.model_name in self.sharded_models
+
+    def db_for_shard(self, model, instance=None, **hints):
+        if not getattr(settings, 'DATABASE_SHARDS', None):
+            return None
+        if not self.is_sharded(model):
+            # The user of a per-user row, e.g. when its foreign key is
+            # validated, is on the default database and not the row's shard
+            if model is get_user_model() and instance is not None and \
+                    self.is_sharded(type(instance)):
+                return 'default'
+            return None
+        if instance is not None and self.is_sharded(type(instance)):
+            if instance._state.db:
+                return instance._state.db
+            if getattr(instance, 'user_id', None) is not None:
+                return shard_for_user(instance.user_id)
+        if isinstance(instance, get_user_model()):
+            return shard_for_user(instance.pk)
+        return getattr(_state, 'shard', None)
+
+    db_for_read = db_for_shard
+    db_for_write = db_for_shard
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not getattr(settings, 'DATABASE_SHARDS', None) or not (
+                self.is_sharded(type(obj1)) or self.is_sharded(type(obj2))):
+            return None
+        user_model = get_user_model()
+        return obj1._state.db == obj2._state.db or \
+            isinstance(obj1, user_model) or isinstance(obj2, user_model)
+
+
+class ReplicaMiddleware:
+    """Route safe requests to replicas, except for a client that wrote
+    in the last REPLICA_PIN_SECONDS so it reads its own writes
+
+    The pin is a signed cookie set by successful writes, logins and
+    signups included, so it holds whichever process serves the next
+    request.
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+    cookie_name = 'replica_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+    def __call__(self, request):
+        safe = request.method in self.safe_methods
+        use_replicas(safe and not self.pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replicas(False)
+
+        if not safe and response.status_code < 400:
+            response.set_signed_cookie(
+                self.cookie_name, '1', max_age=self.pin_seconds,
+                httponly=True, samesite='Lax')
+        return response
+
+    def pinned(self, request):
+        return request.get_signed_cookie(
+            self.cookie_name, default=None,
+            max_age=self.pin_seconds) is not None
+
+
+class AdminShardMiddleware:
+    """Send the admin's queries of per-user rows to one shard
+
+    Changelists can't merge the pages of several databases, so the admin
+    browses one shard at a time. It is picked with the ``shard`` changelist
+    filter and kept in the session for the change forms and autocompletes
+    that follow, the default database until one is picked.
+    """
+    session_key = 'admin_shard'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        aliases = shard_aliases()
+        if not aliases or not request.path.startswith(reverse('admin:index')):
+            return self.get_response(request)
+
+        alias = request.GET.get('shard')
+        if alias in aliases:
+            request.session[self.session_key] = alias
+        alias = request.session.get(self.session_key)
+        previous = use_shard(alias if alias in aliases else 'default')
+        try:
+            return self.get_response(request)
+        finally:
+            use_shard(previous)
@@ -0,0 +1,75 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    SearchVector
+from django.db import connections
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'core_recipe_fts'
+TOKEN_RE = re.compile(r'\w+')
+
+
+def is_postgres(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def fts_query(term):
+    """Quote every word of ``term`` so user input can't use FTS5 syntax"""
+    return ' '.join(f'"{token}"' for token in TOKEN_RE.findall(term))
+
+
+def index_recipe(recipe, using='default'):
+    """Refresh the search document of a saved recipe"""
+    if is_postgres(using):
+        type(recipe).objects.using(using).filter(pk=recipe.pk).update(
+            search_vector=SearchVector('title', config=SEARCH_CONFIG))
+        return
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title) VALUES (%s, %s)',
+            [recipe.pk, recipe.title])
+
+
+def unindex_recipes(recipe_ids, using='default'):
+    """Drop search documents of deleted recipes"""
+    if is_postgres(using) or not recipe_ids:
+        return
+
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            list(recipe_ids))
+
+
+def search_recipes(queryset, term):
+    """Filter ``queryset`` to recipes whose title matches ``term``,
+    best matches first
+
+    PostgreSQL ranks the GIN indexed ``search_vector`` column. Other
+    backends (SQLite in tests and local development) use the FTS5
+    table maintained next to ``core_recipe``.
+    """
+    if not TOKEN_RE.search(term):
+        return queryset.none()
+
+    if is_postgres(queryset.db):
+        query = SearchQuery(term, config=SEARCH_CONFIG)
+        return queryset.annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).filter(search_vector=query).order_by('-rank', '-id')
+
+    table = queryset.model._meta.db_table
+    rank = RawSQL(
+        f'SELECT -rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+        f'AND {FTS_TABLE}.rowid = "{table}"."id"',
+        [fts_query(term)],
+        output_field=FloatField()
+    )
+    return queryset.annotate(rank=rank).filter(
+        rank__isnull=False).order_by('-rank', '-id')
@@ -0,0 +1,190 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from core import search
+from core.bus import bus
+from core.models import ShardMap, SyncSequence, Recipe, Tag, Ingredient, \
+    Tombstone, ObjectCount, RecipeStats, RecipeStatsCount
+from core.purge import _purge_names, _purge_recipes, _raw_delete
+
+# Models whose ids are exposed by the API, every shard allocates them from
+# its own block so a user's rows keep their ids when moved
+ID_RANGE_MODELS = (Recipe, Tag, Ingredient)
+
+
+def shard_aliases():
+    """Database aliases holding per-user rows, empty when not sharded"""
+    return list(getattr(settings, 'DATABASE_SHARDS', []))
+
+
+def hash_shard(user_id, aliases=None):
+    """Shard of ``user_id`` by rendezvous hashing over ``aliases``
+
+    The placement only depends on the user id and the alias names, so it
+    is stable across processes, and adding a shard only moves the users
+    that now hash to the new one.
+    """
+    aliases = aliases or shard_aliases() or ['default']
+    return max(aliases, key=lambda alias: hashlib.sha256(
+        f'{alias}:{user_id}'.encode()).digest())
+
+
+def _cache_key(user_id):
+    return f'shard-map:{user_id}'
+
+
+def shard_for_user(user_id):
+    """Database holding the rows of ``user_id``
+
+    Users created before sharding was enabled have no entry in the map
+    and stay on the default database until rebalanced.
+    """
+    if not shard_aliases() or user_id is None:
+        return 'default'
+    key = _cache_key(user_id)
+    alias = cache.get(key)
+    if alias is None:
+        alias = mapped_shard(user_id)
+        cache.set(key, alias, settings.SHARD_MAP_CACHE_SECONDS)
+    return alias
+
+
+def mapped_shard(user_id):
+    """Uncached shard of ``user_id`` according to the shard map"""
+    alias = ShardMap.objects.using('default').filter(
+        user_id=user_id).values_list('shard', flat=True).first()
+    return alias or 'default'
+
+
+def assign_shard(user):
+    """Place a new user on the shard their id hashes to"""
+    ShardMap.objects.using('default').get_or_create(
+        user_id=user.pk, defaults={'shard': hash_shard(user.pk)})
+
+
+def forget(user_id):
+    """Drop the cached shard of ``user_id`` here and in the other
+    processes"""
+    cache.delete(_cache_key(user_id))
+    bus.publish('shard-map', [user_id])
+
+
+bus.subscribe('shard-map', lambda keys: cache.delete_many(
+    [_cache_key(key) for key in keys]))
+
+
+def advance_sequence(table, using, value):
+    """Make the next id allocated for ``table`` greater than ``value``"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT pg_get_serial_sequence(%s, 'id')", [table])
+            sequence = cursor.fetchone()[0]
+            cursor.execute(f'SELECT last_value FROM {sequence}')
+            if cursor.fetchone()[0] < value:
+                cursor.execute('SELECT setval(%s, %s)', [sequence, value])
+            return
+
+        cursor.execute(
+            'SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                [table, value])
+        elif row[0] < value:
+            cursor.execute(
+                'UPDATE sqlite_sequence SET seq = %s WHERE name = %s',
+                [value, table])
+
+
+def reserve_id_ranges(using):
+    """Start the ids of ``using`` at its block of SHARD_ID_BLOCK ids"""
+    aliases = shard_aliases()
+    if using not in aliases:
+        return
+    start = aliases.index(using) * settings.SHARD_ID_BLOCK
+    for model in ID_RANGE_MODELS:
+        advance_sequence(model._meta.db_table, using, start)
+
+
+def _copy(queryset, target, batch_size, keep_pk=True):
+    """Insert the rows of ``queryset`` into ``target`` in batches"""
+    model = queryset.model
+    copied = last = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last).order_by('pk')[:batch_size])
+        if not rows:
+            return copied
+        last = rows[-1].pk
+        if not keep_pk:
+            for row in rows:
+                row.pk = None
+        model._base_manager.using(target).bulk_create(rows)
+        copied += len(rows)
+
+
+def _delete_user_rows(user_id, using, batch_size):
+    """Delete the rows of ``user_id`` from ``using`` without touching
+    shared files such as recipe images"""
+    recipes = Recipe._base_manager.using(using).filter(user_id=user_id)
+    while True:
+        ids = list(recipes.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        _purge_recipes(ids, using, delete_images=False)
+
+    for model in (Tag, Ingredient):
+        names = model.objects.using(using).filter(user_id=user_id)
+        while True:
+            ids = list(names.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            _purge_names(model, ids, using)
+
+    for model in (Tombstone, ObjectCount, RecipeStats, RecipeStatsCount):
+        _raw_delete(model.objects.using(using).filter(user_id=user_id))
+
+
+def move_user(user_id, target, batch_size=500):
+    """Copy the rows of ``user_id`` to the ``target`` shard, point the
+    shard map at it, then delete them from the old shard
+
+    Writes the user makes during the move are lost, callers stop the user
+    from writing first (see the rebalance_shards command). Returns the
+    number of recipes, tags and ingredients moved.
+    """
+    source = mapped_shard(user_id)
+    if source == target:
+        return 0
+
+    moved = 0
+    with transaction.atomic(using=target):
+        # Rows changed after the move must sort after everything the
+        # user's clients already synced from the old shard
+        SyncSequence.advance(SyncSequence.last_value(source), target)
+
+        for model in ID_RANGE_MODELS:
+            moved += _copy(model._base_manager.using(source).filter(
+                user_id=user_id), target, batch_size)
+        for relation in (Recipe.tags, Recipe.ingredients):
+            _copy(relation.through.objects.using(source).filter(
+                recipe__user_id=user_id), target, batch_size, keep_pk=False)
+        for model in (Tombstone, ObjectCount, RecipeStats,
+                      RecipeStatsCount):
+            _copy(model.objects.using(source).filter(user_id=user_id),
+                  target, batch_size, keep_pk=False)
+
+        for recipe in Recipe.objects.using(target).filter(
+                user_id=user_id).only('id', 'title'):
+            search.index_recipe(recipe, using=target)
+
+    ShardMap.objects.using('default').update_or_create(
+        user_id=user_id, defaults={'shard': target})
+    forget(user_id)
+    _delete_user_rows(user_id, source, batch_size)
+    return moved
@@ -0,0 +1,213 @@
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db.models import Count
+from django.db.models.signals import post_init, post_save, pre_delete, \
+    post_delete, m2m_changed, post_migrate
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import search, sharding, stats
+from core.counts import adjust_count
+from core.purge import recipes_soft_deleted
+from core.models import User, Recipe, Tag, Ingredient, SyncSequence, \
+    Tombstone
+
+# Users whose delete is cascading, their rows need no tombstones
+_deleting_users = set()
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, using, update_fields=None, **kwargs):
+    """Keep the title search document in sync with the recipe"""
+    if update_fields is None or 'title' in update_fields:
+        search.index_recipe(instance, using=using)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, using, **kwargs):
+    search.unindex_recipes([instance.pk], using=using)
+
+
+@receiver(post_save, sender=User)
+def assign_shard(sender, instance, created, **kwargs):
+    if created:
+        sharding.assign_shard(instance)
+
+
+@receiver(post_migrate)
+def reserve_id_ranges(sender, using, **kwargs):
+    if sender.name == 'core':
+        sharding.reserve_id_ranges(using)
+
+
+@receiver(pre_delete, sender=User)
+def start_user_delete(sender, instance, **kwargs):
+    _deleting_users.add(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def finish_user_delete(sender, instance, **kwargs):
+    _deleting_users.discard(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def create_tombstone(sender, instance, using, **kwargs):
+    """Remember deletes so syncing clients can drop their copy"""
+    if instance.user_id in _deleting_users:
+        return
+    Tombstone.objects.using(using).create(
+        user_id=instance.user_id,
+        model=sender._meta.model_name,
+        object_id=instance.pk,
+        sync_seq=SyncSequence.next_value(using)
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipes(sender, instance, action, reverse, pk_set, using,
+                  **kwargs):
+    """Linking or unlinking tags and ingredients changes the recipe"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # Every recipe gets its own sequence value so a sync page never ends
+    # between two rows sharing one
+    for recipe_id in (pk_set or ()) if reverse else [instance.pk]:
+        Recipe.objects.using(using).filter(pk=recipe_id).update(
+            sync_seq=SyncSequence.next_value(using),
+            updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def count_created(sender, instance, created, using, **kwargs):
+    if created:
+        adjust_count(sender, instance.user_id, 1, using=using)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def count_deleted(sender, instance, using, **kwargs):
+    # Soft deleted recipes were uncounted when they were marked
+    if instance.user_id in _deleting_users or \
+            getattr(instance, 'deleted_at', None) is not None:
+        return
+    adjust_count(sender, instance.user_id, -1, using=using)
+
+
+# Recipe fields summarized by core.stats
+STATS_FIELDS = ('deleted_at', 'price', 'time_minutes')
+
+
+def stats_values(instance):
+    """(live, (price, time_minutes)) of a recipe as summarized, None when
+    a field wasn't loaded"""
+    if any(name not in instance.__dict__ for name in STATS_FIELDS):
+        return None
+    return (instance.deleted_at is None,
+            (Decimal(str(instance.price)), instance.time_minutes))
+
+
+@receiver(post_init, sender=Recipe)
+def remember_stats_values(sender, instance, **kwargs):
+    instance._stats_values = stats_values(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def summarize_saved(sender, instance, created, using, update_fields=None,
+                    **kwargs):
+    old, new = instance._stats_values, stats_values(instance)
+    instance._stats_values = new
+    if created:
+        if new and new[0]:
+            stats.adjust(instance.user_id, using, added=[new[1]])
+        elif new is None:
+            stats.mark_stale(instance.user_id, using)
+        return
+    if update_fields is not None and \
+            not set(update_fields) & set(STATS_FIELDS):
+        return
+    if old is None or new is None or old[0] != new[0]:
+        # Showing or hiding a recipe changes its tags' counts too
+        stats.mark_stale(instance.user_id, using)
+    elif new[0] and old[1] != new[1]:
+        stats.adjust(instance.user_id, using,
+                     added=[new[1]], removed=[old[1]])
+
+
+@receiver(pre_delete, sender=Recipe)
+def summarize_deleted(sender, instance, using, **kwargs):
+    if instance.user_id in _deleting_users or \
+            instance.deleted_at is not None:
+        return
+    values = stats_values(instance)
+    if values is None:
+        stats.mark_stale(instance.user_id, using)
+        return
+    stats.adjust(instance.user_id, using, removed=[values[1]])
+    # Its links are deleted without m2m_changed
+    stats.adjust_counts(instance.user_id, stats.TAG, Counter({
+        tag_id: -1 for tag_id in Recipe.tags.through.objects.using(
+            using).filter(recipe_id=instance.pk).values_list(
+            'tag_id', flat=True)
+    }), using)
+
+
+@receiver(recipes_soft_deleted, sender=Recipe)
+def summarize_soft_deleted(sender, ids, using, **kwargs):
+    removed = defaultdict(list)
+    for user_id, price, minutes in Recipe.all_objects.using(using).filter(
+            pk__in=ids).values_list('user_id', 'price', 'time_minutes'):
+        removed[user_id].append((price, minutes))
+    for user_id, values in removed.items():
+        stats.adjust(user_id, using, removed=values)
+
+    tags = defaultdict(Counter)
+    for user_id, tag_id, count in Recipe.tags.through.objects.using(
+            using).filter(recipe_id__in=ids).values_list(
+            'recipe__user_id', 'tag_id').annotate(
+            count=Count('id')).order_by():
+        tags[user_id][tag_id] -= count
+    for user_id, deltas in tags.items():
+        stats.adjust_counts(user_id, stats.TAG, deltas, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def summarize_tags(sender, instance, action, reverse, pk_set, using,
+                   **kwargs):
+    """Count the live recipes of each tag"""
+    links = sender.objects.using(using).filter(
+        recipe__deleted_at__isnull=True)
+    if not reverse:
+        if instance.deleted_at is not None:
+            return
+        links = links.filter(recipe_id=instance.pk)
+        if action == 'post_add':
+            deltas = Counter(pk_set)
+        elif action in ('pre_remove', 'pre_clear'):
+            if action == 'pre_remove':
+                links = links.filter(tag_id__in=pk_set)
+            deltas = Counter({
+                pk: -1 for pk in links.values_list('tag_id', flat=True)})
+        else:
+            return
+    elif action == 'pre_clear':
+        stats.forget_tag(instance, using)
+        return
+    elif action in ('post_add', 'pre_remove'):
+        count = links.filter(tag_id=instance.pk, recipe_id__in=pk_set).count()
+        deltas = {instance.pk: count if action == 'post_add' else -count}
+    else:
+        return
+    stats.adjust_counts(instance.user_id, stats.TAG, deltas, using)
+
+
+@receiver(pre_delete, sender=Tag)
+def forget_tag_stats(sender, instance, using, **kwargs):
+    stats.forget_tag(instance, using)
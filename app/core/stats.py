@@ -0,0 +1,174 @@
+from bisect import bisect_right
+from collections import Counter
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Max, Min, Q, Sum, \
+    Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from core.models import Recipe, RecipeStats, RecipeStatsCount, Tag
+
+# Lower bounds of the cooking time histogram buckets, in minutes.
+# Changing them requires running rebuild_recipe_stats.
+TIME_BUCKETS = (0, 15, 30, 60, 120)
+TIME = 'time'
+TAG = 'tag'
+CENT = Decimal('0.01')
+
+
+def time_bucket(minutes):
+    return max(bisect_right(TIME_BUCKETS, minutes) - 1, 0)
+
+
+def rebuild(user_id, using='default'):
+    """Recompute the summary of ``user_id``'s recipes from the recipes"""
+    buckets = {}
+    for position, low in enumerate(TIME_BUCKETS):
+        bucket = Q()
+        if position:
+            bucket &= Q(time_minutes__gte=low)
+        if position + 1 < len(TIME_BUCKETS):
+            bucket &= Q(time_minutes__lt=TIME_BUCKETS[position + 1])
+        buckets[f'time{position}'] = Count('id', filter=bucket)
+
+    with transaction.atomic(using=using):
+        totals = Recipe.objects.using(using).filter(
+            user_id=user_id).aggregate(
+            count=Count('id'), price_total=Sum('price'),
+            price_min=Min('price'), price_max=Max('price'), **buckets)
+        tags = Recipe.tags.through.objects.using(using).filter(
+            recipe__user_id=user_id, recipe__deleted_at__isnull=True
+        ).values_list('tag_id').annotate(count=Count('id')).order_by()
+
+        stats, _ = RecipeStats.objects.using(using).update_or_create(
+            user_id=user_id, defaults={
+                'count': totals['count'],
+                'price_total': totals['price_total'] or 0,
+                'price_min': totals['price_min'],
+                'price_max': totals['price_max'],
+                'stale': False,
+            })
+        RecipeStatsCount.objects.using(using).filter(
+            user_id=user_id).delete()
+        RecipeStatsCount.objects.using(using).bulk_create([
+            RecipeStatsCount(user_id=user_id, kind=TIME, key=position,
+                             count=totals[f'time{position}'])
+            for position in range(len(TIME_BUCKETS))
+            if totals[f'time{position}']
+        ] + [
+            RecipeStatsCount(user_id=user_id, kind=TAG, key=tag_id,
+                             count=count)
+            for tag_id, count in tags
+        ])
+    return stats
+
+
+def money(value):
+    """Prices as the recipe serializers render them"""
+    return None if value is None else str(value.quantize(CENT))
+
+
+def get_stats(user_id, using='default', top_tags=10):
+    """Summary of ``user_id``'s recipes, built on first use"""
+    stats = RecipeStats.objects.using(using).filter(user_id=user_id).first()
+    if stats is None or stats.stale:
+        stats = rebuild(user_id, using)
+
+    counts = RecipeStatsCount.objects.using(using).filter(user_id=user_id)
+    times = dict(counts.filter(kind=TIME).values_list('key', 'count'))
+    tags = list(counts.filter(kind=TAG, count__gt=0).order_by(
+        '-count', 'key').values_list('key', 'count')[:top_tags])
+    names = dict(Tag.objects.using(using).filter(
+        pk__in=[key for key, _ in tags]).values_list('id', 'name'))
+
+    return {
+        'count': stats.count,
+        'price': {
+            'average': money(stats.price_total / stats.count)
+            if stats.count else None,
+            'min': money(stats.price_min),
+            'max': money(stats.price_max),
+        },
+        'time_minutes': [
+            {'min': low,
+             'max': TIME_BUCKETS[position + 1] - 1
+             if position + 1 < len(TIME_BUCKETS) else None,
+             'count': times.get(position, 0)}
+            for position, low in enumerate(TIME_BUCKETS)
+        ],
+        'top_tags': [
+            {'id': key, 'name': names.get(key), 'count': count}
+            for key, count in tags
+        ],
+    }
+
+
+def mark_stale(user_id, using='default'):
+    RecipeStats.objects.using(using).filter(user_id=user_id).update(
+        stale=True)
+
+
+def adjust(user_id, using='default', added=(), removed=()):
+    """Apply recipes ``added`` to and ``removed`` from the summary, both
+    lists of (price, time_minutes) pairs
+
+    Summaries are created by ``get_stats``, a user without one is skipped.
+    """
+    added, removed = list(added), list(removed)
+    if not added and not removed:
+        return
+    price = DecimalField(max_digits=5, decimal_places=2)
+    updates = {
+        'count': F('count') + len(added) - len(removed),
+        'price_total': F('price_total') + sum(p for p, _ in added) -
+        sum(p for p, _ in removed),
+    }
+    if added:
+        low = Value(min(p for p, _ in added), output_field=price)
+        high = Value(max(p for p, _ in added), output_field=price)
+        updates['price_min'] = Least(Coalesce('price_min', low), low)
+        updates['price_max'] = Greatest(Coalesce('price_max', high), high)
+
+    stats = RecipeStats.objects.using(using).filter(user_id=user_id)
+    if not stats.update(**updates):
+        return
+    if removed:
+        current = stats.values_list('price_min', 'price_max').first()
+        if current[0] is None or \
+                min(p for p, _ in removed) <= current[0] or \
+                max(p for p, _ in removed) >= current[1]:
+            # The old extreme may be gone, read it back from the
+            # (user, price) index
+            stats.update(**Recipe.objects.using(using).filter(
+                user_id=user_id).aggregate(
+                price_min=Min('price'), price_max=Max('price')))
+
+    buckets = Counter(time_bucket(t) for _, t in added)
+    buckets.subtract(time_bucket(t) for _, t in removed)
+    adjust_counts(user_id, TIME, buckets, using)
+
+
+def adjust_counts(user_id, kind, deltas, using='default'):
+    """Add the deltas of a {key: delta} mapping to the counts of
+    ``kind``"""
+    counts = RecipeStatsCount.objects.using(using).filter(
+        user_id=user_id, kind=kind)
+    for key, delta in deltas.items():
+        if not delta or counts.filter(key=key).update(
+                count=F('count') + delta):
+            continue
+        if not RecipeStats.objects.using(using).filter(
+                user_id=user_id).exists():
+            return
+        try:
+            with transaction.atomic(using=using):
+                RecipeStatsCount.objects.using(using).create(
+                    user_id=user_id, kind=kind, key=key, count=delta)
+        except IntegrityError:
+            counts.filter(key=key).update(count=F('count') + delta)
+
+
+def forget_tag(tag, using='default'):
+    RecipeStatsCount.objects.using(using).filter(
+        user_id=tag.user_id, kind=TAG, key=tag.pk).delete()
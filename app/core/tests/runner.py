@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Keep reads on the primary while testing
+
+    Test cases run in a transaction the replica connections can't see.
+    Tests of replica reads opt back in with
+    ``override_settings(DATABASE_REPLICAS=[...])``.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.DATABASE_REPLICAS = []
@@ -1,9 +1,22 @@
-from django.test import Client, TestCase
+from contextlib import ExitStack
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core import models
+from core.counts import EstimatedCountPaginator
+from core.routers import AdminShardMiddleware
+from core.tests.utils import ShardedTestCase
+
 
-class AdminSiteTests(TestCase):
+class AdminSiteTests(ShardedTestCase):
     def setUp(self):
         self.client = Client()
         self.admin_user = get_user_model().objects.create_superuser(
@@ -16,6 +29,10 @@ class AdminSiteTests(TestCase):
             password='Password@2019',
             name='Test user'
         )
+        # Browse the shard the rows of the test users are on
+        session = self.client.session
+        session[AdminShardMiddleware.session_key] = self.shard
+        session.save()
 
     def test_users_listed(self):
         url = reverse('admin:core_user_changelist')
@@ -33,3 +50,124 @@ class AdminSiteTests(TestCase):
         url = reverse('admin:core_user_add')
         res = self.client.get(url)
         self.assertEqual(res.status_code, 200)
+
+    def test_delete_user_is_soft(self):
+        url = reverse('admin:core_user_delete', args=[self.user.id])
+        res = self.client.post(url, {'post': 'yes'})
+
+        self.user.refresh_from_db()
+        self.assertEqual(res.status_code, 302)
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deleted_at)
+
+    def test_recipe_change_page_does_not_render_all_options(self):
+        tag = models.Tag.objects.create(user=self.user, name='Rare tag')
+        recipe = models.Recipe.objects.create(
+            user=self.user, title='Recipe', time_minutes=5, price=10)
+        recipe.tags.add(tag)
+        models.Tag.objects.create(user=self.user, name='Unrelated tag')
+
+        url = reverse('admin:core_recipe_change', args=[recipe.id])
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'Rare tag')
+        self.assertNotContains(res, 'Unrelated tag')
+
+    def test_tag_added_from_admin(self):
+        url = reverse('admin:core_tag_add')
+
+        res = self.client.post(url, {'name': 'Vegan', 'user': self.user.id})
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(models.Tag.objects.get().name, 'Vegan')
+
+    def test_recipe_changelist_queries_constant(self):
+        def changelist_queries():
+            url = reverse('admin:core_recipe_changelist')
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(
+                        CaptureQueriesContext(connections[alias]))
+                    for alias in {'default', self.shard}
+                ]
+                res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+            return sum(len(queries) for queries in captured)
+
+        users = [
+            get_user_model().objects.create_user(f'u{i}@email.com', 'pw')
+            for i in range(5)
+        ]
+        models.Recipe.objects.create(
+            user=users[0], title='Recipe', time_minutes=5, price=10)
+        one = changelist_queries()
+        for user in users:
+            models.Recipe.objects.create(
+                user=user, title='Recipe', time_minutes=5, price=10)
+
+        self.assertEqual(changelist_queries(), one)
+
+    def test_admin_search(self):
+        models.Tag.objects.create(user=self.user, name='Vegan')
+        models.Tag.objects.create(user=self.user, name='Dessert')
+
+        url = reverse('admin:core_tag_changelist')
+        res = self.client.get(url, {'q': 'veg'})
+
+        self.assertContains(res, 'Vegan')
+        self.assertNotContains(res, 'Dessert')
+
+    @override_settings(COUNT_EXACT_LIMIT=1)
+    def test_paginator_uses_estimate_for_large_tables(self):
+        queryset = get_user_model().objects.order_by('id')
+        with patch('core.counts.planner_estimate', return_value=10 ** 7):
+            self.assertEqual(
+                EstimatedCountPaginator(queryset, 100).count, 10 ** 7)
+        with override_settings(COUNT_EXACT_LIMIT=10):
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 2)
+
+
+@skipUnless('shard1' in settings.DATABASES,
+            'Needs a second shard, e.g. DB_ENGINE=sqlite DB_SHARDS=2')
+@override_settings(DATABASE_SHARDS=['default', 'shard1'])
+class ShardedAdminTests(TestCase):
+    databases = {'default', 'shard1'}
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(get_user_model().objects.create_superuser(
+            email='admin@email.com', password='Password@2019'))
+        self.user = get_user_model().objects.create_user(
+            email='user@email.com', password='Password@2019')
+        models.ShardMap.objects.filter(user=self.user).update(shard='shard1')
+        cache.clear()
+
+    def test_changelist_shows_picked_shard(self):
+        tag = models.Tag.objects.using('shard1').create(
+            user=self.user, name='Vegan')
+        url = reverse('admin:core_tag_changelist')
+
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotContains(res, 'Vegan')
+
+        res = self.client.get(url, {'shard': 'shard1'})
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'Vegan')
+
+        # The picked shard is kept for the change form
+        res = self.client.get(reverse('admin:core_tag_change',
+                                      args=[tag.id]))
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'Vegan')
+
+    def test_recipe_changelist_lists_users_of_shard(self):
+        models.Recipe.objects.using('shard1').create(
+            user=self.user, title='Soup', time_minutes=5, price=5)
+
+        res = self.client.get(reverse('admin:core_recipe_changelist'),
+                              {'shard': 'shard1'})
+
+        self.assertContains(res, 'Soup')
+        self.assertContains(res, 'user@email.com')
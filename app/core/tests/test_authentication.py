@@ -0,0 +1,127 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import QuerySet
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.authentication import issue_token
+from core.models import AuthToken
+from core.tests.utils import ShardedTestCase
+from user import throttling
+
+ME_ROUTE = reverse('user:me')
+
+
+class ExpiringTokenAuthenticationTests(ShardedTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'admin@email.com', 'password123')
+        self.client = APIClient()
+
+    def get_me(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return self.client.get(ME_ROUTE)
+
+    def test_valid_token_authenticates(self):
+        res = self.get_me(issue_token(self.user))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], 'admin@email.com')
+
+    def test_expired_token_rejected(self):
+        token = issue_token(self.user)
+        AuthToken.objects.update(expires=timezone.now())
+
+        res = self.get_me(token)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_TTL_SECONDS=7200,
+                       AUTH_TOKEN_REFRESH_SECONDS=600)
+    def test_expiry_slides_on_use(self):
+        token = issue_token(self.user)
+        soon = timezone.now() + timedelta(seconds=60)
+        AuthToken.objects.update(expires=soon)
+
+        self.get_me(token)
+
+        token.refresh_from_db()
+        self.assertGreater(
+            token.expires, timezone.now() + timedelta(seconds=7000))
+
+    @override_settings(AUTH_TOKEN_REFRESH_SECONDS=600)
+    def test_recent_expiry_not_rewritten(self):
+        token = issue_token(self.user)
+        self.get_me(token)
+
+        with self.assertNumQueries(1):
+            self.get_me(token)
+
+    def test_token_per_device(self):
+        phone = issue_token(self.user, 'phone')
+        laptop = issue_token(self.user, 'laptop')
+        new_phone = issue_token(self.user, 'phone')
+
+        self.assertEqual(
+            set(AuthToken.objects.values_list('key', flat=True)),
+            {laptop.key, new_phone.key})
+        self.assertEqual(
+            self.get_me(phone).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get_me(laptop).status_code, status.HTTP_200_OK)
+
+    def test_concurrent_logins_of_device_share_token(self):
+        other = issue_token(self.user, 'phone')
+
+        # The other login creates its token after this one deleted the old
+        with patch.object(QuerySet, 'delete', return_value=(0, {})):
+            token = issue_token(self.user, 'phone')
+
+        self.assertEqual(token.key, other.key)
+        self.assertEqual(AuthToken.objects.count(), 1)
+
+    @override_settings(AUTH_TOKENS_PER_USER=2)
+    def test_tokens_per_user_limited(self):
+        for device in ['a', 'b', 'c']:
+            issue_token(self.user, device)
+
+        self.assertEqual(
+            sorted(AuthToken.objects.values_list('device', flat=True)),
+            ['b', 'c'])
+
+    def test_login_issues_device_token(self):
+        throttling.store.clear()
+        payload = {'email': 'admin@email.com', 'password': 'password123'}
+
+        res = self.client.post(
+            reverse('user:token'), dict(payload, device='phone'))
+        self.client.post(reverse('user:token'), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('expires', res.data)
+        self.assertEqual(
+            AuthToken.objects.get(device='phone').key, res.data['token'])
+        self.assertEqual(AuthToken.objects.count(), 2)
+
+
+class PurgeTokensCommandTests(ShardedTestCase):
+    def test_expired_tokens_deleted_in_batches(self):
+        users = [get_user_model().objects.create_user(
+            f'user{i}@email.com', 'password123') for i in range(5)]
+        for user in users:
+            issue_token(user)
+        AuthToken.objects.filter(user__in=users[:3]).update(
+            expires=timezone.now() - timedelta(seconds=1))
+        out = StringIO()
+
+        call_command('purge_tokens', '--batch-size', '2', stdout=out)
+
+        self.assertEqual(AuthToken.objects.count(), 2)
+        self.assertEqual(out.getvalue().count('Deleted'), 2)
+        self.assertIn('Purged 3 expired tokens', out.getvalue())
@@ -0,0 +1,99 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from core.bus import InvalidationBus
+
+# Subscribes in another process and prints the first keys it receives
+SUBSCRIBER = '''
+import sys, threading
+from core.bus import InvalidationBus
+received = threading.Event()
+bus = InvalidationBus(sys.argv[1])
+bus.subscribe('test', lambda keys: (print(*keys, flush=True),
+                                    received.set()))
+print('ready', flush=True)
+received.wait(10)
+bus.stop()
+'''
+
+
+class InvalidationBusTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.buses = []
+
+    def tearDown(self):
+        for bus in self.buses:
+            bus.stop()
+
+    def make_bus(self):
+        bus = InvalidationBus(self.directory)
+        self.buses.append(bus)
+        return bus
+
+    def test_publish_reaches_other_subscribers(self):
+        publisher, subscriber = self.make_bus(), self.make_bus()
+        received = []
+        delivered = threading.Event()
+
+        def callback(keys):
+            received.extend(keys)
+            delivered.set()
+        subscriber.subscribe('recipe', callback)
+        publisher.start()
+
+        publisher.publish('recipe', [1, 2])
+
+        self.assertTrue(delivered.wait(2))
+        self.assertEqual(received, ['1', '2'])
+
+    def test_publish_reaches_other_processes(self):
+        child = subprocess.Popen(
+            [sys.executable, '-c', SUBSCRIBER, self.directory],
+            cwd=settings.BASE_DIR, stdout=subprocess.PIPE, text=True)
+        try:
+            self.assertEqual(child.stdout.readline().strip(), 'ready')
+
+            self.make_bus().publish('test', ['key'])
+
+            self.assertEqual(child.stdout.readline().strip(), 'key')
+        finally:
+            child.kill()
+            child.wait()
+            child.stdout.close()
+
+    def test_sockets_of_dead_processes_removed(self):
+        path = os.path.join(self.directory, 'dead.sock')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.bind(path)
+
+        self.make_bus().publish('recipe', [1])
+
+        self.assertFalse(os.path.exists(path))
+
+    def test_disabled_without_directory(self):
+        bus = InvalidationBus()
+
+        with self.settings(INVALIDATION_BUS_DIR=None):
+            bus.subscribe('recipe', print)
+            bus.publish('recipe', [1])
+
+        self.assertIsNone(bus._socket)
+
+    def test_disabled_when_socket_cannot_be_bound(self):
+        # A directory below a regular file can't be created
+        directory = os.path.join(tempfile.mkstemp()[1], 'bus')
+        bus = InvalidationBus(directory)
+
+        with self.assertLogs('core.bus', 'WARNING'):
+            bus.subscribe('recipe', print)
+        bus.publish('recipe', [1])
+
+        self.assertIsNone(bus._socket)
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.test import override_settings
+
+from core import models
+from core.counts import count, cached_count, adjust_count
+from core.purge import soft_delete_recipes
+from core.tests.utils import ShardedTestCase
+
+
+def sample_recipe(user):
+    return models.Recipe.objects.create(
+        user=user, title='Recipe title', time_minutes=7, price=30)
+
+
+class CountTests(ShardedTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'admin@email.com', 'password123')
+
+    def test_counters_follow_writes(self):
+        recipes = [sample_recipe(self.user) for _ in range(3)]
+        models.Tag.objects.create(user=self.user, name='tag')
+        self.assertEqual(
+            cached_count(models.Recipe, self.user.id, self.shard), 3)
+        self.assertEqual(cached_count(models.Tag, self.user.id, self.shard), 1)
+
+        recipes[0].delete()
+        soft_delete_recipes(models.Recipe.objects.filter(pk=recipes[1].pk))
+
+        self.assertEqual(
+            cached_count(models.Recipe, self.user.id, self.shard), 1)
+
+    def test_counter_seeded_from_existing_rows(self):
+        sample_recipe(self.user)
+        models.ObjectCount.objects.all().delete()
+
+        sample_recipe(self.user)
+
+        self.assertEqual(
+            cached_count(models.Recipe, self.user.id, self.shard), 2)
+
+    def test_delta_applied_when_seeded_concurrently(self):
+        sample_recipe(self.user)
+        update = QuerySet.update
+
+        def seeded_concurrently(queryset, **kwargs):
+            # Another transaction seeds the count, without the new row
+            if not models.ObjectCount.objects.exists():
+                models.ObjectCount.objects.create(
+                    user=self.user, model='recipe', count=1)
+                return 0
+            return update(queryset, **kwargs)
+
+        models.ObjectCount.objects.all().delete()
+        with patch.object(QuerySet, 'update', autospec=True,
+                          side_effect=seeded_concurrently):
+            adjust_count(models.Recipe, self.user.id, 1, using=self.shard)
+
+        self.assertEqual(
+            cached_count(models.Recipe, self.user.id, self.shard), 2)
+
+    @override_settings(COUNT_EXACT_LIMIT=2)
+    def test_exact_count_below_limit(self):
+        sample_recipe(self.user)
+        models.ObjectCount.objects.update(count=0)
+
+        queryset = models.Recipe.objects.filter(user=self.user)
+        self.assertEqual(count(queryset, (models.Recipe, self.user.id)), 1)
+
+    @override_settings(COUNT_EXACT_LIMIT=2)
+    def test_counter_used_above_limit(self):
+        for _ in range(3):
+            sample_recipe(self.user)
+        models.ObjectCount.objects.update(count=100)
+
+        queryset = models.Recipe.objects.filter(user=self.user)
+        self.assertEqual(count(queryset, (models.Recipe, self.user.id)), 100)
+        self.assertEqual(count(queryset), 3)
+        with patch('core.counts.planner_estimate', return_value=50):
+            self.assertEqual(count(queryset), 50)
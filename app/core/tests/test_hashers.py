@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import throttling
+
+
+class PBKDF2PasswordHasherTests(TestCase):
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_iterations_configurable(self):
+        self.assertTrue(
+            make_password('password123').startswith('pbkdf2_sha256$1000$'))
+
+    def test_hash_updated_on_login(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            user = get_user_model().objects.create_user(
+                'admin@email.com', 'password123')
+
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            self.assertTrue(user.check_password('password123'))
+
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_other_algorithm_upgraded_on_token_login(self):
+        throttling.store.clear()
+        user = get_user_model().objects.create_user(
+            'admin@email.com', 'password123')
+        user.password = make_password('password123', hasher='pbkdf2_sha1')
+        user.save()
+
+        res = APIClient().post(reverse('user:token'), {
+            'email': 'admin@email.com', 'password': 'password123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
@@ -0,0 +1,85 @@
+import gzip
+import zlib
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.middleware import CompressionMiddleware, negotiate_encoding
+
+PAYLOAD = b'{"title": "Sample recipe title", "price": "120.00"}' * 50
+
+
+def get_middleware(response):
+    return CompressionMiddleware(lambda request: response)
+
+
+class CompressionMiddlewareTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(
+            negotiate_encoding('gzip;q=0.5, deflate;q=0.8'), 'deflate')
+        self.assertEqual(negotiate_encoding('br, *;q=0.1'), 'gzip')
+        self.assertIsNone(negotiate_encoding('gzip;q=0, identity'))
+        self.assertIsNone(negotiate_encoding(''))
+
+    def test_gzip_response(self):
+        request = self.factory.get(
+            '/api/recipe/recipes/', HTTP_ACCEPT_ENCODING='gzip')
+        response = get_middleware(HttpResponse(PAYLOAD))(request)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), PAYLOAD)
+        self.assertEqual(
+            int(response['Content-Length']), len(response.content))
+
+    def test_deflate_response(self):
+        request = self.factory.get(
+            '/api/recipe/recipes/', HTTP_ACCEPT_ENCODING='deflate')
+        response = get_middleware(HttpResponse(PAYLOAD))(request)
+
+        self.assertEqual(response['Content-Encoding'], 'deflate')
+        self.assertEqual(zlib.decompress(response.content), PAYLOAD)
+
+    @override_settings(COMPRESSION_MIN_SIZE=len(PAYLOAD) + 1)
+    def test_small_response_not_compressed(self):
+        request = self.factory.get(
+            '/api/recipe/recipes/', HTTP_ACCEPT_ENCODING='gzip')
+        response = get_middleware(HttpResponse(PAYLOAD))(request)
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, PAYLOAD)
+
+    @override_settings(COMPRESSION_ROUTE_LEVELS=[(r'^/media/', 0)])
+    def test_route_level_disables_compression(self):
+        request = self.factory.get(
+            '/media/uploads/recipe/a.jpg', HTTP_ACCEPT_ENCODING='gzip')
+        response = get_middleware(HttpResponse(PAYLOAD))(request)
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_response_compressed_incrementally(self):
+        consumed = []
+
+        def chunks():
+            for i in range(3):
+                consumed.append(i)
+                yield PAYLOAD
+
+        request = self.factory.get(
+            '/api/recipe/recipes/', HTTP_ACCEPT_ENCODING='gzip')
+        response = get_middleware(StreamingHttpResponse(chunks()))(request)
+        stream = iter(response.streaming_content)
+
+        first = next(stream)
+        self.assertEqual(consumed, [0])
+        self.assertEqual(
+            zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(first),
+            PAYLOAD)
+
+        body = first + b''.join(stream)
+        self.assertEqual(gzip.decompress(body), PAYLOAD * 3)
+        self.assertFalse(response.has_header('Content-Length'))
@@ -1,7 +1,7 @@
 from unittest.mock import patch
-from django.test import TestCase
 from django.contrib.auth import get_user_model
 from core import models
+from core.tests.utils import ShardedTestCase
 
 
 def sample_user(email="admin@email.com", password='password123'):
@@ -9,7 +9,7 @@ def sample_user(email="admin@email.com", password='password123'):
     return get_user_model().objects.create_user(email, password)
 
 
-class ModelTests(TestCase):
+class ModelTests(ShardedTestCase):
     def test_user_creation_successfully(self):
         email = "admin@email.com"
         password = "Password123"
@@ -68,3 +68,12 @@ class ModelTests(TestCase):
         file_path = models.recipe_image_file_path(None, 'myimage.jpg')
         exp_path = f'uploads/recipe/{uuid}.jpg'
         self.assertEqual(file_path, exp_path)
+
+    def test_sync_sequence_advance(self):
+        last = models.SyncSequence.next_value()
+        self.assertEqual(models.SyncSequence.last_value(), last)
+
+        models.SyncSequence.advance(last + 100)
+        models.SyncSequence.advance(last + 50)
+
+        self.assertEqual(models.SyncSequence.next_value(), last + 101)
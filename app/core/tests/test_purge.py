@@ -0,0 +1,111 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from PIL import Image
+
+from core import models
+from core.authentication import issue_token
+from core.purge import purge, soft_delete_user, soft_delete_recipes
+
+
+def sample_recipe(user, **kwargs):
+    defaults = {'title': 'Recipe title', 'time_minutes': 7, 'price': 30}
+    defaults.update(kwargs)
+    return models.Recipe.objects.create(user=user, **defaults)
+
+
+class PurgeTests(TestCase):
+    # Purging visits every shard
+    databases = {'default', *settings.DATABASE_SHARDS}
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'admin@email.com', 'password123')
+
+    def test_soft_delete_recipes(self):
+        recipe = sample_recipe(user=self.user)
+        other = sample_recipe(user=self.user)
+
+        count = soft_delete_recipes(
+            models.Recipe.objects.filter(pk=recipe.pk))
+
+        self.assertEqual(count, 1)
+        self.assertEqual(list(models.Recipe.objects.all()), [other])
+        self.assertTrue(
+            models.Recipe.all_objects.filter(pk=recipe.pk).exists())
+        self.assertTrue(models.Tombstone.objects.filter(
+            model='recipe', object_id=recipe.pk).exists())
+
+    def test_purge_deleted_recipes_in_batches(self):
+        tag = models.Tag.objects.create(user=self.user, name='tag')
+        recipes = [sample_recipe(user=self.user) for _ in range(5)]
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        kept = sample_recipe(user=self.user)
+        kept.tags.add(tag)
+        soft_delete_recipes(models.Recipe.objects.exclude(pk=kept.pk))
+
+        batches = []
+        purge(batch_size=2, progress=lambda label, n: batches.append(n))
+
+        self.assertEqual(batches, [2, 2, 1])
+        self.assertEqual(list(models.Recipe.all_objects.all()), [kept])
+        self.assertEqual(models.Recipe.tags.through.objects.count(), 1)
+
+    def test_purge_removes_images(self):
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            recipe = sample_recipe(
+                user=self.user,
+                image=SimpleUploadedFile('image.jpg', ntf.read()))
+        path = recipe.image.path
+        self.assertTrue(os.path.exists(path))
+
+        soft_delete_recipes(models.Recipe.objects.filter(pk=recipe.pk))
+        purge()
+
+        self.assertFalse(os.path.exists(path))
+
+    def test_users_deleted_during_purge_left_for_next_run(self):
+        sample_recipe(user=self.user)
+        soft_delete_user(self.user)
+        user2 = get_user_model().objects.create_user('b@email.com', 'pw')
+        sample_recipe(user=user2)
+
+        purge(progress=lambda label, n: soft_delete_user(user2))
+
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists())
+        self.assertTrue(
+            get_user_model().objects.filter(pk=user2.pk).exists())
+        self.assertTrue(models.Recipe.all_objects.filter(
+            user=user2).exists())
+
+    def test_soft_delete_and_purge_user(self):
+        issue_token(self.user)
+        recipe = sample_recipe(user=self.user)
+        recipe.ingredients.add(
+            models.Ingredient.objects.create(user=self.user, name='salt'))
+        user2 = get_user_model().objects.create_user('b@email.com', 'pw')
+        kept = sample_recipe(user=user2)
+
+        soft_delete_user(self.user)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(models.AuthToken.objects.exists())
+
+        out = StringIO()
+        call_command('purge_deleted', batch_size=10, stdout=out)
+
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(list(models.Recipe.all_objects.all()), [kept])
+        self.assertFalse(models.Ingredient.objects.exists())
+        self.assertIn('Deleted 1 recipes', out.getvalue())
@@ -0,0 +1,109 @@
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, \
+    override_settings
+
+from core.models import AuthToken, Recipe, Tag
+from core.routers import ReplicaMiddleware, ReplicaRouter, use_replicas
+
+
+def get_middleware(status=200):
+    """Middleware whose view records the database reads are routed to"""
+    routed = []
+
+    def view(request):
+        routed.append(router.db_for_read(Recipe))
+        return HttpResponse(status=status)
+
+    return ReplicaMiddleware(view), routed
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+
+    def tearDown(self):
+        use_replicas(False)
+
+    def test_reads_use_primary_outside_requests(self):
+        self.assertEqual(ReplicaRouter().db_for_read(Recipe), 'default')
+        use_replicas(True)
+        self.assertEqual(ReplicaRouter().db_for_read(Recipe), 'replica1')
+        self.assertEqual(ReplicaRouter().db_for_write(Recipe), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertTrue(ReplicaRouter().allow_migrate('default', 'core'))
+        self.assertFalse(ReplicaRouter().allow_migrate('replica1', 'core'))
+
+    def test_safe_requests_read_from_replica(self):
+        middleware, routed = get_middleware()
+        middleware(self.factory.get('/api/recipe/recipes/', **self.auth))
+        middleware(self.factory.post('/api/recipe/recipes/', **self.auth))
+
+        self.assertEqual(routed, ['replica1', 'default'])
+        self.assertEqual(ReplicaRouter().db_for_read(Recipe), 'default')
+
+    def test_reads_pinned_to_primary_after_write(self):
+        middleware, routed = get_middleware()
+        res = middleware(self.factory.patch('/api/user/me/', **self.auth))
+        pinned = self.factory.get('/api/user/me/', **self.auth)
+        pinned.COOKIES = {key: res.cookies[key].value for key in res.cookies}
+        middleware(pinned)
+        middleware(self.factory.get('/api/user/me/', **self.auth))
+
+        self.assertEqual(routed, ['default', 'default', 'replica1'])
+
+    def test_login_pins_reads(self):
+        middleware, _ = get_middleware()
+        res = middleware(self.factory.post('/api/user/token/'))
+
+        self.assertIn(ReplicaMiddleware.cookie_name, res.cookies)
+
+    def test_pin_expires(self):
+        middleware, routed = get_middleware()
+        res = middleware(self.factory.post('/api/recipe/recipes/'))
+        request = self.factory.get('/api/recipe/recipes/')
+        request.COOKIES = {key: res.cookies[key].value for key in res.cookies}
+        later = time.time() + settings.REPLICA_PIN_SECONDS + 1
+        with patch('django.core.signing.time.time', return_value=later):
+            middleware(request)
+
+        self.assertEqual(routed, ['default', 'replica1'])
+
+    def test_failed_writes_do_not_pin(self):
+        middleware, _ = get_middleware(status=400)
+        res = middleware(self.factory.post('/api/recipe/recipes/'))
+
+        self.assertNotIn(ReplicaMiddleware.cookie_name, res.cookies)
+
+    def test_credentials_read_from_primary(self):
+        use_replicas(True)
+        for model in (get_user_model(), AuthToken):
+            self.assertEqual(ReplicaRouter().db_for_read(model), 'default')
+
+
+@skipUnless('replica1' in settings.DATABASES,
+            'Needs a replica database, e.g. DB_ENGINE=sqlite DB_REPLICAS=1')
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaDatabaseTests(TransactionTestCase):
+    databases = {'default', 'replica1'}
+
+    def test_replica_serves_reads(self):
+        user = get_user_model().objects.create_user(
+            'admin@email.com', 'password123')
+        tag = Tag.objects.create(user=user, name='Vegan')
+        use_replicas(True)
+        try:
+            queryset = Tag.objects.filter(pk=tag.pk)
+            self.assertEqual(queryset.db, 'replica1')
+            self.assertTrue(queryset.exists())
+        finally:
+            use_replicas(False)
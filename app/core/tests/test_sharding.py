@@ -0,0 +1,149 @@
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import router
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient, ShardMap
+from core.routers import use_shard
+from core.sharding import hash_shard, move_user, shard_for_user
+
+SHARDS = ['default', 'shard1']
+
+
+def create_user(email='admin@email.com'):
+    return get_user_model().objects.create_user(email, 'password123')
+
+
+class ShardingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+
+    def tearDown(self):
+        use_shard(None)
+
+    def test_hash_shard_is_stable(self):
+        placements = [hash_shard(pk, SHARDS) for pk in range(200)]
+        grown = [hash_shard(pk, SHARDS + ['shard2']) for pk in range(200)]
+
+        self.assertEqual(placements, [hash_shard(pk, SHARDS)
+                                      for pk in range(200)])
+        self.assertEqual(set(placements), set(SHARDS))
+        # Growing the cluster only moves users onto the new shard
+        for before, after in zip(placements, grown):
+            self.assertIn(after, (before, 'shard2'))
+        self.assertIn('shard2', grown)
+
+    @override_settings(DATABASE_SHARDS=[])
+    def test_unsharded_users_use_default(self):
+        self.assertEqual(shard_for_user(self.user.pk), 'default')
+        self.assertEqual(
+            router.db_for_write(Recipe, instance=self.user), 'default')
+
+    @override_settings(DATABASE_SHARDS=SHARDS)
+    def test_new_users_mapped_by_hash(self):
+        user = create_user('other@email.com')
+
+        self.assertEqual(ShardMap.objects.get(user=user).shard,
+                         hash_shard(user.pk, SHARDS))
+
+    @override_settings(DATABASE_SHARDS=SHARDS)
+    def test_unmapped_users_stay_on_default(self):
+        ShardMap.objects.filter(user=self.user).delete()
+
+        self.assertEqual(shard_for_user(self.user.pk), 'default')
+
+    @override_settings(DATABASE_SHARDS=SHARDS)
+    def test_rows_routed_to_user_shard(self):
+        ShardMap.objects.filter(user=self.user).update(shard='shard1')
+
+        recipe = Recipe(user=self.user, title='Soup', time_minutes=5,
+                        price=5)
+        tag = Tag(user_id=self.user.pk, name='Vegan')
+
+        self.assertEqual(recipe._state.db, 'shard1')
+        self.assertEqual(router.db_for_write(Tag, instance=tag), 'shard1')
+        self.assertEqual(
+            router.db_for_read(Ingredient, instance=self.user), 'shard1')
+        self.assertEqual(router.db_for_read(get_user_model()), 'default')
+        self.assertEqual(router.db_for_read(
+            get_user_model(), instance=recipe), 'default')
+
+    @override_settings(DATABASE_SHARDS=SHARDS)
+    def test_querysets_use_current_shard(self):
+        self.assertEqual(Recipe.objects.all().db, 'default')
+        use_shard('shard1')
+        self.assertEqual(Recipe.objects.all().db, 'shard1')
+        self.assertEqual(ShardMap.objects.all().db, 'default')
+
+    @patch('recipe.views.use_shard', return_value=None)
+    def test_requests_use_user_shard(self, use_shard):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        client.get(reverse('recipe:recipe-list'))
+
+        self.assertEqual([call.args for call in use_shard.call_args_list],
+                         [(shard_for_user(self.user.pk),), (None,)])
+
+    @override_settings(DATABASE_SHARDS=SHARDS)
+    def test_rebalance_dry_run(self):
+        target = hash_shard(self.user.pk, SHARDS)
+        source = next(alias for alias in SHARDS if alias != target)
+        ShardMap.objects.filter(user=self.user).update(shard=source)
+        out = StringIO()
+
+        call_command('rebalance_shards', '--dry-run', stdout=out)
+
+        self.assertIn(f'User {self.user.pk}: {source} -> {target}',
+                      out.getvalue())
+        self.assertEqual(ShardMap.objects.get(user=self.user).shard, source)
+
+
+@skipUnless('shard1' in settings.DATABASES,
+            'Needs a second shard, e.g. DB_ENGINE=sqlite DB_SHARDS=2')
+class MoveUserTests(TransactionTestCase):
+    databases = {'default', 'shard1'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        ShardMap.objects.filter(user=self.user).update(shard='default')
+
+    def test_move_user(self):
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=5)
+        recipe.tags.add(tag)
+
+        moved = move_user(self.user.pk, 'shard1')
+
+        self.assertEqual(moved, 2)
+        self.assertEqual(shard_for_user(self.user.pk), 'shard1')
+        self.assertFalse(
+            Recipe.all_objects.using('default').filter(
+                user=self.user).exists())
+        moved_recipe = Recipe.objects.using('shard1').get(pk=recipe.pk)
+        self.assertEqual(list(moved_recipe.tags.all()), [tag])
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        res = client.get(reverse('recipe:recipe-list'))
+        self.assertEqual([row['id'] for row in res.data], [recipe.pk])
+
+    def test_shard_ids_do_not_overlap(self):
+        ShardMap.objects.filter(user=self.user).update(shard='shard1')
+
+        tag = Tag(user=self.user, name='Vegan')
+        tag.save()
+
+        self.assertEqual(tag._state.db, 'shard1')
+        self.assertGreater(tag.pk, settings.SHARD_ID_BLOCK)
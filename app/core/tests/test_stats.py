@@ -0,0 +1,98 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from core import stats
+from core.models import Recipe, RecipeStats, Tag
+from core.purge import soft_delete_recipes
+from core.tests.utils import ShardedTestCase
+
+
+class RecipeStatsTests(ShardedTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'admin@email.com', 'password123')
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.soup = self.create_recipe('Soup', 4, 10, [self.vegan])
+        # Summaries are maintained once they have been read
+        stats.get_stats(self.user.id, self.shard)
+
+    def create_recipe(self, title, price, minutes, tags=()):
+        recipe = Recipe.objects.create(
+            user=self.user, title=title, price=price, time_minutes=minutes)
+        recipe.tags.add(*tags)
+        return recipe
+
+    def assertMatchesRebuild(self):
+        self.assertFalse(RecipeStats.objects.get().stale)
+        maintained = stats.get_stats(self.user.id, self.shard)
+        stats.rebuild(self.user.id, self.shard)
+        self.assertEqual(maintained, stats.get_stats(self.user.id, self.shard))
+        return maintained
+
+    def test_summary(self):
+        self.create_recipe('Stew', 10, 90, [self.vegan, self.quick])
+
+        summary = self.assertMatchesRebuild()
+
+        self.assertEqual(summary['count'], 2)
+        self.assertEqual(summary['price'],
+                         {'average': '7.00', 'min': '4.00', 'max': '10.00'})
+        self.assertEqual(
+            [bucket['count'] for bucket in summary['time_minutes']],
+            [1, 0, 0, 1, 0])
+        self.assertEqual(summary['time_minutes'][3],
+                         {'min': 60, 'max': 119, 'count': 1})
+        self.assertEqual(
+            [(tag['name'], tag['count']) for tag in summary['top_tags']],
+            [('Vegan', 2), ('Quick', 1)])
+
+    def test_updates_and_deletes_applied_incrementally(self):
+        stew = self.create_recipe('Stew', 10, 90, [self.quick])
+        pie = self.create_recipe('Pie', 2, 45, [self.vegan, self.quick])
+
+        stew.price = 1
+        stew.time_minutes = 20
+        stew.save()
+        pie.tags.remove(self.quick)
+        self.quick.recipe_set.add(self.soup)
+        self.soup.tags.clear()
+        Recipe.objects.get(pk=pie.pk).delete()
+
+        summary = self.assertMatchesRebuild()
+        self.assertEqual(summary['count'], 2)
+        self.assertEqual(summary['price']['min'], '1.00')
+        self.assertEqual(summary['price']['max'], '4.00')
+
+    def test_soft_deletes_and_tag_deletes(self):
+        stew = self.create_recipe('Stew', 10, 90, [self.vegan, self.quick])
+
+        soft_delete_recipes(Recipe.objects.filter(pk=stew.pk))
+        self.assertEqual(self.assertMatchesRebuild()['price']['max'], '4.00')
+
+        self.vegan.delete()
+        self.assertEqual(self.assertMatchesRebuild()['top_tags'], [])
+
+    def test_unknown_old_values_mark_stale(self):
+        recipe = Recipe.objects.only('id', 'user_id').get(pk=self.soup.pk)
+        recipe.title = 'Broth'
+        recipe.save(update_fields=['title'])
+        self.assertFalse(RecipeStats.objects.get().stale)
+
+        recipe.price = 8
+        recipe.save(update_fields=['price'])
+
+        self.assertTrue(RecipeStats.objects.get().stale)
+        self.assertEqual(
+            stats.get_stats(self.user.id, self.shard)['price']['max'], '8.00')
+
+    def test_rebuild_command(self):
+        RecipeStats.objects.update(count=99)
+        out = StringIO()
+
+        call_command('rebuild_recipe_stats', stdout=out)
+
+        self.assertEqual(RecipeStats.objects.get().count, 1)
+        self.assertIn('Rebuilt the recipe stats of 1 users', out.getvalue())
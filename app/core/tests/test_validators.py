@@ -0,0 +1,34 @@
+import tempfile
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from core import validators
+
+
+class CommonPasswordValidatorTests(TestCase):
+    def test_common_password_rejected(self):
+        validator = validators.CommonPasswordValidator()
+
+        for password in ['password', ' Password ', 'qwerty']:
+            with self.assertRaises(ValidationError) as cm:
+                validator.validate(password)
+            self.assertEqual(
+                cm.exception.error_list[0].code, 'password_too_common')
+
+    def test_uncommon_password_accepted(self):
+        validators.CommonPasswordValidator().validate('vT7#kq!mz2Lp')
+
+    def test_list_loaded_once(self):
+        self.assertIs(validators.CommonPasswordValidator().digests,
+                      validators.CommonPasswordValidator().digests)
+
+    def test_plain_text_list(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as f:
+            f.write('hunter2\nletmein\n')
+            f.flush()
+            validator = validators.CommonPasswordValidator(f.name)
+
+        self.assertEqual(len(validator.digests), 2)
+        with self.assertRaises(ValidationError):
+            validator.validate('Hunter2')
@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.test import TestCase
+
+from core.models import Recipe
+from core.routers import use_shard
+
+
+class ShardedTestCase(TestCase):
+    """Test case placing the users it creates on the last shard
+
+    Users stay on the default database and their rows go to the shard,
+    as in production, when run with several shards, e.g.
+    DB_ENGINE=sqlite DB_SHARDS=3. Queries without an instance use the
+    shard too, so tests create and check rows as usual.
+    """
+    databases = {'default', *settings.DATABASE_SHARDS}
+    shard = (settings.DATABASE_SHARDS or ['default'])[-1]
+
+    @classmethod
+    def setUpClass(cls):
+        cls._hash_shard = patch(
+            'core.sharding.hash_shard', return_value=cls.shard)
+        cls._hash_shard.start()
+        cache.clear()
+        use_shard(cls.shard)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        use_shard(None)
+        cache.clear()
+        cls._hash_shard.stop()
+
+
+@contextmanager
+def committed(using=None):
+    """Run the ``transaction.on_commit`` callbacks registered in the block
+    when it exits, on ``using`` or the current shard
+
+    TestCase never commits, so this stands in for the commit of the
+    writes made in the block.
+    """
+    connection = connections[using or router.db_for_write(Recipe)]
+    start = len(connection.run_on_commit)
+    yield
+    # Callbacks may register more callbacks
+    while len(connection.run_on_commit) > start:
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for _, callback in callbacks:
+            callback()
@@ -0,0 +1,55 @@
+import gzip
+import hashlib
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+
+from django.contrib.auth import password_validation
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext as _
+
+
+def password_digest(password):
+    """64 bit digest standing in for a lowercased password"""
+    return int.from_bytes(
+        hashlib.blake2b(password.encode(), digest_size=8).digest(), 'big')
+
+
+@lru_cache(maxsize=None)
+def load_password_digests(path):
+    """Sorted digests of the passwords listed in ``path``, read once per
+    process however many validators use the list"""
+    try:
+        with gzip.open(path) as f:
+            lines = f.read().decode().splitlines()
+    except IOError:
+        with open(path) as f:
+            lines = f.readlines()
+    return array('Q', sorted({password_digest(line.strip())
+                              for line in lines}))
+
+
+class CommonPasswordValidator(password_validation.CommonPasswordValidator):
+    """Django's common password check over a sorted array of 8 byte
+    digests
+
+    The 20000 passwords Django ships take about 160 KB this way instead
+    of a set of strings over ten times that size, and a lookup is a
+    bisection. Digest collisions with a listed password are
+    astronomically unlikely.
+    """
+
+    DEFAULT_PASSWORD_LIST_PATH = password_validation.\
+        CommonPasswordValidator.DEFAULT_PASSWORD_LIST_PATH
+
+    def __init__(self, password_list_path=DEFAULT_PASSWORD_LIST_PATH):
+        self.digests = load_password_digests(str(password_list_path))
+
+    def validate(self, password, user=None):
+        digest = password_digest(password.lower().strip())
+        index = bisect_left(self.digests, digest)
+        if index < len(self.digests) and self.digests[index] == digest:
+            raise ValidationError(
+                _('This password is too common.'),
+                code='password_too_common',
+            )
@@ -0,0 +1,150 @@
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from core.bus import bus
+
+# Sentinel cached for users whose library is too large to hold in memory
+TOO_LARGE = object()
+
+
+def trigrams(text):
+    """Trigrams of ``text`` padded the way pg_trgm pads words"""
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Sorted array of one user's case folded tag or ingredient names
+
+    Prefix lookups bisect into the sorted keys, so they cost
+    O(log n + k). Trigram sets are only computed when a prefix lookup
+    doesn't fill the requested number of suggestions.
+    """
+
+    def __init__(self, rows):
+        entries = sorted((name.casefold(), pk, name) for pk, name in rows)
+        self.keys = [key for key, _, _ in entries]
+        self.rows = [(pk, name) for _, pk, name in entries]
+        self._trigrams = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def prefix(self, query, limit):
+        start = bisect_left(self.keys, query)
+        end = start
+        while end < len(self.keys) and end - start < limit \
+                and self.keys[end].startswith(query):
+            end += 1
+        return self.rows[start:end]
+
+    def similar(self, query, limit, threshold=0.3):
+        if self._trigrams is None:
+            self._trigrams = [trigrams(key) for key in self.keys]
+
+        wanted = trigrams(query)
+        scored = []
+        for position, grams in enumerate(self._trigrams):
+            shared = len(wanted & grams)
+            if shared:
+                score = shared / len(wanted | grams)
+                if score >= threshold:
+                    scored.append((-score, self.keys[position], position))
+        scored.sort()
+        return [self.rows[position] for _, _, position in scored[:limit]]
+
+    def suggest(self, query, limit):
+        matches = self.prefix(query, limit)
+        if len(matches) < limit:
+            seen = {pk for pk, _ in matches}
+            matches += [
+                row for row in self.similar(query, limit + len(matches))
+                if row[0] not in seen
+            ][:limit - len(matches)]
+        return matches
+
+
+class AutocompleteCache:
+    """Per-user name indexes, built lazily and evicted least recently
+    used first once more than ``max_users`` indexes are held"""
+
+    def __init__(self, max_users=1024, max_names=5000):
+        self.max_users = max_users
+        self.max_names = max_names
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so an index built from rows read
+        # before a concurrent write is never cached
+        self._generation = 0
+
+    def get(self, model, user_id):
+        key = (model._meta.label, user_id)
+        with self._lock:
+            if key in self._indexes:
+                self._indexes.move_to_end(key)
+                return self._indexes[key]
+            generation = self._generation
+
+        rows = list(model.objects.filter(
+            user_id=user_id).values_list('id', 'name')[:self.max_names + 1])
+        index = NameIndex(rows) if len(rows) <= self.max_names else TOO_LARGE
+
+        with self._lock:
+            if generation == self._generation:
+                self._indexes[key] = index
+                while len(self._indexes) > self.max_users:
+                    self._indexes.popitem(last=False)
+        return index
+
+    def invalidate(self, model, user_id, using='default'):
+        """Drop the index of ``user_id`` here and in the other processes
+        once the transaction writing the names on ``using`` commits"""
+        def invalidate():
+            self.discard([(model._meta.label, user_id)])
+            bus.publish('autocomplete', [f'{model._meta.label}:{user_id}'])
+        transaction.on_commit(invalidate, using=using)
+
+    def discard(self, keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._indexes.pop(key, None)
+
+    def receive(self, keys):
+        """Invalidation of ``label:user_id`` keys from the bus"""
+        parsed = []
+        for key in keys:
+            label, user_id = key.rsplit(':', 1)
+            parsed.append((label, int(user_id)))
+        self.discard(parsed)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+cache = AutocompleteCache(
+    max_users=getattr(settings, 'AUTOCOMPLETE_MAX_USERS', 1024),
+    max_names=getattr(settings, 'AUTOCOMPLETE_MAX_NAMES', 5000),
+)
+bus.subscribe('autocomplete', cache.receive)
+
+
+def suggest(model, user, query, limit=10):
+    """Return up to ``limit`` (id, name) pairs of ``user``'s ``model`` rows
+    matching ``query``, prefix matches first then trigram matches"""
+    query = query.strip().casefold()
+    if not query:
+        return []
+
+    index = cache.get(model, user.id)
+    if index is TOO_LARGE:
+        # Served by the (user_id, upper(name)) index, see core migrations
+        return list(model.objects.filter(
+            user=user, name__istartswith=query
+        ).order_by('name').values_list('id', 'name')[:limit])
+    return index.suggest(query, limit)
@@ -0,0 +1,112 @@
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.bus import bus
+
+# ``version`` is the invalidation token current when the payload was
+# built, ``fresh_until`` the time after which one request refreshes it
+Entry = namedtuple('Entry', 'version fresh_until user_id payload')
+
+
+def lock_seconds():
+    """Longest a build may take before others stop waiting for it"""
+    return getattr(settings, 'RECIPE_DETAIL_CACHE_LOCK_SECONDS', 2)
+
+
+def _key(pk):
+    return f'recipe-detail:{pk}'
+
+
+def _version_key(pk):
+    return f'recipe-detail-version:{pk}'
+
+
+def _lock_key(pk):
+    return f'recipe-detail-lock:{pk}'
+
+
+def get_or_build(pk, build):
+    """Cached detail ``Entry`` of recipe ``pk``, built on a miss
+
+    ``build`` returns (user id, payload). Only one request per recipe
+    builds at a time: when an entry goes stale the others keep serving it
+    until the refresh lands, and on a miss they wait for the builder
+    rather than all querying the database.
+    """
+    key, version_key = _key(pk), _version_key(pk)
+    cached = cache.get_many([key, version_key])
+    entry, version = cached.get(key), cached.get(version_key)
+    usable = entry is not None and entry.version == version
+    if usable and entry.fresh_until > time.time():
+        return entry
+
+    # One request per recipe builds, the others serve the stale entry or
+    # wait for the build
+    locked = cache.add(_lock_key(pk), True, lock_seconds())
+    if not locked:
+        if usable:
+            return entry
+        entry = _wait_for_build(pk, version)
+        if entry is not None:
+            return entry
+
+    try:
+        user_id, payload = build()
+        ttl = getattr(settings, 'RECIPE_DETAIL_CACHE_SECONDS', 300)
+        entry = Entry(version, time.time() + ttl, user_id, payload)
+        # Kept past its freshness so hot recipes are refreshed by one
+        # request instead of expiring under all of them
+        cache.set(key, entry, ttl * 2)
+        return entry
+    finally:
+        if locked:
+            cache.delete(_lock_key(pk))
+
+
+def _wait_for_build(pk, version):
+    """Entry cached by the request holding the lock, None when it gave
+    up or failed"""
+    deadline = time.time() + lock_seconds()
+    while time.time() < deadline:
+        time.sleep(0.02)
+        cached = cache.get_many([_key(pk), _lock_key(pk)])
+        entry = cached.get(_key(pk))
+        if entry is not None and entry.version == version:
+            return entry
+        if _lock_key(pk) not in cached:
+            break
+    return None
+
+
+def invalidate(pks, using='default'):
+    """Drop the cached details of recipes ``pks`` once the transaction
+    writing them on ``using`` commits
+
+    Before the commit a build would still read the old rows and cache
+    them under the new version. The version change stops a build that
+    read the database before the commit from caching its outdated
+    payload.
+    """
+    pks = set(pks)
+    if pks:
+        transaction.on_commit(lambda: _invalidate(pks), using=using)
+
+
+def _invalidate(pks):
+    discard(pks)
+    # Process local cache backends hold a copy in every worker
+    bus.publish('recipe-detail', pks)
+
+
+def discard(pks):
+    cache.delete_many([_key(pk) for pk in pks])
+    cache.set_many(
+        {_version_key(pk): uuid.uuid4().hex for pk in pks}, timeout=None)
+
+
+bus.subscribe('recipe-detail', lambda keys: discard([int(k) for k in keys]))
@@ -0,0 +1,100 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from recipe.filters import to_int
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key relation limited to rows owned by the requesting user
+
+    With ``many=True`` every submitted id is resolved by one ``id__in``
+    query instead of a query per id. With ``allow_names=True`` a name, as
+    a string or a ``{"name": ...}`` object, may be sent in place of an id
+    and is passed on as a string for the serializer to get or create.
+    Strings of digits are taken for ids.
+    """
+    default_error_messages = {
+        'invalid_name': 'Names must be non-empty strings of at most '
+                        '{max_length} characters.',
+    }
+
+    def __init__(self, allow_names=False, **kwargs):
+        self.allow_names = allow_names
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            user=self.context['request'].user)
+
+    def to_name(self, data):
+        """The stripped name sent as ``data``, None for an id"""
+        if not self.allow_names:
+            return None
+        if isinstance(data, dict):
+            data = data.get('name')
+            if not isinstance(data, str):
+                data = ''
+        elif not isinstance(data, str) or data.strip().isdigit():
+            return None
+
+        name = data.strip()
+        max_length = self.get_queryset().model._meta.get_field(
+            'name').max_length
+        if not name or len(name) > max_length:
+            self.fail('invalid_name', max_length=max_length)
+        return name
+
+    def to_internal_value(self, data):
+        return super().to_internal_value(self.to_pk(data))
+
+    def to_pk(self, data):
+        """Coerce a submitted id without touching the database"""
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return to_int(pk)
+        except ValueError:
+            # The id column can't hold it, so no row has it
+            self.fail('does_not_exist', pk_value=data)
+
+
+class UserManyRelatedField(serializers.ManyRelatedField):
+    """Resolve all ids of a ``UserPrimaryKeyRelatedField`` at once, names
+    are returned as they are after the rows"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        pks, names = [], []
+        for item in data:
+            name = child.to_name(item)
+            if name is None:
+                pks.append(child.to_pk(item))
+            else:
+                names.append(name)
+        pks = list(dict.fromkeys(pks))
+        if not pks:
+            return names
+
+        found = child.get_queryset().in_bulk(pks)
+        for pk in pks:
+            if pk not in found:
+                child.fail('does_not_exist', pk_value=pk)
+        return [found[pk] for pk in pks] + names
@@ -0,0 +1,149 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Exists, OuterRef
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+from core.search import search_recipes
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+# Bounds of the integer columns filtered on, ids included
+MIN_INT, MAX_INT = -2 ** 31, 2 ** 31 - 1
+
+
+def to_int(value):
+    """int of ``value``, ValueError when the columns can't hold it"""
+    value = int(value)
+    if not MIN_INT <= value <= MAX_INT:
+        raise ValueError(f'{value} is out of range')
+    return value
+
+
+def to_price(value):
+    """Decimal of ``value``, ValueError for NaN, infinities and prices
+    the column can't hold"""
+    value = Decimal(value)
+    if not value.is_finite():
+        raise ValueError(f'{value} is not finite')
+    field = Recipe._meta.get_field('price')
+    if abs(value) >= 10 ** (field.max_digits - field.decimal_places):
+        raise ValueError(f'{value} is out of range')
+    return value
+
+
+def convert_params_to_list(cs):
+    """Convert a comma separated string of ids into a list of integers
+
+    Arguments:
+        cs {comma separated string}
+
+    Returns:
+        list -- sorted list of unique integers
+    """
+    return sorted({to_int(str_id) for str_id in cs.split(',')
+                   if str_id.strip()})
+
+
+class RecipeFilter:
+    """Compile recipe list query params into a single queryset
+
+    Every filter narrows the queryset it is given, so they combine instead
+    of overwriting each other. Tag and ingredient filters are compiled to
+    subqueries on the M2M through tables rather than JOINs, which keeps
+    the result free of duplicate rows and lets the database use the
+    (recipe_id, tag_id) unique index of the through table.
+
+    Supported params:
+        tags, ingredients -- comma separated ids
+        match -- 'any' (default) or 'all' for the tags/ingredients filters
+        price_min, price_max, time_min, time_max -- inclusive ranges
+        title -- case insensitive substring of the recipe title
+        search -- full-text search over titles, ordered by rank
+        ordering -- one of ``ordering_fields``, '-' prefixed for
+            descending. Price and time orderings follow the (user, price)
+            and (user, time_minutes) indexes, ties are broken by id.
+    """
+    relations = ('tags', 'ingredients')
+    ranges = (
+        ('price_min', 'price__gte', to_price),
+        ('price_max', 'price__lte', to_price),
+        ('time_min', 'time_minutes__gte', to_int),
+        ('time_max', 'time_minutes__lte', to_int),
+    )
+    ordering_fields = ('id', 'title', 'price', 'time_minutes', 'updated_at')
+
+    def __init__(self, params):
+        self.params = params
+
+    def filter_queryset(self, queryset):
+        match = self.params.get('match', MATCH_ANY)
+        if match not in (MATCH_ANY, MATCH_ALL):
+            raise ValidationError(
+                {'match': f'Expected "{MATCH_ANY}" or "{MATCH_ALL}".'})
+
+        for relation in self.relations:
+            raw = self.params.get(relation)
+            if raw:
+                ids = self._parse(relation, raw, convert_params_to_list)
+                queryset = self.filter_related(queryset, relation, ids, match)
+
+        for param, lookup, cast in self.ranges:
+            raw = self.params.get(param)
+            if raw:
+                queryset = queryset.filter(
+                    **{lookup: self._parse(param, raw, cast)})
+
+        title = self.params.get('title')
+        if title:
+            queryset = queryset.filter(title__icontains=title)
+
+        term = self.params.get('search')
+        if term:
+            queryset = search_recipes(queryset, term)
+
+        ordering = self.params.get('ordering')
+        if ordering:
+            queryset = self.order_queryset(queryset, ordering)
+
+        return queryset
+
+    def order_queryset(self, queryset, ordering):
+        field = ordering.lstrip('-')
+        if field not in self.ordering_fields or len(ordering) - len(field) > 1:
+            raise ValidationError({'ordering': f'Invalid value "{ordering}".'})
+        direction = '-' if ordering.startswith('-') else ''
+        return queryset.order_by(f'{direction}{field}', f'{direction}id')
+
+    @staticmethod
+    def filter_related(queryset, relation, ids, match=MATCH_ANY):
+        """Keep recipes linked to any (or all) of ``ids`` through
+        the ``relation`` M2M field"""
+        field = Recipe._meta.get_field(relation)
+        through = field.remote_field.through
+        source = f'{field.m2m_field_name()}_id'
+        target = f'{field.m2m_reverse_field_name()}_id'
+
+        if not ids:
+            return queryset.none()
+
+        if match == MATCH_ALL:
+            matching = through.objects.filter(
+                **{f'{target}__in': ids}
+            ).values(source).annotate(
+                matched=Count(target)
+            ).filter(matched=len(ids)).values(source)
+            return queryset.filter(pk__in=matching)
+
+        links = through.objects.filter(
+            **{source: OuterRef('pk'), f'{target}__in': ids})
+        annotation = f'has_{relation}'
+        return queryset.annotate(
+            **{annotation: Exists(links)}).filter(**{annotation: True})
+
+    @staticmethod
+    def _parse(param, raw, cast):
+        try:
+            return cast(raw)
+        except (ValueError, TypeError, InvalidOperation):
+            raise ValidationError({param: f'Invalid value "{raw}".'})
@@ -0,0 +1,72 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmarks import rolled_back
+from core.middleware import WBITS, compress
+from core.models import Recipe, Tag, Ingredient
+from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+
+BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = 'Measure compression CPU time against bytes saved on recipe ' \
+           'list and detail payloads. All data is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self._run(**options)
+
+    def _run(self, recipes, repeat, **options):
+        rand = random.Random(0)
+        user = get_user_model().objects.create_user(
+            'benchmark@recipe.local', None)
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f'tag {i}') for i in range(30))
+        Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'ingredient {i}') for i in range(100))
+        Recipe.objects.bulk_create((
+            Recipe(user=user, title=f'Recipe number {i}',
+                   time_minutes=rand.randint(5, 240),
+                   price=rand.randint(100, 90000) / 100,
+                   link=f'https://recipes.example.com/{i}')
+            for i in range(recipes)
+        ), batch_size=BATCH_SIZE)
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list('id', flat=True))
+        ingredient_ids = list(
+            Ingredient.objects.filter(user=user).values_list('id', flat=True))
+        queryset = Recipe.objects.filter(user=user).order_by('-id')
+        for recipe in queryset:
+            recipe.tags.add(*rand.sample(tag_ids, 3))
+            recipe.ingredients.add(*rand.sample(ingredient_ids, 8))
+
+        renderer = JSONRenderer()
+        payloads = (
+            ('list', renderer.render(
+                RecipeSerializer(queryset, many=True).data)),
+            ('detail', renderer.render(
+                RecipeDetailSerializer(queryset.first()).data)),
+        )
+        for label, payload in payloads:
+            self.stdout.write(f'{label}: {len(payload)} bytes')
+            for encoding in WBITS:
+                for level in (1, 3, 6, 9):
+                    start = time.perf_counter()
+                    for _ in range(repeat):
+                        compressed = compress(payload, encoding, level)
+                    elapsed = (time.perf_counter() - start) / repeat
+                    self.stdout.write(
+                        f'  {encoding:<8} level={level} '
+                        f'bytes={len(compressed):<8} '
+                        f'ratio={len(payload) / len(compressed):5.1f}x '
+                        f'cpu={elapsed * 1000:.3f}ms '
+                        f'({len(payload) / elapsed / 2 ** 20:.0f} MiB/s)')
@@ -0,0 +1,78 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+
+from core.benchmarks import rolled_back
+from core.models import Recipe, Tag
+from recipe.filters import RecipeFilter, MATCH_ANY, MATCH_ALL
+
+
+BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = 'Benchmark JOIN based tag filters against the filter engine ' \
+           'on a generated M2M table. All data is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--links', type=int, default=8,
+                            help='Tags linked to each recipe')
+        parser.add_argument('--filter-size', type=int, default=3,
+                            help='Tag ids passed to each filter')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self._run(**options)
+
+    def _run(self, recipes, tags, links, filter_size, repeat, **options):
+        rand = random.Random(0)
+        user = get_user_model().objects.create_user(
+            'benchmark@recipe.local', None)
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f'tag {i}') for i in range(tags))
+        Recipe.objects.bulk_create((
+            Recipe(user=user, title=f'recipe {i}', time_minutes=i % 240,
+                   price=i % 900)
+            for i in range(recipes)
+        ), batch_size=BATCH_SIZE)
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list('id', flat=True))
+        recipe_ids = Recipe.objects.filter(
+            user=user).values_list('id', flat=True)
+        through = Recipe.tags.through
+        through.objects.bulk_create((
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rand.sample(tag_ids, min(links, tags))
+        ), batch_size=BATCH_SIZE)
+        self.stdout.write(
+            f'{recipes} recipes, {tags} tags, '
+            f'{through.objects.count()} links')
+
+        ids = rand.sample(tag_ids, min(filter_size, tags))
+        queryset = Recipe.objects.filter(user=user)
+        cases = (
+            ('join (tags__id__in)',
+             lambda: queryset.filter(tags__id__in=ids)),
+            ('join + distinct',
+             lambda: queryset.filter(tags__id__in=ids).distinct()),
+            ('exists (match any)', lambda: RecipeFilter.filter_related(
+                queryset, 'tags', ids, MATCH_ANY)),
+            ('aggregate (match all)', lambda: RecipeFilter.filter_related(
+                queryset, 'tags', ids, MATCH_ALL)),
+        )
+        for label, build in cases:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                rows = list(build().values_list('id', flat=True))
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                f'{label:<24} rows={len(rows):<7} '
+                f'unique={len(set(rows)):<7} '
+                f'best={min(timings) * 1000:.1f}ms')
@@ -0,0 +1,29 @@
+from functools import partial
+
+from rest_framework.pagination import PageNumberPagination
+
+from core.counts import EstimatedCountPaginator
+
+
+class OptionalPageNumberPagination(PageNumberPagination):
+    """Page numbers for clients that ask for them with ``page`` or
+    ``page_size``, other requests keep getting the full list
+
+    Counts go through ``core.counts.count``, so large lists are never
+    counted exactly. Views may define ``get_counter()`` returning the
+    (model, user_id) pair whose maintained count matches the queryset.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_query_param not in params and \
+                self.page_size_query_param not in params:
+            return None
+
+        counter = getattr(view, 'get_counter', lambda: None)()
+        self.django_paginator_class = partial(
+            EstimatedCountPaginator, counter=counter)
+        return super().paginate_queryset(queryset, request, view)
@@ -1,37 +1,168 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed
 from rest_framework import serializers
 from core.models import Tag, Ingredient, Recipe
+from core.names import get_or_create_names, normalize
+from recipe.fields import UserPrimaryKeyRelatedField
 
 
-class TagSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Drop the fields not listed in the ``fields`` serializer context"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if requested is not None:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ('id', 'name')
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ('id', 'name')
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    ingredients = serializers.PrimaryKeyRelatedField(
-        many=True,
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Names sent in place of ids are created when the user has no such
+    # row yet, see core.names
+    ingredients = UserPrimaryKeyRelatedField(
+        many=True, allow_names=True,
+        queryset=Ingredient.objects.all()
+    )
+    tags = UserPrimaryKeyRelatedField(
+        many=True, allow_names=True,
+        queryset=Tag.objects.all()
+    )
+    # Incremental alternatives to resending the full tags/ingredients lists
+    ingredients_add = UserPrimaryKeyRelatedField(
+        many=True, write_only=True, required=False, allow_names=True,
+        queryset=Ingredient.objects.all()
+    )
+    ingredients_remove = UserPrimaryKeyRelatedField(
+        many=True, write_only=True, required=False,
         queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
+    tags_add = UserPrimaryKeyRelatedField(
+        many=True, write_only=True, required=False, allow_names=True,
         queryset=Tag.objects.all()
     )
+    tags_remove = UserPrimaryKeyRelatedField(
+        many=True, write_only=True, required=False,
+        queryset=Tag.objects.all()
+    )
+
+    relations = ('ingredients', 'tags')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'time_minutes', 'price',
-                  'link', 'ingredients', 'tags',)
+        fields = ('id', 'title', 'time_minutes', 'price',
+                  'link', 'ingredients', 'tags',
+                  'ingredients_add', 'ingredients_remove',
+                  'tags_add', 'tags_remove',)
         read_only_fields = ('id',)
 
+    def validate(self, attrs):
+        for relation in self.relations:
+            if relation in attrs and (attrs.get(f'{relation}_add') or
+                                      attrs.get(f'{relation}_remove')):
+                raise serializers.ValidationError({
+                    relation: f'Send either {relation} or '
+                              f'{relation}_add/{relation}_remove.'
+                })
+        return attrs
+
+    def create(self, validated_data):
+        changes = self._pop_relation_changes(validated_data)
+        with transaction.atomic():
+            recipe = super().create(validated_data)
+            self._apply_relation_changes(recipe, changes)
+        return recipe
+
+    def update(self, instance, validated_data):
+        changes = self._pop_relation_changes(validated_data)
+        with transaction.atomic():
+            recipe = super().update(instance, validated_data)
+            self._apply_relation_changes(recipe, changes)
+        return recipe
+
+    def _pop_relation_changes(self, validated_data):
+        changes = {}
+        for relation in self.relations:
+            replace = validated_data.pop(relation, None)
+            add = validated_data.pop(f'{relation}_add', [])
+            remove = validated_data.pop(f'{relation}_remove', [])
+            if replace is not None or add or remove:
+                changes[relation] = (replace, add, remove)
+        return changes
+
+    def _apply_relation_changes(self, recipe, changes):
+        """Write only the links that differ from the current ones
+
+        Unlike ``RelatedManager.set()`` this costs one select of the
+        current ids, then at most one bulk insert and one delete, and the
+        ``m2m_changed`` signals only carry the changed ids.
+        """
+        for relation, (replace, add, remove) in changes.items():
+            field = Recipe._meta.get_field(relation)
+            replace, add = self._resolve_names(recipe, field, replace, add)
+            through = field.remote_field.through
+            source = f'{field.m2m_field_name()}_id'
+            target = f'{field.m2m_reverse_field_name()}_id'
+
+            links = through.objects.filter(**{source: recipe.pk})
+            current = set(links.values_list(target, flat=True))
+            if replace is not None:
+                wanted = {obj.pk for obj in replace}
+                to_add, to_remove = wanted - current, current - wanted
+            else:
+                to_add = {obj.pk for obj in add} - current
+                to_remove = {obj.pk for obj in remove} & current
+
+            self._send_m2m_changed(recipe, field, 'pre_remove', to_remove)
+            if to_remove:
+                links.filter(**{f'{target}__in': to_remove}).delete()
+            self._send_m2m_changed(recipe, field, 'post_remove', to_remove)
+
+            self._send_m2m_changed(recipe, field, 'pre_add', to_add)
+            through.objects.bulk_create(
+                through(**{source: recipe.pk, target: pk}) for pk in to_add)
+            self._send_m2m_changed(recipe, field, 'post_add', to_add)
+
+    @staticmethod
+    def _resolve_names(recipe, field, replace, add):
+        """Swap the names sent in ``replace`` and ``add`` for the user's
+        rows, created in bulk where missing"""
+        names = [item for item in [*(replace or ()), *add]
+                 if isinstance(item, str)]
+        if not names:
+            return replace, add
+        rows = get_or_create_names(field.related_model, recipe.user_id,
+                                   names, using=recipe._state.db)
+
+        def resolve(items):
+            return [rows[normalize(item)]
+                    if isinstance(item, str) else item for item in items]
+        return None if replace is None else resolve(replace), resolve(add)
+
+    @staticmethod
+    def _send_m2m_changed(recipe, field, action, pk_set):
+        if pk_set:
+            m2m_changed.send(
+                sender=field.remote_field.through, action=action,
+                instance=recipe, reverse=False,
+                model=field.remote_field.model, pk_set=set(pk_set),
+                using=recipe._state.db
+            )
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     ingredients = IngredientSerializer(many=True, read_only=True)
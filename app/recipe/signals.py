@@ -0,0 +1,94 @@
+from django.db.models.signals import post_save, pre_delete, post_delete, \
+    m2m_changed
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient, Recipe
+from core.names import names_created
+from core.purge import recipes_soft_deleted
+from recipe import autocomplete, detail_cache, similarity
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_autocomplete(sender, instance, using, **kwargs):
+    autocomplete.cache.invalidate(sender, instance.user_id, using)
+
+
+@receiver(names_created, sender=Tag)
+@receiver(names_created, sender=Ingredient)
+def invalidate_autocomplete_of_created(sender, user_id, using, **kwargs):
+    autocomplete.cache.invalidate(sender, user_id, using)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_detail(sender, instance, using, **kwargs):
+    detail_cache.invalidate([instance.pk], using)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_similar_recipes(sender, instance, using, **kwargs):
+    similarity.cache.invalidate(instance.user_id, [instance.pk], using)
+
+
+@receiver(recipes_soft_deleted, sender=Recipe)
+def invalidate_deleted_recipes(sender, ids, using, **kwargs):
+    detail_cache.invalidate(ids, using)
+    for user_id, recipe_ids in recipes_by_user(ids, using).items():
+        similarity.cache.invalidate(user_id, recipe_ids, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_linked_recipes(sender, instance, action, reverse, pk_set,
+                              using, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            ids = [instance.pk]
+        else:
+            return
+    elif action in ('post_add', 'post_remove'):
+        ids = list(pk_set)
+    elif action == 'pre_clear':
+        ids = list(recipes_linked_to(instance, using))
+    else:
+        return
+    detail_cache.invalidate(ids, using)
+    similarity.cache.invalidate(instance.user_id, ids, using)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def invalidate_recipes_of_name(sender, instance, using, created=False,
+                               **kwargs):
+    """Renaming a tag or ingredient changes the details of the recipes
+    listing it"""
+    if not created:
+        detail_cache.invalidate(recipes_linked_to(instance, using), using)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def invalidate_recipes_of_deleted_name(sender, instance, using, **kwargs):
+    """Deleting a tag or ingredient unlinks it from its recipes without
+    an m2m_changed signal"""
+    ids = list(recipes_linked_to(instance, using))
+    detail_cache.invalidate(ids, using)
+    similarity.cache.invalidate(instance.user_id, ids, using)
+
+
+def recipes_linked_to(instance, using):
+    relation = getattr(Recipe, f'{instance._meta.model_name}s')
+    return relation.through.objects.using(using).filter(
+        **{f'{instance._meta.model_name}_id': instance.pk}
+    ).values_list('recipe_id', flat=True)
+
+
+def recipes_by_user(ids, using):
+    users = {}
+    for pk, user_id in Recipe.all_objects.using(using).filter(
+            pk__in=ids).values_list('id', 'user_id'):
+        users.setdefault(user_id, []).append(pk)
+    return users
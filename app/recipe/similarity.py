@@ -0,0 +1,252 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from core.bus import bus
+from core.models import Recipe
+
+METRICS = ('jaccard', 'cosine')
+
+
+def load_features(user_id, recipe_ids=None):
+    """(recipe ids, feature keys) arrays of the tags and ingredients of
+    ``user_id``'s recipes
+
+    A feature key is ``2 * id + 1`` for a tag and ``2 * id`` for an
+    ingredient, so both fit one integer column.
+    """
+    pairs = []
+    for relation, field, kind in ((Recipe.tags, 'tag_id', 1),
+                                  (Recipe.ingredients, 'ingredient_id', 0)):
+        rows = relation.through.objects.filter(
+            recipe__user_id=user_id, recipe__deleted_at__isnull=True)
+        if recipe_ids is not None:
+            rows = rows.filter(recipe_id__in=recipe_ids)
+        pairs.extend(
+            (recipe_id, 2 * pk + kind) for recipe_id, pk
+            in rows.values_list('recipe_id', field).iterator())
+    pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def score(shared, size, sizes, metric):
+    if metric == 'cosine':
+        return shared / np.sqrt(size * sizes)
+    return shared / (size + sizes - shared)
+
+
+class RecipeIndex:
+    """Tag and ingredient incidence matrix of one user's recipes
+
+    Rows are held in CSR arrays and the columns' posting lists in CSC
+    arrays, so the overlap of a recipe with every other one is a single
+    ``bincount`` over the posting lists of its features. Recipes changed
+    since the arrays were built are marked stale in them and kept as sets
+    in ``overlay`` until there are enough of them to rebuild the arrays.
+    """
+
+    def __init__(self, recipe_ids, keys):
+        self.lock = threading.Lock()
+        # Recipe ids whose features changed, reloaded on the next lookup
+        self.pending = set()
+        self.overlay = {}
+        self._build(recipe_ids, keys)
+
+    def _build(self, recipe_ids, keys):
+        self.ids, rows = np.unique(recipe_ids, return_inverse=True)
+        self.keys, columns = np.unique(keys, return_inverse=True)
+        rows, columns = rows.ravel(), columns.ravel()
+
+        order = np.lexsort((columns, rows))
+        self.indptr = np.zeros(len(self.ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self.ids)),
+                  out=self.indptr[1:])
+        self.indices = columns[order].astype(np.int32)
+        self.sizes = np.diff(self.indptr)
+
+        order = np.argsort(columns, kind='stable')
+        self.postings_ptr = np.zeros(len(self.keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(columns, minlength=len(self.keys)),
+                  out=self.postings_ptr[1:])
+        self.postings = rows[order].astype(np.int32)
+        self.stale = np.zeros(len(self.ids), dtype=bool)
+
+    def __len__(self):
+        """Entries held, the measure the cache is bounded by"""
+        return len(self.indices) + sum(map(len, self.overlay.values()))
+
+    def position(self, recipe_id):
+        position = np.searchsorted(self.ids, recipe_id)
+        if position < len(self.ids) and self.ids[position] == recipe_id:
+            return position
+        return None
+
+    def features(self, recipe_id):
+        if recipe_id in self.overlay:
+            return self.overlay[recipe_id]
+        position = self.position(recipe_id)
+        if position is None:
+            return frozenset()
+        start, end = self.indptr[position], self.indptr[position + 1]
+        return frozenset(self.keys[self.indices[start:end]].tolist())
+
+    def update(self, rows):
+        """Replace the features of the recipes in ``rows``, a mapping of
+        recipe id to feature keys, empty for a deleted recipe"""
+        for recipe_id, keys in rows.items():
+            position = self.position(recipe_id)
+            if position is not None:
+                self.stale[position] = True
+            self.overlay[recipe_id] = frozenset(keys)
+        if len(self.overlay) > max(256, len(self.ids) // 20):
+            self.compact()
+
+    def compact(self):
+        keep = ~self.stale
+        recipe_ids = [np.repeat(self.ids[keep], self.sizes[keep])]
+        keys = [self.keys[self.indices[np.repeat(keep, self.sizes)]]]
+        for recipe_id, features in self.overlay.items():
+            recipe_ids.append(np.full(len(features), recipe_id))
+            keys.append(np.fromiter(features, dtype=np.int64))
+        self.overlay = {}
+        self._build(np.concatenate(recipe_ids), np.concatenate(keys))
+
+    def neighbours(self, recipe_id, limit, metric='jaccard'):
+        """Up to ``limit`` (recipe id, score) pairs of the recipes most
+        similar to ``recipe_id``, best first"""
+        features = self.features(recipe_id)
+        if not features:
+            return []
+
+        wanted = np.fromiter(features, dtype=np.int64)
+        columns = np.searchsorted(self.keys, wanted)
+        found = columns < len(self.keys)
+        found[found] = self.keys[columns[found]] == wanted[found]
+        columns = columns[found]
+        if len(columns):
+            shared = np.bincount(np.concatenate([
+                self.postings[self.postings_ptr[column]:
+                              self.postings_ptr[column + 1]]
+                for column in columns
+            ]), minlength=len(self.ids))
+            candidates = np.flatnonzero(shared)
+            candidates = candidates[~self.stale[candidates]]
+            ids = self.ids[candidates]
+            scores = score(shared[candidates], len(features),
+                           self.sizes[candidates], metric)
+        else:
+            ids, scores = np.empty(0, np.int64), np.empty(0)
+
+        changed = [
+            (other_id, len(features & other), len(other))
+            for other_id, other in self.overlay.items()
+            if features & other
+        ]
+        if changed:
+            other_ids, shared, sizes = map(np.array, zip(*changed))
+            ids = np.concatenate([ids, other_ids])
+            scores = np.concatenate([
+                scores, score(shared, len(features), sizes, metric)])
+
+        keep = ids != recipe_id
+        ids, scores = ids[keep], scores[keep]
+        if len(ids) > limit:
+            best = np.argpartition(-scores, limit - 1)[:limit]
+            ids, scores = ids[best], scores[best]
+        order = np.lexsort((ids, -scores))
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+
+class SimilarityCache:
+    """Per-user recipe indexes, built lazily and evicted least recently
+    used first once more than ``max_users`` indexes or ``max_entries``
+    entries in all are held"""
+
+    def __init__(self, max_users=64, max_entries=5000000):
+        self.max_users = max_users
+        self.max_entries = max_entries
+        self._indexes = OrderedDict()
+        # Recipes changed while an index of their user is being built
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+            else:
+                self._building.setdefault(user_id, set())
+
+        if index is None:
+            index = RecipeIndex(*load_features(user_id))
+            with self._lock:
+                index.pending = self._building.pop(user_id, set())
+                if user_id in self._indexes:
+                    # Built concurrently, that one holds the later changes
+                    index = self._indexes[user_id]
+                else:
+                    self._indexes[user_id] = index
+                    self._evict()
+
+        with index.lock:
+            with self._lock:
+                pending, index.pending = index.pending, set()
+            if pending:
+                rows = {pk: set() for pk in pending}
+                for recipe_id, key in zip(*load_features(user_id, pending)):
+                    rows[int(recipe_id)].add(int(key))
+                index.update(rows)
+        return index
+
+    def _evict(self):
+        while len(self._indexes) > self.max_users or (
+                len(self._indexes) > 1 and
+                sum(map(len, self._indexes.values())) > self.max_entries):
+            self._indexes.popitem(last=False)
+
+    def invalidate(self, user_id, recipe_ids, using='default'):
+        """Reload ``recipe_ids`` of ``user_id`` on the next lookup here and
+        in the other processes, once the transaction writing them on
+        ``using`` commits"""
+        recipe_ids = list(recipe_ids)
+
+        def invalidate():
+            self.discard([(user_id, pk) for pk in recipe_ids])
+            bus.publish('similar-recipes',
+                        [f'{user_id}:{pk}' for pk in recipe_ids])
+        transaction.on_commit(invalidate, using=using)
+
+    def discard(self, keys):
+        with self._lock:
+            for user_id, recipe_id in keys:
+                if user_id in self._indexes:
+                    self._indexes[user_id].pending.add(recipe_id)
+                if user_id in self._building:
+                    self._building[user_id].add(recipe_id)
+
+    def receive(self, keys):
+        """Invalidation of ``user_id:recipe_id`` keys from the bus"""
+        self.discard([tuple(map(int, key.split(':'))) for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+cache = SimilarityCache(
+    max_users=getattr(settings, 'SIMILAR_RECIPES_MAX_USERS', 64),
+    max_entries=getattr(settings, 'SIMILAR_RECIPES_MAX_ENTRIES', 5000000),
+)
+bus.subscribe('similar-recipes', cache.receive)
+
+
+def similar(user_id, recipe_id, limit=10, metric='jaccard'):
+    """Up to ``limit`` (recipe id, score) pairs of ``user_id``'s recipes
+    sharing the most tags and ingredients with ``recipe_id``"""
+    index = cache.get(user_id)
+    with index.lock:
+        return index.neighbours(recipe_id, limit, metric)
@@ -0,0 +1,115 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient
+from core.tests.utils import ShardedTestCase, committed
+from recipe import autocomplete
+
+TAG_AUTOCOMPLETE_ROUTE = reverse('recipe:tag-autocomplete')
+INGREDIENT_AUTOCOMPLETE_ROUTE = reverse('recipe:ingredient-autocomplete')
+
+
+class NameIndexTests(ShardedTestCase):
+    def test_prefix_matches_are_sorted(self):
+        index = autocomplete.NameIndex(
+            [(1, 'Salt'), (2, 'sugar'), (3, 'Salmon'), (4, 'Pepper')])
+        self.assertEqual(index.prefix('sal', 10), [(3, 'Salmon'), (1, 'Salt')])
+        self.assertEqual(index.prefix('sal', 1), [(3, 'Salmon')])
+
+    def test_trigram_matches_fill_suggestions(self):
+        index = autocomplete.NameIndex([(1, 'Tomato'), (2, 'Potato')])
+        self.assertEqual(index.suggest('tomatoe', 5)[0], (1, 'Tomato'))
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = autocomplete.AutocompleteCache(max_users=1)
+        user1 = get_user_model().objects.create_user('a@email.com', 'pw')
+        user2 = get_user_model().objects.create_user('b@email.com', 'pw')
+
+        cache.get(Tag, user1.id)
+        cache.get(Tag, user2.id)
+
+        self.assertEqual(
+            list(cache._indexes), [(Tag._meta.label, user2.id)])
+
+    @patch('recipe.autocomplete.bus')
+    def test_invalidation_reaches_other_processes(self, bus):
+        cache = autocomplete.AutocompleteCache()
+        user = get_user_model().objects.create_user('a@email.com', 'pw')
+        cache.get(Tag, user.id)
+        cache.get(Ingredient, user.id)
+
+        with committed():
+            cache.invalidate(Tag, user.id, using=self.shard)
+            # Other processes would still read the old names
+            bus.publish.assert_not_called()
+        bus.publish.assert_called_once_with(
+            'autocomplete', [f'core.Tag:{user.id}'])
+
+        cache.get(Tag, user.id)
+        cache.receive([f'core.Tag:{user.id}'])
+        self.assertEqual(
+            list(cache._indexes), [(Ingredient._meta.label, user.id)])
+
+
+class PrivateAutocompleteApiTests(ShardedTestCase):
+    def setUp(self):
+        autocomplete.cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'admin@email.com',
+            'password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_login_required(self):
+        res = APIClient().get(TAG_AUTOCOMPLETE_ROUTE, {'q': 'v'})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_autocomplete_tags(self):
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Dessert')
+        user2 = get_user_model().objects.create_user('b@email.com', 'pw')
+        Tag.objects.create(user=user2, name='Vegetarian')
+
+        res = self.client.get(TAG_AUTOCOMPLETE_ROUTE, {'q': 've'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': vegan.id, 'name': 'Vegan'}])
+
+    def test_autocomplete_sees_writes(self):
+        self.client.get(INGREDIENT_AUTOCOMPLETE_ROUTE, {'q': 'sa'})
+        with committed():
+            salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+        res = self.client.get(INGREDIENT_AUTOCOMPLETE_ROUTE, {'q': 'sa'})
+        self.assertEqual(res.data, [{'id': salt.id, 'name': 'Salt'}])
+
+        with committed():
+            salt.delete()
+        res = self.client.get(INGREDIENT_AUTOCOMPLETE_ROUTE, {'q': 'sa'})
+        self.assertEqual(res.data, [])
+
+    def test_autocomplete_limit(self):
+        for i in range(5):
+            Ingredient.objects.create(user=self.user, name=f'Salt {i}')
+
+        res = self.client.get(
+            INGREDIENT_AUTOCOMPLETE_ROUTE, {'q': 'salt', 'limit': 2})
+
+        self.assertEqual(
+            [i['name'] for i in res.data], ['Salt 0', 'Salt 1'])
+
+    def test_large_libraries_fall_back_to_database(self):
+        Ingredient.objects.create(user=self.user, name='Salt')
+        Ingredient.objects.create(user=self.user, name='Pepper')
+
+        with patch.object(autocomplete.cache, 'max_names', 1):
+            res = self.client.get(
+                INGREDIENT_AUTOCOMPLETE_ROUTE, {'q': 'SA'})
+
+        self.assertEqual([i['name'] for i in res.data], ['Salt'])
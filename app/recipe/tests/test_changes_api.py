@@ -0,0 +1,132 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe, SyncSequence
+from core.tests.utils import ShardedTestCase
+
+CHANGES_ROUTE = reverse('recipe:changes')
+
+
+def sample_recipe(user, **kwargs):
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 5,
+        'price': 120.00
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicChangesApiTests(ShardedTestCase):
+    def test_login_required(self):
+        res = APIClient().get(CHANGES_ROUTE)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateChangesApiTests(ShardedTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'admin@email.com',
+            'password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_initial_sync_returns_everything(self):
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe = sample_recipe(user=self.user)
+        user2 = get_user_model().objects.create_user('b@email.com', 'pw')
+        Tag.objects.create(user=user2, name='Other')
+
+        res = self.client.get(CHANGES_ROUTE)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t['id'] for t in res.data['tags']], [tag.id])
+        self.assertEqual(
+            [i['id'] for i in res.data['ingredients']], [ingredient.id])
+        self.assertEqual([r['id'] for r in res.data['recipes']], [recipe.id])
+        self.assertEqual(res.data['deleted'], [])
+        self.assertFalse(res.data['has_more'])
+
+    def test_sync_returns_only_changes_since_cursor(self):
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = sample_recipe(user=self.user)
+        cursor = self.client.get(CHANGES_ROUTE).data['cursor']
+
+        res = self.client.get(CHANGES_ROUTE, {'since': cursor})
+        self.assertEqual(res.data['recipes'], [])
+        self.assertEqual(res.data['cursor'], cursor)
+
+        recipe.tags.add(tag)
+        Ingredient.objects.create(user=self.user, name='Salt').delete()
+        res = self.client.get(CHANGES_ROUTE, {'since': cursor})
+
+        self.assertEqual([r['id'] for r in res.data['recipes']], [recipe.id])
+        self.assertEqual(res.data['recipes'][0]['tags'], [tag.id])
+        self.assertEqual(res.data['tags'], [])
+        self.assertEqual(res.data['ingredients'], [])
+        self.assertEqual(res.data['deleted'][0]['type'], 'ingredient')
+
+    def test_sync_pages_in_sequence_order(self):
+        tags = [Tag.objects.create(user=self.user, name=f'tag {i}')
+                for i in range(3)]
+        recipe = sample_recipe(user=self.user)
+        tags[0].name = 'renamed'
+        tags[0].save()
+
+        seen = []
+        cursor = 0
+        has_more = True
+        while has_more:
+            res = self.client.get(
+                CHANGES_ROUTE, {'since': cursor, 'limit': 2})
+            seen += [('tag', t['id']) for t in res.data['tags']]
+            seen += [('recipe', r['id']) for r in res.data['recipes']]
+            cursor, has_more = res.data['cursor'], res.data['has_more']
+
+        self.assertEqual(sorted(seen), sorted(
+            [('tag', tag.id) for tag in tags] + [('recipe', recipe.id)]))
+
+    def test_changes_past_watermark_left_for_later(self):
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = sample_recipe(user=self.user)
+
+        with patch.object(SyncSequence, 'watermark',
+                          return_value=tag.sync_seq):
+            res = self.client.get(CHANGES_ROUTE, {'limit': 1})
+        self.assertEqual([t['id'] for t in res.data['tags']], [tag.id])
+        self.assertEqual(res.data['recipes'], [])
+        self.assertEqual(res.data['cursor'], tag.sync_seq)
+        self.assertTrue(res.data['has_more'])
+
+        res = self.client.get(CHANGES_ROUTE, {'since': res.data['cursor']})
+        self.assertEqual([r['id'] for r in res.data['recipes']], [recipe.id])
+
+    def test_changes_held_back_by_cold_watermark(self):
+        sample_recipe(user=self.user)
+
+        # A process whose checkpoints were all taken while older
+        # transactions still ran
+        with patch.object(SyncSequence, 'watermark', return_value=0):
+            res = self.client.get(CHANGES_ROUTE, {'since': 0})
+        self.assertEqual(res.data['recipes'], [])
+        self.assertEqual(res.data['cursor'], 0)
+        self.assertTrue(res.data['has_more'])
+
+    @override_settings(DATABASE_SHARDS=[])
+    def test_deleting_user_leaves_no_tombstones(self):
+        # Deletes only cascade to the rows of a user on its own database
+        sample_recipe(user=self.user)
+        self.user.delete()
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_invalid_cursor(self):
+        res = self.client.get(CHANGES_ROUTE, {'since': 'abc'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
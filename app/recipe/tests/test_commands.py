@@ -0,0 +1,18 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from core.models import Recipe
+from core.tests.utils import ShardedTestCase
+
+
+class CommandTests(ShardedTestCase):
+    def test_benchmark_recipe_filters_rolls_back(self):
+        call_command('benchmark_recipe_filters', recipes=20, tags=5,
+                     links=2, repeat=1, stdout=StringIO())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmark_compression_rolls_back(self):
+        call_command('benchmark_compression', recipes=5, repeat=1,
+                     stdout=StringIO())
+        self.assertFalse(Recipe.objects.exists())
@@ -0,0 +1,169 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.tests.utils import ShardedTestCase, committed
+from recipe import detail_cache
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class RecipeDetailCacheTests(ShardedTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'admin@email.com', 'password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=5)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(self.tag)
+
+    def get_detail(self):
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_repeated_reads_served_from_cache(self):
+        self.get_detail()
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get_detail()
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(data['title'], 'Soup')
+
+    def test_other_users_get_not_found(self):
+        self.get_detail()
+        other = get_user_model().objects.create_user(
+            'other@email.com', 'password123')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_out_of_range_id_not_found(self):
+        for method in ('get', 'patch', 'delete'):
+            res = getattr(self.client, method)(detail_url(10 ** 20))
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_recipe_update_invalidates(self):
+        self.get_detail()
+
+        with committed():
+            self.client.patch(detail_url(self.recipe.id), {'title': 'Stew'})
+
+        self.assertEqual(self.get_detail()['title'], 'Stew')
+
+    def test_relation_changes_invalidate(self):
+        self.get_detail()
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+
+        with committed():
+            self.recipe.ingredients.add(ingredient)
+        self.assertEqual(
+            [row['name'] for row in self.get_detail()['ingredients']],
+            ['Salt'])
+
+        with committed():
+            ingredient.recipe_set.remove(self.recipe)
+        self.assertEqual(self.get_detail()['ingredients'], [])
+
+        with committed():
+            self.tag.recipe_set.clear()
+        self.assertEqual(self.get_detail()['tags'], [])
+
+    def test_tag_rename_and_delete_invalidate(self):
+        self.get_detail()
+
+        self.tag.name = 'Vegetarian'
+        with committed():
+            self.tag.save()
+        self.assertEqual(
+            [row['name'] for row in self.get_detail()['tags']],
+            ['Vegetarian'])
+
+        with committed():
+            self.tag.delete()
+        self.assertEqual(self.get_detail()['tags'], [])
+
+    def test_not_invalidated_before_commit(self):
+        with committed():
+            self.get_detail()
+            self.client.patch(detail_url(self.recipe.id), {'title': 'Stew'})
+            # Other connections would still read the old row
+            self.assertEqual(self.get_detail()['title'], 'Soup')
+
+        self.assertEqual(self.get_detail()['title'], 'Stew')
+
+    def test_delete_invalidates(self):
+        self.get_detail()
+
+        with committed():
+            self.client.delete(detail_url(self.recipe.id))
+
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class GetOrBuildTests(ShardedTestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def build(self, delay=0):
+        self.builds += 1
+        time.sleep(delay)
+        return 1, {'build': self.builds}
+
+    def test_concurrent_misses_build_once(self):
+        results = []
+
+        def fetch():
+            entry = detail_cache.get_or_build(
+                1, lambda: self.build(delay=0.2))
+            results.append(entry.payload)
+
+        threads = [threading.Thread(target=fetch) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(results, [{'build': 1}] * 5)
+
+    def test_stale_entry_served_during_refresh(self):
+        detail_cache.get_or_build(1, self.build)
+        cache.add('recipe-detail-lock:1', True)
+
+        with patch('recipe.detail_cache.time') as clock:
+            clock.time.return_value = time.time() + 3600
+            entry = detail_cache.get_or_build(1, self.build)
+
+        self.assertEqual(entry.payload, {'build': 1})
+        self.assertEqual(self.builds, 1)
+
+    def test_invalidation_during_build_is_not_cached(self):
+        def build():
+            with committed():
+                detail_cache.invalidate([1], using=self.shard)
+            return self.build()
+
+        detail_cache.get_or_build(1, build)
+        entry = detail_cache.get_or_build(1, self.build)
+
+        self.assertEqual(entry.payload, {'build': 2})
@@ -1,17 +1,17 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Ingredient
+from core.tests.utils import ShardedTestCase
 from recipe.serializers import IngredientSerializer
 
 INGREDIENT_ROUTE = reverse('recipe:ingredient-list')
 
 
-class IngredientApiTests(TestCase):
+class IngredientApiTests(ShardedTestCase):
     def setUp(self):
         self.client = APIClient()
 
@@ -20,7 +20,7 @@ class IngredientApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateIngredientApiTests(TestCase):
+class PrivateIngredientApiTests(ShardedTestCase):
     def setUp(self):
         self.user = get_user_model().objects.create(
             email='admin@email.com',
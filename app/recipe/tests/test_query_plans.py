@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from core.models import Recipe
+from core.tests.utils import ShardedTestCase
+from recipe.filters import RecipeFilter
+
+
+def explain(queryset):
+    """Query plan of ``queryset``, discouraging sequential scans that
+    the planner prefers on tiny test tables"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+    return queryset.explain()
+
+
+class RecipeQueryPlanTests(ShardedTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'admin@email.com', 'password123')
+        for i in range(20):
+            Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}', time_minutes=i * 10,
+                price=Decimal(i))
+
+    def filtered(self, **params):
+        return RecipeFilter(params).filter_queryset(
+            Recipe.objects.filter(user=self.user))
+
+    def test_time_range_uses_index(self):
+        plan = explain(self.filtered(time_min='10', time_max='30'))
+        self.assertIn('core_recipe_user_time_idx', plan)
+
+    def test_price_range_uses_index(self):
+        plan = explain(self.filtered(price_max='5'))
+        self.assertIn('core_recipe_user_price_idx', plan)
+
+    def test_ordering_by_time_uses_index(self):
+        queryset = self.filtered(time_max='100', ordering='time_minutes')
+        plan = explain(queryset)
+
+        self.assertIn('core_recipe_user_time_idx', plan)
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('TEMP B-TREE', plan)
+        times = list(queryset.values_list('time_minutes', flat=True))
+        self.assertEqual(times, sorted(times))
+
+    def test_descending_price_ordering(self):
+        prices = list(self.filtered(ordering='-price').values_list(
+            'price', flat=True))
+        self.assertEqual(prices, sorted(prices, reverse=True))
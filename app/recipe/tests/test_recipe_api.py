@@ -2,16 +2,23 @@ import tempfile
 import os
 from PIL import Image
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core.counts import cached_count
 from core.models import Recipe, Tag, Ingredient
+from core.tests.utils import ShardedTestCase
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPE_ROUTE = reverse('recipe:recipe-list')
+BULK_DELETE_ROUTE = reverse('recipe:recipe-bulk-delete')
+SHOPPING_LIST_ROUTE = reverse('recipe:recipe-shopping-list')
 
 
 def generate_image_upload_route(recipe_id):
@@ -40,7 +47,7 @@ def sample_recipe(user, **kwargs):
     return Recipe.objects.create(user=user, **defaults)
 
 
-class RecipeApiTests(TestCase):
+class RecipeApiTests(ShardedTestCase):
     def setUp(self):
         self.client = APIClient()
 
@@ -49,8 +56,10 @@ class RecipeApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateRecipeApiTests(TestCase):
+class PrivateRecipeApiTests(ShardedTestCase):
     def setUp(self):
+        # Invalidations run on commit, which TestCase never reaches
+        cache.clear()
         self.user = get_user_model().objects.create(
             email='admin@email.com',
             password='password123'
@@ -144,45 +153,446 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
-    # def test_partial_update_recipe(self):
-    #     recipe = sample_recipe(user=self.user)
-    #     recipe.tags.add(sample_tag(user=self.user))
-    #     new_tag = sample_tag(user=self.user, name='test sample tag')
-
-    #     payload = {
-    #         'title': 'updated recipe title',
-    #         'tags': [new_tag.id]
-    #     }
-    #     url = generate_detail_route(recipe.id)
-    #     self.client.patch(url, payload)
-
-    #     recipe.refresh_from_db()
-    #     print(recipe.title, "====")
-    #     self.assertEqual(recipe.title, payload['title'])
-    #     tags = recipe.tags.all()
-    #     self.assertEqual(len(tags), 1)
-    #     self.assertIn(new_tag, tags)
-
-    # # def test_full_update_recipe(self):
-    # #     recipe = sample_recipe(user=self.user)
-    # #     recipe.tags.add(sample_tag(user=self.user))
-
-    # #     payload = {
-    # #         'title': 'update recipe title',
-    # #         'time_minutes': 89,
-    # #         'price': 900
-
-    # #     }
-    # #     url = generate_detail_route(recipe.id)
-    # #     self.client.put(url, payload)
-
-    # #     recipe.refresh_from_db()
-    # #     self.assertEqual(recipe.title, payload['title'])
-    # #     tags = recipe.tags.all()
-    # #     self.assertEqual(len(tags), 0)
-
-
-class RecipeImageUploadTests(TestCase):
+    def test_create_recipe_with_foreign_ingredient(self):
+        user2 = get_user_model().objects.create(
+            email='admin2@email.com',
+            password='password123'
+        )
+        ingredient = sample_ingredient(user=user2)
+
+        payload = {
+            'title': 'Sample recipe title',
+            'time_minutes': 7,
+            'price': 400,
+            'ingredients': [ingredient.id]
+        }
+        res = self.client.post(RECIPE_ROUTE, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ingredients', res.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_ingredient_queries_constant(self):
+        ingredients = [
+            sample_ingredient(user=self.user, name=f'ingredient {i}')
+            for i in range(50)
+        ]
+
+        def create(ingredient_ids):
+            payload = {
+                'title': 'Sample recipe title',
+                'time_minutes': 7,
+                'price': 400,
+                'ingredients': ingredient_ids,
+                'tags': []
+            }
+            with CaptureQueriesContext(connections[self.shard]) as queries:
+                res = self.client.post(RECIPE_ROUTE, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+
+        # Seeds the maintained recipe count
+        create([])
+        one = create([ingredients[0].id])
+        many = create([ingredient.id for ingredient in ingredients])
+
+        self.assertEqual(one, many)
+
+    def test_create_recipe_with_tag_names(self):
+        vegan = sample_tag(user=self.user, name='Vegan')
+        other = get_user_model().objects.create_user(
+            'other@email.com', 'password123')
+        sample_tag(user=other, name='Quick')
+        sample_tag(user=self.user, name='Spicy')
+        payload = {
+            'title': 'Sample recipe title',
+            'time_minutes': 7,
+            'price': 400,
+            'ingredients': [],
+            'tags': [vegan.id, 'vegan', {'name': ' Quick '}, 'Quick',
+                     {'name': '2020'}],
+        }
+
+        res = self.client.post(RECIPE_ROUTE, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['2020', 'Quick', 'Vegan'])
+        self.assertEqual(
+            Tag.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(cached_count(Tag, self.user.id, self.shard), 4)
+
+    def test_create_recipe_names_created_in_bulk(self):
+        def create(names):
+            payload = {
+                'title': 'Sample recipe title',
+                'time_minutes': 7,
+                'price': 400,
+                'ingredients': names,
+                'tags': []
+            }
+            with CaptureQueriesContext(connections[self.shard]) as queries:
+                res = self.client.post(RECIPE_ROUTE, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            # Backends without bulk insert RETURNING allocate sync
+            # sequence values one by one
+            return len([query for query in queries
+                        if 'core_syncsequence' not in query['sql']])
+
+        create(['seed'])
+        one = create(['salt'])
+        many = create([f'ingredient {i}' for i in range(50)])
+
+        self.assertEqual(one, many)
+        self.assertEqual(Ingredient.objects.count(), 52)
+
+    def test_names_link_oldest_of_duplicate_rows(self):
+        oldest = sample_tag(user=self.user, name='Vegan')
+        sample_tag(user=self.user, name='VEGAN')
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.patch(generate_detail_route(recipe.id),
+                                {'tags': ['vegan']}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'], [oldest.id])
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_partial_update_adds_tag_by_name(self):
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.patch(generate_detail_route(recipe.id),
+                                {'tags_add': ['Vegan']}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        tag = Tag.objects.get(user=self.user)
+        self.assertEqual(res.data['tags'], [tag.id])
+        self.assertEqual(tag.name, 'Vegan')
+
+    def test_invalid_tag_names_rejected(self):
+        for tags in [[''], [{'name': 3}], ['x' * 256]]:
+            res = self.client.post(RECIPE_ROUTE, {
+                'title': 'Sample recipe title', 'time_minutes': 7,
+                'price': 400, 'ingredients': [], 'tags': tags},
+                format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('tags', res.data)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_out_of_range_ids_rejected(self):
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.post(RECIPE_ROUTE, {
+            'title': 'Sample recipe title', 'time_minutes': 7,
+            'price': 400, 'ingredients': [], 'tags': [10 ** 20]},
+            format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+
+        res = self.client.patch(generate_detail_route(recipe.id), {
+            'ingredients_add': ['99999999999999999999']}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ingredients_add', res.data)
+
+    def test_filters_combine(self):
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        recipe1 = sample_recipe(user=self.user, title='Recipe 1')
+        recipe1.tags.add(tag)
+        recipe1.ingredients.add(ingredient)
+        recipe2 = sample_recipe(user=self.user, title='Recipe 2')
+        recipe2.tags.add(tag)
+
+        res = self.client.get(RECIPE_ROUTE, {
+            'tags': f'{tag.id}',
+            'ingredients': f'{ingredient.id}'
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [recipe1.id])
+
+    def test_filter_by_tags_without_duplicates(self):
+        tag1 = sample_tag(user=self.user, name='tag1')
+        tag2 = sample_tag(user=self.user, name='tag2')
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPE_ROUTE, {'tags': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual([r['id'] for r in res.data], [recipe.id])
+
+    def test_filter_by_tags_match_all(self):
+        tag1 = sample_tag(user=self.user, name='tag1')
+        tag2 = sample_tag(user=self.user, name='tag2')
+        recipe1 = sample_recipe(user=self.user)
+        recipe1.tags.add(tag1, tag2)
+        recipe2 = sample_recipe(user=self.user)
+        recipe2.tags.add(tag1)
+
+        res = self.client.get(RECIPE_ROUTE, {
+            'tags': f'{tag1.id},{tag2.id}',
+            'match': 'all'
+        })
+
+        self.assertEqual([r['id'] for r in res.data], [recipe1.id])
+
+    def test_filter_by_price_and_time_range(self):
+        sample_recipe(user=self.user, price=5, time_minutes=10)
+        recipe = sample_recipe(user=self.user, price=10, time_minutes=20)
+        sample_recipe(user=self.user, price=15, time_minutes=30)
+        sample_recipe(user=self.user, price=10, time_minutes=60)
+
+        res = self.client.get(RECIPE_ROUTE, {
+            'price_min': '7.50',
+            'price_max': '12',
+            'time_max': 30
+        })
+
+        self.assertEqual([r['id'] for r in res.data], [recipe.id])
+
+    def test_filter_by_title(self):
+        recipe = sample_recipe(user=self.user, title='Beef stew')
+        sample_recipe(user=self.user, title='Chicken curry')
+
+        res = self.client.get(RECIPE_ROUTE, {'title': 'stew'})
+
+        self.assertEqual([r['id'] for r in res.data], [recipe.id])
+
+    def test_search_recipes_by_title(self):
+        recipe1 = sample_recipe(user=self.user, title='Spicy beef stew')
+        recipe2 = sample_recipe(user=self.user, title='Beef stew')
+        sample_recipe(user=self.user, title='Chicken curry')
+        user2 = get_user_model().objects.create(
+            email='admin2@email.com',
+            password='password123'
+        )
+        sample_recipe(user=user2, title='Beef stew')
+
+        res = self.client.get(RECIPE_ROUTE, {'search': 'stews beef'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(r['id'] for r in res.data), [recipe1.id, recipe2.id])
+        self.assertEqual(res.data[0]['title'], 'Beef stew')
+
+    def test_search_follows_title_changes(self):
+        recipe = sample_recipe(user=self.user, title='Beef stew')
+        recipe.title = 'Chicken curry'
+        recipe.save()
+
+        res = self.client.get(RECIPE_ROUTE, {'search': 'beef'})
+        self.assertEqual(res.data, [])
+
+        res = self.client.get(RECIPE_ROUTE, {'search': 'curry'})
+        self.assertEqual([r['id'] for r in res.data], [recipe.id])
+
+        recipe.delete()
+        res = self.client.get(RECIPE_ROUTE, {'search': 'curry'})
+        self.assertEqual(res.data, [])
+
+    def test_search_ignores_query_syntax(self):
+        sample_recipe(user=self.user, title='Beef stew')
+
+        res = self.client.get(RECIPE_ROUTE, {'search': '"beef* ('})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_order_recipes_by_time(self):
+        slow = sample_recipe(user=self.user, time_minutes=90)
+        quick = sample_recipe(user=self.user, time_minutes=10)
+
+        res = self.client.get(RECIPE_ROUTE, {'ordering': 'time_minutes'})
+        self.assertEqual([r['id'] for r in res.data], [quick.id, slow.id])
+
+        res = self.client.get(RECIPE_ROUTE, {'ordering': '-time_minutes'})
+        self.assertEqual([r['id'] for r in res.data], [slow.id, quick.id])
+
+    def test_invalid_ordering(self):
+        res = self.client.get(RECIPE_ROUTE, {'ordering': 'user__password'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_paginated_recipes(self):
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(RECIPE_ROUTE, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 3)
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipes[2].id, recipes[1].id])
+        self.assertIsNotNone(res.data['next'])
+
+        res = self.client.get(RECIPE_ROUTE, {'page_size': 2, 'page': 2})
+        self.assertEqual(
+            [r['id'] for r in res.data['results']], [recipes[0].id])
+
+    def test_invalid_filter_value(self):
+        res = self.client.get(RECIPE_ROUTE, {'tags': 'one,two'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECIPE_ROUTE, {'match': 'some'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for params in [{'time_min': '99999999999999999999'},
+                       {'tags': '1,99999999999999999999999'},
+                       {'price_min': 'NaN'}, {'price_max': 'Infinity'},
+                       {'price_max': '-inf'}, {'price_min': '1e400'}]:
+            res = self.client.get(RECIPE_ROUTE, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sparse_fieldsets(self):
+        recipe = sample_recipe(user=self.user, title='Beef stew')
+        recipe.tags.add(sample_tag(user=self.user))
+
+        with CaptureQueriesContext(connections[self.shard]) as queries:
+            res = self.client.get(RECIPE_ROUTE, {'fields': 'title,price'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data, [{'id': recipe.id, 'title': 'Beef stew',
+                        'price': '120.00'}])
+        sql = queries[-1]['sql']
+        self.assertNotIn('core_recipe_tags', sql)
+        self.assertNotIn('"link"', sql)
+
+    def test_sparse_fieldsets_prefetch_requested_relations(self):
+        for i in range(3):
+            recipe = sample_recipe(user=self.user)
+            recipe.tags.add(sample_tag(user=self.user, name=f'tag {i}'))
+
+        with CaptureQueriesContext(connections[self.shard]) as queries:
+            res = self.client.get(RECIPE_ROUTE, {'fields': 'tags'})
+
+        self.assertEqual(len(res.data), 3)
+        self.assertEqual(set(res.data[0]), {'id', 'tags'})
+        self.assertEqual(len(queries), 2)
+
+    def test_delete_recipe(self):
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.delete(generate_detail_route(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Recipe.objects.exists())
+        res = self.client.get(generate_detail_route(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_delete_recipes(self):
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        kept = sample_recipe(user=self.user)
+        user2 = get_user_model().objects.create(
+            email='admin2@email.com',
+            password='password123'
+        )
+        foreign = sample_recipe(user=user2)
+
+        res = self.client.post(
+            BULK_DELETE_ROUTE,
+            {'ids': [recipe1.id, recipe2.id, foreign.id]},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'deleted': 2})
+        self.assertEqual(
+            set(Recipe.objects.all()), {kept, foreign})
+
+    def test_bulk_delete_invalid_ids(self):
+        res = self.client.post(
+            BULK_DELETE_ROUTE, {'ids': 'all'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(
+            BULK_DELETE_ROUTE, {'ids': [1, 10 ** 20]}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_partial_update_recipe(self):
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+        new_tag = sample_tag(user=self.user, name='test sample tag')
+
+        payload = {
+            'title': 'updated recipe title',
+            'tags': [new_tag.id]
+        }
+        url = generate_detail_route(recipe.id)
+        self.client.patch(url, payload)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, payload['title'])
+        tags = recipe.tags.all()
+        self.assertEqual(len(tags), 1)
+        self.assertIn(new_tag, tags)
+
+    def test_full_update_recipe(self):
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+
+        payload = {
+            'title': 'update recipe title',
+            'time_minutes': 89,
+            'price': 900
+
+        }
+        url = generate_detail_route(recipe.id)
+        self.client.put(url, payload)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, payload['title'])
+        tags = recipe.tags.all()
+        self.assertEqual(len(tags), 0)
+
+    def test_partial_update_add_and_remove_tags(self):
+        tag1 = sample_tag(user=self.user, name='tag1')
+        tag2 = sample_tag(user=self.user, name='tag2')
+        tag3 = sample_tag(user=self.user, name='tag3')
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag1, tag2)
+
+        payload = {'tags_add': [tag2.id, tag3.id], 'tags_remove': [tag1.id]}
+        url = generate_detail_route(recipe.id)
+        res = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(res.data['tags']), [tag2.id, tag3.id])
+        self.assertEqual(
+            set(recipe.tags.values_list('id', flat=True)), {tag2.id, tag3.id})
+
+    def test_update_only_writes_changed_links(self):
+        tags = [sample_tag(user=self.user, name=f'tag{i}') for i in range(5)]
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(*tags[:4])
+        through = Recipe.tags.through
+        kept = set(through.objects.filter(
+            tag__in=tags[1:4]).values_list('id', flat=True))
+
+        payload = {'tags': [tag.id for tag in tags[1:]]}
+        url = generate_detail_route(recipe.id)
+        self.client.patch(url, payload, format='json')
+
+        self.assertTrue(kept <= set(through.objects.filter(
+            recipe=recipe).values_list('id', flat=True)))
+        self.assertEqual(
+            set(recipe.tags.all()), set(tags[1:]))
+
+    def test_update_rejects_list_with_operations(self):
+        tag = sample_tag(user=self.user)
+        recipe = sample_recipe(user=self.user)
+
+        payload = {'tags': [tag.id], 'tags_remove': [tag.id]}
+        url = generate_detail_route(recipe.id)
+        res = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeImageUploadTests(ShardedTestCase):
     def setUp(self):
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
@@ -257,3 +667,50 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn(serializer1.data, res.data)
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer3.data, res.data)
+
+
+class ShoppingListTests(ShardedTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'admin@email.com', 'password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.salt = sample_ingredient(self.user, 'Salt')
+        self.egg = sample_ingredient(self.user, 'Egg')
+        self.omelette = sample_recipe(self.user, title='Omelette')
+        self.omelette.ingredients.set([self.salt, self.egg])
+        self.soup = sample_recipe(self.user, title='Soup')
+        self.soup.ingredients.set([self.salt])
+
+    def get_list(self, recipes):
+        return self.client.get(SHOPPING_LIST_ROUTE, {
+            'ids': ','.join(str(recipe.id) for recipe in recipes)})
+
+    def test_ingredients_merged_in_one_query(self):
+        with self.assertNumQueries(1, using=self.shard):
+            res = self.get_list([self.omelette, self.soup])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': self.egg.id, 'name': 'Egg', 'recipes': 1},
+            {'id': self.salt.id, 'name': 'Salt', 'recipes': 2},
+        ])
+
+    def test_other_users_and_deleted_recipes_skipped(self):
+        user2 = get_user_model().objects.create_user(
+            'admin2@email.com', 'password123')
+        foreign = sample_recipe(user2)
+        foreign.ingredients.add(sample_ingredient(user2, 'Flour'))
+        self.omelette.deleted_at = timezone.now()
+        self.omelette.save()
+
+        res = self.get_list([self.omelette, self.soup, foreign])
+
+        self.assertEqual(res.data, [
+            {'id': self.salt.id, 'name': 'Salt', 'recipes': 1}])
+
+    def test_invalid_ids(self):
+        for ids in ['1,two', '1,99999999999999999999999']:
+            res = self.client.get(SHOPPING_LIST_ROUTE, {'ids': ids})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
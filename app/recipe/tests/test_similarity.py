@@ -0,0 +1,171 @@
+from unittest.mock import patch
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.purge import soft_delete_recipes
+from core.tests.utils import ShardedTestCase, committed
+from recipe import similarity
+
+
+def similar_url(recipe_id):
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def make_index(rows):
+    """Index of {recipe id: feature keys}"""
+    pairs = [(pk, key) for pk, keys in rows.items() for key in keys]
+    recipe_ids, keys = zip(*pairs)
+    return similarity.RecipeIndex(
+        np.array(recipe_ids, dtype=np.int64), np.array(keys, dtype=np.int64))
+
+
+class RecipeIndexTests(ShardedTestCase):
+    def setUp(self):
+        self.index = make_index({
+            1: {10, 11, 12},
+            2: {10, 11, 12, 13},
+            3: {10, 20},
+            4: {30},
+        })
+
+    def test_neighbours_ranked_by_jaccard(self):
+        self.assertEqual(self.index.neighbours(1, 10),
+                         [(2, 0.75), (3, 0.25)])
+        self.assertEqual(self.index.neighbours(1, 1), [(2, 0.75)])
+        self.assertEqual(self.index.neighbours(4, 10), [])
+        self.assertEqual(self.index.neighbours(99, 10), [])
+
+    def test_cosine(self):
+        [(pk, score)] = self.index.neighbours(3, 1, 'cosine')
+
+        self.assertEqual(pk, 1)
+        self.assertAlmostEqual(score, 1 / np.sqrt(6))
+
+    def test_updates_served_before_compaction(self):
+        self.index.update({2: set(), 4: {10, 11, 12}, 5: {20}})
+
+        self.assertEqual(self.index.neighbours(1, 10),
+                         [(4, 1.0), (3, 0.25)])
+        self.assertEqual(self.index.neighbours(5, 10), [(3, 0.5)])
+        self.assertEqual(self.index.neighbours(2, 10), [])
+
+    def test_compaction_matches_rebuild(self):
+        self.index.update({2: set(), 4: {10, 11, 12}, 5: {20}})
+        self.index.compact()
+
+        rebuilt = make_index({1: {10, 11, 12}, 3: {10, 20},
+                              4: {10, 11, 12}, 5: {20}})
+        self.assertEqual(self.index.overlay, {})
+        for pk in [1, 3, 4, 5]:
+            self.assertEqual(self.index.neighbours(pk, 10),
+                             rebuilt.neighbours(pk, 10))
+
+
+class SimilarRecipesApiTests(ShardedTestCase):
+    def setUp(self):
+        similarity.cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'admin@email.com', 'password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.egg = Ingredient.objects.create(user=self.user, name='Egg')
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.omelette = self.create_recipe(
+            'Omelette', [self.salt, self.egg], [self.vegan])
+        self.frittata = self.create_recipe(
+            'Frittata', [self.salt, self.egg], [])
+        self.soup = self.create_recipe('Soup', [self.salt], [])
+
+    def create_recipe(self, title, ingredients, tags, user=None):
+        recipe = Recipe.objects.create(
+            user=user or self.user, title=title, time_minutes=5, price=5)
+        recipe.ingredients.set(ingredients)
+        recipe.tags.set(tags)
+        return recipe
+
+    def get_similar(self, recipe, **params):
+        res = self.client.get(similar_url(recipe.id), params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [(row['title'], row['score']) for row in res.data]
+
+    def test_similar_recipes_best_first(self):
+        self.assertEqual(self.get_similar(self.omelette),
+                         [('Frittata', 0.6667), ('Soup', 0.3333)])
+        self.assertEqual(self.get_similar(self.omelette, limit=1),
+                         [('Frittata', 0.6667)])
+
+    def test_other_users_recipes_not_found_or_suggested(self):
+        other = get_user_model().objects.create_user(
+            'other@email.com', 'password123')
+        theirs = self.create_recipe(
+            'Eggs', [Ingredient.objects.create(user=other, name='Egg')], [],
+            user=other)
+
+        res = self.client.get(similar_url(theirs.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('Eggs', dict(self.get_similar(self.omelette)))
+
+    def test_out_of_range_id_not_found(self):
+        res = self.client.get(similar_url(10 ** 20))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_metric_rejected(self):
+        res = self.client.get(similar_url(self.omelette.id),
+                              {'metric': 'euclid'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_relation_changes_update_index(self):
+        self.get_similar(self.omelette)
+
+        with committed():
+            self.soup.ingredients.add(self.egg)
+            self.soup.tags.add(self.vegan)
+        self.assertEqual(self.get_similar(self.omelette)[0], ('Soup', 1.0))
+
+        with committed():
+            self.egg.recipe_set.remove(self.soup)
+            self.vegan.delete()
+        self.assertEqual(self.get_similar(self.omelette),
+                         [('Frittata', 1.0), ('Soup', 0.5)])
+
+    def test_deleted_recipes_dropped(self):
+        self.get_similar(self.omelette)
+
+        with committed():
+            soft_delete_recipes(Recipe.objects.filter(pk=self.frittata.pk))
+            self.soup.delete()
+
+        self.assertEqual(self.get_similar(self.omelette), [])
+
+    @patch('recipe.similarity.bus')
+    def test_changes_reach_other_processes(self, bus):
+        with committed():
+            self.soup.ingredients.add(self.egg)
+            bus.publish.assert_not_called()
+
+        bus.publish.assert_called_with(
+            'similar-recipes', [f'{self.user.id}:{self.soup.id}'])
+
+
+class SimilarityCacheTests(ShardedTestCase):
+    def test_cache_bounded(self):
+        cache = similarity.SimilarityCache(max_users=2, max_entries=10)
+        with patch('recipe.similarity.load_features') as load:
+            load.return_value = (np.arange(6), np.arange(6))
+            cache.get(1)
+            cache.get(2)
+            self.assertEqual(list(cache._indexes), [2])
+
+            load.return_value = (np.arange(2), np.arange(2))
+            cache.get(3)
+            cache.get(4)
+            self.assertEqual(list(cache._indexes), [3, 4])
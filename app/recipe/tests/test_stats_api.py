@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from core.tests.utils import ShardedTestCase
+
+STATS_ROUTE = reverse('recipe:stats')
+
+
+class StatsApiTests(ShardedTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'admin@email.com', 'password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_login_required(self):
+        res = APIClient().get(STATS_ROUTE)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stats_of_own_recipes(self):
+        other = get_user_model().objects.create_user(
+            'other@email.com', 'password123')
+        Recipe.objects.create(
+            user=other, title='Cake', price=50, time_minutes=200)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        Recipe.objects.create(
+            user=self.user, title='Soup', price=4, time_minutes=10
+        ).tags.add(tag)
+
+        res = self.client.get(STATS_ROUTE, {'top_tags': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 1)
+        self.assertEqual(res.data['price']['average'], '4.00')
+        self.assertEqual(res.data['top_tags'],
+                         [{'id': tag.id, 'name': 'Vegan', 'count': 1}])
+
+    def test_served_from_summary(self):
+        self.client.get(STATS_ROUTE)
+        Recipe.objects.create(
+            user=self.user, title='Soup', price=4, time_minutes=10)
+
+        with self.assertNumQueries(3, using=self.shard):
+            res = self.client.get(STATS_ROUTE)
+
+        self.assertEqual(res.data['count'], 1)
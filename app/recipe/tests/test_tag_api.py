@@ -1,17 +1,17 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Tag
+from core.tests.utils import ShardedTestCase
 from recipe.serializers import TagSerializer
 
 TAGS_ROUTE = reverse('recipe:tag-list')
 
 
-class TagsApiTests(TestCase):
+class TagsApiTests(ShardedTestCase):
     def setUp(self):
         self.client = APIClient()
 
@@ -20,7 +20,7 @@ class TagsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateTagsApiTests(TestCase):
+class PrivateTagsApiTests(ShardedTestCase):
     def setUp(self):
         self.user = get_user_model().objects.create(
             email='admin@email.com',
@@ -55,6 +55,13 @@ class PrivateTagsApiTests(TestCase):
         self.assertEqual(len(res.data), 1)
         self.assertEqual(res.data[0]['name'], tag.name)
 
+    def test_sparse_fieldsets(self):
+        Tag.objects.create(user=self.user, name='tag 1')
+
+        res = self.client.get(TAGS_ROUTE, {'fields': 'id'})
+
+        self.assertEqual(list(res.data[0]), ['id'])
+
     def test_create_tag_successfully(self):
         payload = {"name": "test tag"}
         self.client.post(TAGS_ROUTE, payload)
@@ -65,6 +72,13 @@ class PrivateTagsApiTests(TestCase):
         ).exists()
         self.assertTrue(exists)
 
+    def test_create_tag_differing_in_case(self):
+        Tag.objects.create(user=self.user, name='Vegan')
+        res = self.client.post(TAGS_ROUTE, {'name': 'VEGAN'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['name'], 'VEGAN')
+
     def test_create_tag_invalid(self):
         payload = {"name": " "}
         res = self.client.post(TAGS_ROUTE, payload)
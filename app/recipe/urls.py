@@ -11,5 +11,7 @@ router.register('recipes', views.RecipeViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
+    path('changes/', views.ChangesView.as_view(), name='changes'),
+    path('stats/', views.StatsView.as_view(), name='stats'),
     path('', include(router.urls))
 ]
@@ -1,18 +1,108 @@
+from heapq import merge
+
+from django.db import router
+from django.db.models import Count
+from django.http import Http404
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+
+from core import stats
+from core.authentication import ExpiringTokenAuthentication
+from core.models import Tag, Ingredient, Recipe, RecipeStats, \
+    SyncSequence, Tombstone
+from core.purge import soft_delete_recipes
+from core.routers import use_shard
+from core.sharding import shard_for_user
+
+from recipe import serializers, autocomplete, detail_cache, similarity
+from recipe.filters import RecipeFilter, MIN_INT, MAX_INT, \
+    convert_params_to_list, to_int
+from recipe.pagination import OptionalPageNumberPagination
+
+# Query params that don't narrow a list
+LIST_PARAMS = {'fields', 'ordering', 'page', 'page_size'}
+
+
+class UserShardMixin:
+    """Run the queries of an authenticated request on the user's shard"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.previous_shard = use_shard(shard_for_user(request.user.pk))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Requests refused before initial() picked a shard changed nothing
+        if hasattr(self, 'previous_shard'):
+            use_shard(self.previous_shard)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class SparseFieldsetMixin:
+    """Support ``?fields=a,b`` on reads
+
+    The serializer drops the fields that weren't asked for and the queryset
+    only selects their columns. Many-to-many fields are prefetched only
+    when requested.
+    """
+
+    def get_requested_fields(self):
+        raw = self.request.query_params.get('fields')
+        if self.request.method not in SAFE_METHODS or not raw:
+            return None
+        return {'id'} | {name.strip() for name in raw.split(',')} - {''}
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_requested_fields()
+        return context
+
+    def prune_queryset(self, queryset):
+        if self.request.method not in SAFE_METHODS:
+            return queryset
 
-from core.models import Tag, Ingredient, Recipe
+        requested = self.get_requested_fields()
+        model_fields = {
+            field.name: field for field in queryset.model._meta.get_fields()
+            if field.concrete
+        }
+        if requested is None:
+            requested = set(model_fields)
+        else:
+            queryset = queryset.only(*(
+                name for name in requested
+                if name in model_fields
+                and not model_fields[name].many_to_many
+            ))
 
-from recipe import serializers
+        return queryset.prefetch_related(*(
+            name for name in sorted(requested)
+            if name in model_fields and model_fields[name].many_to_many
+        ))
 
 
-class BaseRecipeViewSet(viewsets.GenericViewSet,
+class PaginationMixin:
+    """Optional pagination counted through core.counts"""
+    pagination_class = OptionalPageNumberPagination
+
+    def get_counter(self):
+        """Maintained count matching unfiltered lists"""
+        if set(self.request.query_params) <= LIST_PARAMS:
+            return self.queryset.model, self.request.user.id
+        return None
+
+
+class BaseRecipeViewSet(UserShardMixin,
+                        PaginationMixin,
+                        SparseFieldsetMixin,
+                        viewsets.GenericViewSet,
                         mixins.ListModelMixin,
                         mixins.CreateModelMixin):
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (ExpiringTokenAuthentication, )
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
@@ -21,11 +111,29 @@ class BaseRecipeViewSet(viewsets.GenericViewSet,
 
         if assigned_only:
             queryset = queryset.filter(recipe__isnull=True)
-        return queryset.filter(user=self.request.user).order_by('-name')
+        queryset = queryset.filter(user=self.request.user).order_by('-name')
+        return self.prune_queryset(queryset)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(methods=['GET'], detail=False)
+    def autocomplete(self, request):
+        """Type-ahead over the user's names, ?q=<text>&limit=<k>"""
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+        matches = autocomplete.suggest(
+            self.queryset.model,
+            request.user,
+            request.query_params.get('q', ''),
+            max(limit, 1)
+        )
+        serializer = self.get_serializer(
+            [{'id': pk, 'name': name} for pk, name in matches], many=True)
+        return Response(serializer.data)
+
 
 class TagViewSet(BaseRecipeViewSet):
     queryset = Tag.objects.all()
@@ -37,41 +145,21 @@ class IngredientViewSet(BaseRecipeViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(UserShardMixin, PaginationMixin, SparseFieldsetMixin,
+                    viewsets.ModelViewSet):
 
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (ExpiringTokenAuthentication, )
     permission_classes = (IsAuthenticated,)
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.defer('search_vector')
     serializer_class = serializers.RecipeSerializer
 
-    def _convert_params_to_list(self, cs):
-        """Method to convert strings params into a list of
-        integers
-
-        Arguments:
-            cs {comma separated string}
-
-        Returns:
-            list -- list of integers
-        """
-        return [int(str_id) for str_id in cs.split(',')]
-
     def get_queryset(self):
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-
-        queryset = self.queryset
-
-        if tags:
-            tag_ids = self._convert_params_to_list(tags)
-            queryset = self.queryset.filter(tags__id__in=tag_ids)
-
-        if ingredients:
-            ingredient_ids = self._convert_params_to_list(ingredients)
-            queryset = self.queryset.filter(
-                ingredients__id__in=ingredient_ids)
-
-        return queryset.filter(user=self.request.user)
+        queryset = RecipeFilter(
+            self.request.query_params).filter_queryset(self.queryset)
+        queryset = queryset.filter(user=self.request.user)
+        if not queryset.ordered:
+            queryset = queryset.order_by('-id')
+        return self.prune_queryset(queryset)
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -80,10 +168,105 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeImageSerializer
         return self.serializer_class
 
+    def retrieve(self, request, *args, **kwargs):
+        """Recipe detail, served from recipe.detail_cache unless only
+        some fields are requested"""
+        pk = self.kwargs[self.lookup_field]
+        if self.get_requested_fields() is not None or not pk.isdigit():
+            return super().retrieve(request, *args, **kwargs)
+
+        entry = detail_cache.get_or_build(self.detail_pk(), self._build_detail)
+        if entry.user_id != request.user.pk:
+            raise Http404
+        return Response(entry.payload)
+
+    def detail_pk(self):
+        """pk of a detail route, 404 when the id column can't hold it"""
+        try:
+            return to_int(self.kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+
+    def get_object(self):
+        self.detail_pk()
+        return super().get_object()
+
+    def _build_detail(self):
+        recipe = self.get_object()
+        return recipe.user_id, self.get_serializer(recipe).data
+
     def perform_create(self, serializer):
         """Create a recipe"""
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        soft_delete_recipes(Recipe.objects.filter(pk=instance.pk))
+
+    @action(methods=['POST'], detail=False, url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """Delete the recipes listed in ``ids``, rows and images are
+        purged in the background"""
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not all(
+                isinstance(pk, int) and not isinstance(pk, bool) and
+                MIN_INT <= pk <= MAX_INT for pk in ids):
+            return Response(
+                {'ids': ['Expected a list of integers.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        deleted = soft_delete_recipes(
+            Recipe.objects.filter(user=request.user, pk__in=ids))
+        return Response({'deleted': deleted}, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=False, url_path='shopping-list')
+    def shopping_list(self, request):
+        """Ingredients of the recipes listed in ``?ids=1,2,3``, each with
+        the number of those recipes using it"""
+        try:
+            ids = convert_params_to_list(request.query_params.get('ids', ''))
+        except ValueError:
+            raise ValidationError(
+                {'ids': ['Expected a comma separated list of integers.']})
+
+        rows = Recipe.ingredients.through.objects.filter(
+            recipe_id__in=ids,
+            recipe__user=request.user,
+            recipe__deleted_at__isnull=True,
+        ).values('ingredient_id', 'ingredient__name').annotate(
+            recipes=Count('recipe_id')
+        ).order_by('ingredient__name', 'ingredient_id')
+        return Response([
+            {'id': row['ingredient_id'], 'name': row['ingredient__name'],
+             'recipes': row['recipes']}
+            for row in rows
+        ])
+
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        """Recipes sharing the most tags and ingredients with this one,
+        ?limit=<k>&metric=jaccard|cosine, best first"""
+        recipe = get_object_or_404(
+            Recipe.objects.filter(user=request.user).only('id'),
+            pk=self.detail_pk())
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+        metric = request.query_params.get('metric', 'jaccard')
+        if metric not in similarity.METRICS:
+            choices = ', '.join(similarity.METRICS)
+            raise ValidationError({'metric': [f'Expected one of {choices}.']})
+
+        scores = dict(similarity.similar(
+            request.user.pk, recipe.pk, max(limit, 1), metric))
+        recipes = self.prune_queryset(
+            self.queryset.filter(user=request.user, pk__in=scores))
+        recipes = sorted(recipes, key=lambda row: (-scores[row.pk], row.pk))
+        data = self.get_serializer(recipes, many=True).data
+        for row, recipe in zip(data, recipes):
+            row['score'] = round(scores[recipe.pk], 4)
+        return Response(data)
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         recipe = self.get_object()
@@ -99,3 +282,80 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class StatsView(UserShardMixin, APIView):
+    """Summary of the user's recipes: count, prices, a cooking time
+    histogram and the ``?top_tags=<k>`` most used tags"""
+    authentication_classes = (ExpiringTokenAuthentication, )
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        try:
+            top_tags = min(int(request.query_params.get('top_tags', 10)), 50)
+        except ValueError:
+            top_tags = 10
+        # Summaries are built on first read, on the primary
+        return Response(stats.get_stats(
+            request.user.pk, using=router.db_for_write(RecipeStats),
+            top_tags=max(top_tags, 0)))
+
+
+class ChangesView(UserShardMixin, APIView):
+    """Rows changed or deleted since ``?since=<cursor>``
+
+    Changes are returned in ``sync_seq`` order, at most ``limit`` per page.
+    Clients pass the returned ``cursor`` back as ``since`` until
+    ``has_more`` is false. Changes past ``SyncSequence.watermark`` are left
+    for a later call, with ``has_more`` set so clients come back for them.
+    """
+    authentication_classes = (ExpiringTokenAuthentication, )
+    permission_classes = (IsAuthenticated,)
+    max_limit = 500
+    sources = (
+        ('recipes', Recipe.objects.defer('search_vector').prefetch_related(
+            'tags', 'ingredients'), serializers.RecipeSerializer),
+        ('tags', Tag.objects.all(), serializers.TagSerializer),
+        ('ingredients', Ingredient.objects.all(),
+         serializers.IngredientSerializer),
+        ('deleted', Tombstone.objects.all(), None),
+    )
+
+    def get(self, request):
+        since = self._parse('since', 0)
+        limit = min(self._parse('limit', 100), self.max_limit) or 1
+
+        # Read on the primary the watermark is taken from, a replica may
+        # not have replayed every change below it yet
+        using = router.db_for_write(SyncSequence)
+        watermark = SyncSequence.watermark(using)
+        streams = []
+        for key, queryset, _ in self.sources:
+            queryset = queryset.using(using).filter(
+                user=request.user, sync_seq__gt=since)
+            streams.append([(row.sync_seq, key, row) for row in
+                            queryset.order_by('sync_seq')[:limit + 1]])
+        changes = list(merge(*streams, key=lambda change: change[0]))
+        # Lower values may still commit after the ones past the watermark
+        page = [change for change in changes[:limit]
+                if watermark is None or change[0] <= watermark]
+
+        data = {'cursor': page[-1][0] if page else since,
+                'has_more': len(changes) > len(page)}
+        for key, _, serializer_class in self.sources:
+            rows = [row for _, change_key, row in page if change_key == key]
+            if serializer_class is None:
+                data[key] = [{'type': row.model, 'id': row.object_id}
+                             for row in rows]
+            else:
+                data[key] = serializer_class(rows, many=True).data
+        return Response(data)
+
+    def _parse(self, param, default):
+        try:
+            value = int(self.request.query_params.get(param, default))
+        except ValueError:
+            value = -1
+        if value < 0:
+            raise ValidationError({param: 'Expected a positive integer.'})
+        return value
@@ -0,0 +1,41 @@
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import get_hasher
+from django.core.management import BaseCommand
+
+from core.benchmarks import measure, rolled_back
+
+PASSWORD = 'benchmark password'
+
+
+class Command(BaseCommand):
+    help = 'Measure logins per second on one core for PBKDF2 iteration ' \
+           'counts, see PASSWORD_PBKDF2_ITERATIONS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, nargs='+',
+            default=[50000, 100000, 150000, 260000, 390000])
+        parser.add_argument(
+            '--seconds', type=float, default=1,
+            help='Time spent measuring each iteration count')
+
+    def handle(self, *args, **options):
+        hasher = get_hasher()
+        self.stdout.write(f'Hasher: {hasher.algorithm}, configured '
+                          f'iterations: {hasher.iterations}')
+        for iterations in options['iterations']:
+            encoded = hasher.encode(PASSWORD, hasher.salt(), iterations)
+            rate = measure(
+                lambda: hasher.verify(PASSWORD, encoded), options['seconds'])
+            self.stdout.write(
+                f'  iterations={iterations:<8} {rate:8.1f} logins/s')
+
+        with rolled_back():
+            get_user_model().objects.create_user(
+                'benchmark@login.local', PASSWORD)
+            rate = measure(lambda: authenticate(
+                username='benchmark@login.local', password=PASSWORD),
+                options['seconds'])
+        self.stdout.write(self.style.SUCCESS(
+            f'authenticate() at iterations={hasher.iterations}: '
+            f'{rate:.1f} logins/s'))
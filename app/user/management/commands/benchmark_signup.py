@@ -0,0 +1,64 @@
+import sys
+import time
+
+from django.contrib.auth import password_validation
+from django.core.management import BaseCommand
+
+from core import validators
+from core.benchmarks import measure, rolled_back
+from user.serializers import UserSerializer
+
+PASSWORD = 'benchmark password'
+
+
+class Command(BaseCommand):
+    help = 'Compare the common password validators and measure signups ' \
+           'per second on one core'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seconds', type=float, default=1,
+            help='Time spent measuring each step')
+
+    def handle(self, *args, **options):
+        seconds = options['seconds']
+        path = validators.CommonPasswordValidator.DEFAULT_PASSWORD_LIST_PATH
+
+        start = time.perf_counter()
+        django_validator = password_validation.CommonPasswordValidator(path)
+        self.stdout.write(
+            f'django:  loaded in {time.perf_counter() - start:.3f}s, '
+            f'{self.set_size(django_validator.passwords) // 1024} KB')
+        validators.load_password_digests.cache_clear()
+        start = time.perf_counter()
+        compact_validator = validators.CommonPasswordValidator(path)
+        self.stdout.write(
+            f'compact: loaded in {time.perf_counter() - start:.3f}s, '
+            f'{compact_validator.digests.buffer_info()[1] * 8 // 1024} KB')
+
+        for name, validator in [('django', django_validator),
+                                ('compact', compact_validator)]:
+            rate = measure(lambda: validator.validate(PASSWORD), seconds)
+            self.stdout.write(f'{name + ":":<8} {rate:12.0f} validations/s')
+
+        signups = 0
+
+        def signup():
+            nonlocal signups
+            signups += 1
+            email = f'benchmark{signups}@signup.local'
+            password_validation.validate_password(PASSWORD)
+            serializer = UserSerializer(data={
+                'email': email, 'password': PASSWORD, 'name': 'Benchmark'})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        with rolled_back():
+            rate = measure(signup, seconds)
+        self.stdout.write(self.style.SUCCESS(
+            f'Signups: {rate:.1f}/s'))
+
+    @staticmethod
+    def set_size(strings):
+        """Bytes held by a set of strings, the strings included"""
+        return sys.getsizeof(strings) + sum(map(sys.getsizeof, strings))
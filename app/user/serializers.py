@@ -16,13 +16,10 @@ class UserSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         """Update a user, setting the password correctly and return it"""
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
-
         if password:
-            user.set_password(password)
-            user.save()
-
-        return user
+            # Saved with the other fields, in one UPDATE
+            instance.set_password(password)
+        return super().update(instance, validated_data)
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -32,6 +29,9 @@ class AuthTokenSerializer(serializers.Serializer):
         style={'input_type': 'password'},
         trim_whitespace=False
     )
+    # Logging in again from a device replaces the token it had
+    device = serializers.CharField(
+        max_length=64, required=False, default='')
 
     def validate(self, attrs):
         """Validate and authenticate the user"""
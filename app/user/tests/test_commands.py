@@ -0,0 +1,30 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import override_settings
+
+from core.tests.utils import ShardedTestCase
+
+
+class BenchmarkLoginTests(ShardedTestCase):
+    def test_benchmark_login(self):
+        out = StringIO()
+
+        call_command('benchmark_login', '--iterations', '1000',
+                     '--seconds', '0.01', stdout=out)
+
+        self.assertIn('iterations=1000', out.getvalue())
+        self.assertIn('authenticate()', out.getvalue())
+
+
+class BenchmarkSignupTests(ShardedTestCase):
+    def test_benchmark_signup(self):
+        out = StringIO()
+
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            call_command('benchmark_signup', '--seconds', '0.01', stdout=out)
+
+        self.assertIn('compact:', out.getvalue())
+        self.assertIn('Signups:', out.getvalue())
+        self.assertFalse(get_user_model().objects.exists())
@@ -1,9 +1,14 @@
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.test import override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.tests.utils import ShardedTestCase
+from user import throttling
+
 
 CREATE_USER_ROUTE = reverse('user:create')
 TOKEN_ROUTE = reverse('user:token')
@@ -14,8 +19,9 @@ def create_user(**kwargs):
     return get_user_model().objects.create(**kwargs)
 
 
-class UserAPITests(TestCase):
+class UserAPITests(ShardedTestCase):
     def setUp(self):
+        throttling.store.clear()
         self.client = APIClient()
         self.payload = {
             'email': 'user@email.com',
@@ -74,7 +80,7 @@ class UserAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class ProtectedRouteTests(TestCase):
+class ProtectedRouteTests(ShardedTestCase):
     def setUp(self):
         self.payload = {
             'email': 'user@email.com',
@@ -107,3 +113,76 @@ class ProtectedRouteTests(TestCase):
         self.assertEqual(self.user.name, self.payload['name'])
         self.assertTrue(self.user.check_password(self.payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_delete_user_deactivates_account(self):
+        res = self.client.delete(ME_ROUTE)
+
+        self.user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deleted_at)
+
+
+@override_settings(LOGIN_THROTTLE_RATES={'email': (2, 60), 'ip': (3, 60)})
+@patch('user.serializers.authenticate', return_value=None)
+class LoginThrottleTests(ShardedTestCase):
+    def setUp(self):
+        throttling.store.clear()
+        self.client = APIClient()
+
+    def login(self, email):
+        return self.client.post(
+            TOKEN_ROUTE, {'email': email, 'password': 'wrong'})
+
+    def test_attempts_per_email_limited(self, authenticate):
+        statuses = [self.login('user@email.com').status_code,
+                    self.login('USER@email.com ').status_code]
+        res = self.login('user@email.com')
+
+        self.assertEqual(statuses, [status.HTTP_400_BAD_REQUEST] * 2)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        # Throttled attempts never reach the password hasher
+        self.assertEqual(authenticate.call_count, 2)
+
+    def test_attempts_per_ip_limited(self, authenticate):
+        for index in range(3):
+            self.login(f'user{index}@email.com')
+
+        res = self.login('other@email.com')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(authenticate.call_count, 3)
+
+    def test_forwarded_for_header_not_trusted(self, authenticate):
+        for index in range(4):
+            self.client.credentials(HTTP_X_FORWARDED_FOR=f'10.0.0.{index}')
+            res = self.login(f'user{index}@email.com')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK={'NUM_PROXIES': 1})
+    def test_forwarded_for_trusted_behind_proxy(self, authenticate):
+        for index in range(4):
+            self.client.credentials(HTTP_X_FORWARDED_FOR=f'10.0.0.{index}')
+            res = self.login(f'user{index}@email.com')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SlidingWindowStoreTests(ShardedTestCase):
+    def test_window_slides(self):
+        store = throttling.SlidingWindowStore()
+
+        self.assertEqual(store.hit('key', 2, 10, now=0), 0)
+        self.assertEqual(store.hit('key', 2, 10, now=5), 0)
+        self.assertEqual(store.hit('key', 2, 10, now=6), 4)
+        self.assertEqual(store.hit('key', 2, 10, now=10), 0)
+
+    def test_keys_bounded(self):
+        store = throttling.SlidingWindowStore(max_keys=2)
+
+        for key in ('a', 'b', 'c'):
+            store.hit(key, 1, 10, now=0)
+
+        self.assertEqual(list(store._hits), ['b', 'c'])
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+
+class SlidingWindowStore:
+    """Timestamps of recent hits per key, held in process memory
+
+    A key is allowed ``limit`` hits in any ``window`` seconds. Only the
+    ``max_keys`` most recently hit keys are remembered, so a flood of
+    distinct emails costs bounded memory.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._hits = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window, now=None):
+        """Record a hit on ``key`` unless it is over the limit
+
+        Returns 0 when allowed, else the seconds until it would be.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+                if len(self._hits) > self.max_keys:
+                    self._hits.popitem(last=False)
+            self._hits.move_to_end(key)
+
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            if len(hits) >= limit:
+                return hits[0] + window - now
+            hits.append(now)
+            return 0
+
+    def clear(self):
+        with self._lock:
+            self._hits.clear()
+
+
+store = SlidingWindowStore(
+    max_keys=getattr(settings, 'LOGIN_THROTTLE_MAX_KEYS', 100000))
+
+
+class LoginThrottle(BaseThrottle):
+    """Limit login attempts per email and per client IP
+
+    Throttles run before the serializer, so rejected attempts never reach
+    the password hasher. Limits are (attempts, seconds) pairs from
+    LOGIN_THROTTLE_RATES.
+    """
+
+    def allow_request(self, request, view):
+        rates = getattr(settings, 'LOGIN_THROTTLE_RATES', {})
+        keys = [('ip', self.get_ident(request))]
+        email = request.data.get('email') \
+            if isinstance(request.data, dict) else None
+        if isinstance(email, str) and email.strip():
+            keys.append(('email', email.strip().lower()))
+
+        for scope, value in keys:
+            if scope in rates:
+                limit, window = rates[scope]
+                self.retry_after = store.hit(
+                    f'{scope}:{value}', limit, window)
+                if self.retry_after:
+                    return False
+        return True
+
+    def wait(self):
+        return self.retry_after
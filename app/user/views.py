@@ -1,7 +1,12 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+
+from core.authentication import ExpiringTokenAuthentication, issue_token
+from core.purge import soft_delete_user
 from user.serializers import UserSerializer, AuthTokenSerializer
+from user.throttling import LoginThrottle
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -12,13 +17,27 @@ class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for the user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginThrottle,)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(
+            data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        token = issue_token(
+            serializer.validated_data['user'],
+            serializer.validated_data['device'])
+        return Response({'token': token.key, 'expires': token.expires})
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         return self.request.user
+
+    def perform_destroy(self, instance):
+        """Deactivate the account, its data is purged in the background"""
+        soft_delete_user(instance)